@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -91,6 +94,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Catalog responses are cached per catalog version (products/cache.py).
+# Local memory only suits a single process: with several workers a shared
+# backend is required (e.g. 'django.core.cache.backends.filebased.FileBasedCache'
+# with a LOCATION, memcached or Redis) so version bumps reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    }
+}
+
+CATALOG_CACHE_TIMEOUT = 300
+# Fraction of catalog requests counted in the hit/miss stats (0 turns them
+# off); each counted request adds 1 / rate, so the totals are estimates.
+CATALOG_CACHE_STATS_SAMPLE_RATE = 0.01
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -131,10 +154,38 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How often a process checks for catalog changes made by other processes
+# before answering autocomplete queries (products/suggest.py).
+SUGGEST_REFRESH_SECONDS = 30
+
+# Reservation mode (cart/reservations.py): cart lines hold their stock for
+# CART_RESERVATION_SECONDS after they last change. Expired holds are released
+# by `manage.py release_stock_holds` (run it from cron, or with --every).
+CART_RESERVATIONS = False
+CART_RESERVATION_SECONDS = 15 * 60
+
+# How long order creation remembers an Idempotency-Key (orders/idempotency.py);
+# `manage.py purge_idempotency_keys` forgets older ones.
+IDEMPOTENCY_KEY_SECONDS = 24 * 60 * 60
+
+# Processes rendering resized product image variants (products/images.py).
+IMAGE_VARIANT_WORKERS = 2
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-CORS_ALLOW_ALL_ORIGINS = True
+# The guest cart cookie (cart/guest.py) travels with cross-origin API calls,
+# so only these origins (comma-separated in the environment; default: the
+# Vite dev server) may make them.
+CORS_ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.environ.get(
+        'CORS_ALLOWED_ORIGINS', 'http://localhost:5173,http://127.0.0.1:5173'
+    ).split(',')
+    if origin.strip()
+]
+CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 from datetime import timedelta
 
@@ -142,6 +193,8 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # many=True errors keyed by item index (batch admin endpoints).
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
 }
 
 SIMPLE_JWT = {
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Build the in-process autocomplete index before the first keystroke.
+from products import suggest  # noqa: E402
+
+suggest.warm()
@@ -0,0 +1,114 @@
+"""
+Guest carts for anonymous shoppers, kept in a signed cookie.
+
+The cookie holds ``product.quantity`` pairs signed with SECRET_KEY, so a
+guest cart costs no database rows (and no cache entry that one worker
+process would not see). Guest lines are identified by their product id,
+which the cart views accept wherever they take an ``item_id``.
+MyTokenObtainPairView merges the cookie into the user's Cart with one
+upsert at login and clears it.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+
+from products.models import Product
+from . import lines, reservations
+from .models import Cart, CartItem
+from .serializers import MONEY_FIELD, CartItemSerializer
+
+
+COOKIE_NAME = 'guest_cart'
+SALT = 'cart.guest'
+MAX_AGE = int(timedelta(days=30).total_seconds())
+# Keeps the cookie well under the 4 KB browsers allow.
+MAX_LINES = 50
+
+
+class TooManyLines(ValueError):
+    pass
+
+
+def load(request):
+    """``{product_id: quantity}`` from the request's cookie; empty if absent or tampered with."""
+    value = request.get_signed_cookie(COOKIE_NAME, default='', salt=SALT, max_age=MAX_AGE)
+    cart_lines = {}
+    for pair in value.split('-') if value else ():
+        try:
+            product_id, quantity = map(int, pair.split('.'))
+        except ValueError:
+            return {}
+        if quantity > 0:
+            cart_lines[product_id] = quantity
+    return cart_lines
+
+
+def store(response, request, cart_lines):
+    if not cart_lines:
+        response.delete_cookie(COOKIE_NAME, samesite='Lax')
+        return
+    response.set_signed_cookie(
+        COOKIE_NAME,
+        '-'.join(f'{product_id}.{quantity}' for product_id, quantity in cart_lines.items()),
+        salt=SALT,
+        max_age=MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+        secure=request.is_secure(),
+    )
+
+
+def apply(cart_lines, operations):
+    """The guest cart after ``(op, product_id, quantity)`` operations (see lines.fold())."""
+    absolute, relative = lines.fold(operations)
+    result = dict(cart_lines)
+    for product_id, quantity in relative.items():
+        result[product_id] = result.get(product_id, 0) + quantity
+    for product_id, quantity in absolute.items():
+        if quantity:
+            result[product_id] = quantity
+        else:
+            result.pop(product_id, None)
+    if len(result) > MAX_LINES:
+        raise TooManyLines(f'A guest cart holds at most {MAX_LINES} products; log in for more')
+    return result
+
+
+def representation(request, cart_lines):
+    """The guest cart in CartSerializer's shape, with ``id`` None; products in one query."""
+    products = Product.objects.filter(is_active=True).select_related('category').in_bulk(list(cart_lines))
+    items = []
+    for product_id, quantity in cart_lines.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        item = CartItem(id=product_id, product=product, quantity=quantity)
+        item.line_total = product.price * quantity
+        items.append(item)
+    return {
+        'id': None,
+        'items': CartItemSerializer(items, many=True, context={'request': request}).data,
+        'item_count': sum(item.quantity for item in items),
+        'subtotal': MONEY_FIELD.to_representation(sum(item.line_total for item in items)),
+    }
+
+
+def merge(user, request, response):
+    """Add the request's guest cart to ``user``'s Cart and clear the cookie."""
+    cart_lines = load(request)
+    if not cart_lines:
+        return
+    existing = list(Product.objects.filter(id__in=list(cart_lines)).values_list('id', flat=True))
+    cart, created = Cart.objects.get_or_create(user=user)
+    with transaction.atomic():
+        lines.add(cart.id, [(product_id, cart_lines[product_id]) for product_id in existing])
+        if reservations.enabled():
+            # Hold what the shelf still covers, product by product; a line it
+            # cannot cover stays in the cart unheld, like one whose hold lapsed.
+            for product_id in existing:
+                try:
+                    with transaction.atomic():
+                        reservations.sync(cart.id, [product_id])
+                except reservations.InsufficientStock:
+                    pass
+    store(response, request, {})
@@ -0,0 +1,92 @@
+"""
+Cart line writes as single set-based statements.
+
+``add()`` is an upsert on the (cart, product) constraint: the database
+increments an existing line in the same statement that would insert it,
+so concurrent adds (double clicks, several tabs) never read a quantity
+and write back a stale one. ``apply()`` folds a list of add/set/remove
+operations into at most one statement of each kind.
+"""
+from collections import Counter
+
+from django.db import connection
+from django.db.models import F
+
+from .models import CartItem
+
+
+ADD, SET, REMOVE = 'add', 'set', 'remove'
+UPSERT_CHUNK = 500
+
+
+def add(cart_id, quantities):
+    """Add ``(product_id, quantity)`` pairs to the cart, creating lines as needed."""
+    totals = Counter()
+    for product_id, quantity in quantities:
+        totals[product_id] += quantity
+    rows = [(cart_id, product_id, quantity) for product_id, quantity in sorted(totals.items())]
+    if not rows:
+        return
+    table = CartItem._meta.db_table
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            # One multi-row statement per chunk, well under SQLite's parameter limit.
+            for start in range(0, len(rows), UPSERT_CHUNK):
+                chunk = rows[start:start + UPSERT_CHUNK]
+                cursor.execute(
+                    f"INSERT INTO {table} (cart_id, product_id, quantity) "
+                    f"VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                    f"ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = {table}.quantity + excluded.quantity",
+                    [value for row in chunk for value in row],
+                )
+        return
+    for cart_id, product_id, quantity in rows:
+        if not CartItem.objects.filter(cart_id=cart_id, product_id=product_id).update(
+            quantity=F('quantity') + quantity
+        ):
+            CartItem.objects.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+
+
+def set_quantities(cart_id, quantities):
+    """Set ``{product_id: quantity}`` on the cart's lines, creating lines as needed."""
+    CartItem.objects.bulk_create(
+        [
+            CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity)
+            for product_id, quantity in sorted(quantities.items())
+        ],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+
+
+def fold(operations):
+    """
+    Reduce ``(op, product_id, quantity)`` operations, taken in order, to
+    ``(absolute, relative)``: quantities to set (0 to remove) and to add.
+    ``add`` adds to a line, ``set`` replaces its quantity (0 removes it),
+    ``remove`` deletes it.
+    """
+    absolute, relative = {}, Counter()
+    for op, product_id, quantity in operations:
+        if op == ADD and product_id not in absolute:
+            relative[product_id] += quantity
+        elif op == ADD:
+            absolute[product_id] += quantity
+        else:
+            # A set or remove overrides whatever came before it.
+            absolute[product_id] = quantity if op == SET else 0
+            relative.pop(product_id, None)
+    return absolute, relative
+
+
+def apply(cart_id, operations):
+    """Apply ``(op, product_id, quantity)`` operations (see fold()) to a stored cart."""
+    absolute, relative = fold(operations)
+    removed = [product_id for product_id, quantity in absolute.items() if quantity == 0]
+    if removed:
+        CartItem.objects.filter(cart_id=cart_id, product_id__in=removed).delete()
+    kept = {product_id: quantity for product_id, quantity in absolute.items() if quantity}
+    if kept:
+        set_quantities(cart_id, kept)
+    add(cart_id, relative.items())
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cart import reservations
+
+
+class Command(BaseCommand):
+    help = 'Release expired cart stock holds (reservation mode) in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--every', type=float, metavar='SECONDS',
+                            help='Keep running as a worker, sweeping every SECONDS.')
+        parser.add_argument('--recount', action='store_true',
+                            help='First reset reserved_stock counters that drifted from the holds.')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            with transaction.atomic():
+                corrected = reservations.recount()
+            self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} reserved stock counts'))
+        while True:
+            released = reservations.release_expired(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Released {released} expired holds'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
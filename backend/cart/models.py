@@ -23,5 +23,27 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # One line per product: adds increment it (cart/lines.py).
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} ({self.quantity})"
+
+
+class StockHold(models.Model):
+    """
+    Stock set aside for a cart line until ``expires_at`` (reservation mode,
+    cart/reservations.py). Product.reserved_stock is the sum of the holds.
+    """
+    cart = models.ForeignKey(Cart, related_name='holds', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_stock_hold'),
+        ]
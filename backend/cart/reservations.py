@@ -0,0 +1,181 @@
+"""
+Optional stock reservations (``settings.CART_RESERVATIONS``).
+
+While enabled, a stored cart's lines hold the stock they ask for until
+CART_RESERVATION_SECONDS after the line last changed. A hold is taken with
+one conditional UPDATE of Product.reserved_stock that only matches while
+``stock - reserved_stock`` still covers it, so concurrent carts can never
+hold more than is on the shelf between them, and listings read available
+stock from that counter instead of summing holds. ``release_expired()``
+(the release_stock_holds command) hands lapsed holds back in batches; a
+line whose hold lapsed takes a new one the next time it changes.
+
+Guest carts live in a cookie (cart/guest.py) and hold nothing; the lines
+they bring at login take holds as they are merged, where the shelf still
+covers them.
+
+Holds never bump the catalog cache version, which would flush every
+cached catalog response on each add-to-cart. Their UPDATEs touch
+updated_at instead, which product detail responses (the only cached ones
+carrying available_stock) are keyed and dated on. The in-stock facet and
+filter bump the facets version only when a product's available stock
+reaches or leaves zero.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from products import facets
+from products.models import Product
+from .models import CartItem, StockHold
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, available):
+        self.product_id = product_id
+        # The most this cart's line for the product could hold.
+        self.available = available
+        super().__init__(f'Only {available} left in stock')
+
+
+def enabled():
+    return getattr(settings, 'CART_RESERVATIONS', False)
+
+
+def _sold_out(product_ids):
+    return Product.objects.filter(id__in=product_ids, stock__lte=F('reserved_stock')).exists()
+
+
+def _release(quantities):
+    """Subtract ``{product_id: quantity}`` from reserved_stock, one UPDATE per distinct quantity."""
+    by_quantity = defaultdict(list)
+    for product_id, quantity in quantities.items():
+        if quantity:
+            by_quantity[quantity].append(product_id)
+    if not by_quantity:
+        return
+    if _sold_out([product_id for product_ids in by_quantity.values() for product_id in product_ids]):
+        facets.changed()
+    for quantity, product_ids in by_quantity.items():
+        Product.objects.filter(id__in=product_ids).update(
+            reserved_stock=F('reserved_stock') - quantity, updated_at=Now(),
+        )
+
+
+def sync(cart_id, product_ids):
+    """
+    Make the cart's holds on ``product_ids`` match its lines: take any
+    increase (raising InsufficientStock if the shelf cannot cover it),
+    release any decrease, and restart the expiry clock. Call it inside the
+    transaction that changed the lines so a refused hold undoes the change.
+    A no-op unless reservations are enabled.
+    """
+    if not enabled():
+        return
+    # Sorted, so concurrent carts take product row locks in the same order.
+    product_ids = sorted(set(product_ids))
+    wanted = dict(
+        CartItem.objects.filter(cart_id=cart_id, product_id__in=product_ids).values_list('product_id', 'quantity')
+    )
+    # Locked so the sweeper cannot release a hold this transaction is about to renew.
+    held = dict(
+        StockHold.objects.select_for_update()
+        .filter(cart_id=cart_id, product_id__in=product_ids)
+        .values_list('product_id', 'quantity')
+    )
+
+    released = {}
+    increased = []
+    for product_id in product_ids:
+        change = wanted.get(product_id, 0) - held.get(product_id, 0)
+        if change > 0:
+            taken = Product.objects.filter(
+                id=product_id, stock__gte=F('reserved_stock') + change,
+            ).update(reserved_stock=F('reserved_stock') + change, updated_at=Now())
+            if not taken:
+                stock, reserved = Product.objects.values_list('stock', 'reserved_stock').get(id=product_id)
+                raise InsufficientStock(product_id, max(stock - reserved, 0) + held.get(product_id, 0))
+            increased.append(product_id)
+        elif change < 0:
+            released[product_id] = -change
+    if increased and _sold_out(increased):
+        facets.changed()
+    _release(released)
+
+    dropped = [product_id for product_id in product_ids if product_id not in wanted]
+    if dropped:
+        StockHold.objects.filter(cart_id=cart_id, product_id__in=dropped).delete()
+    if wanted:
+        expires_at = timezone.now() + timedelta(seconds=settings.CART_RESERVATION_SECONDS)
+        StockHold.objects.bulk_create(
+            [
+                StockHold(cart_id=cart_id, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                for product_id, quantity in sorted(wanted.items())
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'expires_at'],
+        )
+
+
+def _delete_expired(now, limit):
+    """Delete up to ``limit`` holds that expired by ``now``; their ``(product_id, quantity)``."""
+    if connection.vendor in ('sqlite', 'postgresql'):
+        table = StockHold._meta.db_table
+        expires_at = StockHold._meta.get_field('expires_at').get_db_prep_value(now, connection)
+        with connection.cursor() as cursor:
+            # The outer condition is checked again against a hold renewed
+            # while this statement waited for its lock.
+            cursor.execute(
+                f"DELETE FROM {table} WHERE expires_at <= %s AND id IN ("
+                f"SELECT id FROM {table} WHERE expires_at <= %s ORDER BY expires_at LIMIT %s"
+                f") RETURNING product_id, quantity",
+                [expires_at, expires_at, limit],
+            )
+            return cursor.fetchall()
+    holds = list(
+        StockHold.objects.select_for_update()
+        .filter(expires_at__lte=now)
+        .order_by('expires_at')
+        .values_list('id', 'product_id', 'quantity')[:limit]
+    )
+    StockHold.objects.filter(id__in=[hold_id for hold_id, _, _ in holds]).delete()
+    return [(product_id, quantity) for _, product_id, quantity in holds]
+
+
+def release_expired(batch_size=1000, now=None):
+    """Release every hold that has expired, ``batch_size`` per transaction; returns how many."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = _delete_expired(now, batch_size)
+            quantities = Counter()
+            for product_id, quantity in rows:
+                quantities[product_id] += quantity
+            _release(quantities)
+        released += len(rows)
+        if len(rows) < batch_size:
+            return released
+
+
+def recount():
+    """Reset reserved_stock counters that drifted from their holds; returns the number corrected."""
+    held = dict(
+        StockHold.objects.values('product').annotate(total=Sum('quantity')).values_list('product', 'total')
+    )
+    counted = dict(Product.objects.exclude(reserved_stock=0).values_list('id', 'reserved_stock'))
+    drifted = defaultdict(list)
+    for product_id in held.keys() | counted.keys():
+        if held.get(product_id, 0) != counted.get(product_id, 0):
+            drifted[held.get(product_id, 0)].append(product_id)
+    for total, product_ids in drifted.items():
+        Product.objects.filter(id__in=product_ids).update(reserved_stock=total, updated_at=Now())
+    if drifted:
+        facets.changed()
+    return sum(len(product_ids) for product_ids in drifted.values())
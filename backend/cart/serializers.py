@@ -1,19 +1,99 @@
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Window
 from rest_framework import serializers
+from . import lines
 from .models import Cart, CartItem
-from products.serializers import ProductSerializer
+from products.serializers import ProductListSerializer
+
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+MONEY_FIELD = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+def cart_queryset():
+    """
+    Carts with their lines, products and categories prefetched in one extra
+    query. Each line carries its total and, through window sums over the
+    cart's lines, the cart's subtotal and item count.
+    """
+    line_total = ExpressionWrapper(F('product__price') * F('quantity'), output_field=MONEY)
+    lines = (
+        CartItem.objects.select_related('product__category')
+        .annotate(
+            line_total=line_total,
+            cart_subtotal=Window(Sum(line_total), partition_by=[F('cart_id')], output_field=MONEY),
+            cart_item_count=Window(Sum('quantity'), partition_by=[F('cart_id')]),
+        )
+        .order_by('id')
+    )
+    return Cart.objects.prefetch_related(Prefetch('items', queryset=lines))
+
+
+class CartProductSerializer(ProductListSerializer):
+    """What a cart line shows of its product: no description, no reviews."""
+    available_stock = serializers.IntegerField(read_only=True)
+
+    class Meta(ProductListSerializer.Meta):
+        fields = [
+            'id',
+            'name',
+            'sku',
+            'price',
+            'stock',
+            'available_stock',
+            'image',
+            'image_url',
+            'image_srcset',
+            'is_active',
+            'category',
+        ]
 
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = CartProductSerializer(read_only=True)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'quantity']
+        fields = ['id', 'product', 'quantity', 'line_total']
 
 
 class CartSerializer(serializers.ModelSerializer):
+    """A cart from cart_queryset(); totals come from its annotated lines."""
     items = CartItemSerializer(many=True, read_only=True)
+    item_count = serializers.SerializerMethodField()
+    subtotal = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
-        fields = ['id', 'items']
+        fields = ['id', 'items', 'item_count', 'subtotal']
+
+    def _first_line(self, cart):
+        lines = cart.items.all()
+        return lines[0] if lines else None
+
+    def get_item_count(self, cart):
+        line = self._first_line(cart)
+        return line.cart_item_count if line else 0
+
+    def get_subtotal(self, cart):
+        line = self._first_line(cart)
+        return MONEY_FIELD.to_representation(line.cart_subtotal if line else 0)
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """One cart/batch/ operation; ``products`` in the context holds the existing product ids."""
+    op = serializers.ChoiceField(choices=[lines.ADD, lines.SET, lines.REMOVE])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if attrs['product_id'] not in self.context['products']:
+            raise serializers.ValidationError({'product_id': ['Product not found.']})
+        quantity = attrs.get('quantity')
+        if attrs['op'] == lines.ADD:
+            if quantity == 0:
+                raise serializers.ValidationError({'quantity': ['Must be at least 1 to add.']})
+            attrs['quantity'] = 1 if quantity is None else quantity
+        elif attrs['op'] == lines.SET and quantity is None:
+            raise serializers.ValidationError({'quantity': ['This field is required.']})
+        return attrs
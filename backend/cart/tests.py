@@ -1,3 +1,389 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from products.models import Category, Product
+from . import guest, reservations
+from .models import Cart, CartItem, StockHold
+from .views import AddToCartView
+
+
+class CartViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Tea', slug='tea')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add_lines(self, n):
+        for i in range(n):
+            product = Product.objects.create(
+                category=self.category, name=f'Tea {i}', price=Decimal('2.50') + i, stock=10,
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=i + 1)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.add_lines(1)
+        with self.assertNumQueries(2):
+            self.client.get('/api/cart/')
+        self.add_lines(10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(len(response.data['items']), 11)
+
+    def test_totals_and_lean_lines(self):
+        self.add_lines(2)
+        data = self.client.get('/api/cart/').data
+        # 2.50 x 1 + 3.50 x 2
+        self.assertEqual(data['subtotal'], '9.50')
+        self.assertEqual(data['item_count'], 3)
+        self.assertEqual([line['line_total'] for line in data['items']], ['2.50', '7.00'])
+        product = data['items'][0]['product']
+        self.assertEqual(product['category']['slug'], 'tea')
+        self.assertNotIn('reviews', product)
+        self.assertNotIn('description', product)
+
+    def test_empty_and_new_carts(self):
+        data = self.client.get('/api/cart/').data
+        self.assertEqual((data['items'], data['item_count'], data['subtotal']), ([], 0, '0.00'))
+        self.cart.delete()
+        data = self.client.get('/api/cart/').data
+        self.assertEqual((data['items'], data['item_count'], data['subtotal']), ([], 0, '0.00'))
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Tea', slug='tea')
+        self.products = [
+            Product.objects.create(category=category, name=f'Tea {i}', price=2, stock=10) for i in range(4)
+        ]
+        self.ids = [product.id for product in self.products]
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=5)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=1)
+
+    def batch(self, operations):
+        return self.client.post('/api/cart/batch/', operations, format='json')
+
+    def quantities(self):
+        return dict(CartItem.objects.values_list('product_id', 'quantity'))
+
+    def test_operations_apply_in_order(self):
+        a, b, c, d = self.ids
+        response = self.batch([
+            {'op': 'add', 'product_id': a, 'quantity': 2},
+            {'op': 'remove', 'product_id': b},
+            {'op': 'add', 'product_id': b},
+            {'op': 'set', 'product_id': c, 'quantity': 3},
+            {'op': 'add', 'product_id': c, 'quantity': 1},
+            {'op': 'add', 'product_id': d},
+            {'op': 'set', 'product_id': d, 'quantity': 0},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {a: 7, b: 1, c: 4})
+        # The response is the resulting cart.
+        self.assertEqual(response.data['item_count'], 12)
+        self.assertEqual([line['product']['id'] for line in response.data['items']], [a, b, c])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def queries(operations):
+            from django.db import connection
+            from django.test.utils import CaptureQueriesContext
+
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.batch(operations).status_code, 200)
+            return len(captured)
+
+        one = queries([{'op': 'add', 'product_id': self.ids[2]}])
+        many = queries([{'op': 'add', 'product_id': i} for i in self.ids] * 10)
+        self.assertEqual(one, many)
+
+    def test_invalid_batch_changes_nothing(self):
+        response = self.batch([
+            {'op': 'add', 'product_id': self.ids[2]},
+            {'op': 'add', 'product_id': 99999},
+            {'op': 'set', 'product_id': self.ids[0]},
+            {'op': 'drop', 'product_id': self.ids[0]},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data), [1, 2, 3])
+        self.assertEqual(self.quantities(), {self.ids[0]: 5, self.ids[1]: 1})
+        self.assertEqual(self.batch({'op': 'add'}).status_code, 400)
+
+
+class GuestCartTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Tea', slug='tea')
+        self.tea, self.mug = (
+            Product.objects.create(category=category, name=name, price=price, stock=10)
+            for name, price in (('Sencha', 4), ('Mug', 6))
+        )
+
+    def test_guest_cart_lives_in_a_signed_cookie(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post('/api/cart/add/', {'product_id': self.tea.id, 'quantity': 2}).status_code, 200)
+        self.client.post('/api/cart/add/', {'product_id': self.mug.id})
+        self.client.post('/api/cart/add/', {'product_id': self.tea.id})
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+        data = self.client.get('/api/cart/').data
+        self.assertEqual(data['id'], None)
+        self.assertEqual([(line['id'], line['quantity']) for line in data['items']], [(self.tea.id, 3), (self.mug.id, 1)])
+        self.assertEqual((data['item_count'], data['subtotal']), (4, '18.00'))
+
+        self.client.post('/api/cart/update/', {'item_id': self.tea.id, 'quantity': 1})
+        self.client.post('/api/cart/remove/', {'item_id': self.mug.id})
+        self.assertEqual(self.client.get('/api/cart/').data['item_count'], 1)
+        self.assertEqual(self.client.post('/api/cart/remove/', {'item_id': self.mug.id}).status_code, 404)
+
+        # A tampered cookie reads as an empty cart.
+        self.client.cookies[guest.COOKIE_NAME] = self.client.cookies[guest.COOKIE_NAME].value.replace('.1', '.9')
+        self.assertEqual(self.client.get('/api/cart/').data['items'], [])
+
+    def test_guest_batch_and_line_limit(self):
+        data = self.client.post('/api/cart/batch/', [
+            {'op': 'add', 'product_id': self.tea.id, 'quantity': 2},
+            {'op': 'set', 'product_id': self.mug.id, 'quantity': 5},
+        ], format='json').data
+        self.assertEqual(data['item_count'], 7)
+        with mock.patch.object(guest, 'MAX_LINES', 1):
+            response = self.client.post('/api/cart/add/', {'product_id': self.tea.id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_merges_guest_cart_with_one_upsert(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user = get_user_model().objects.create_user('shopper', password='pw')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.tea, quantity=1)
+        self.client.post('/api/cart/add/', {'product_id': self.tea.id, 'quantity': 2})
+        self.client.post('/api/cart/add/', {'product_id': self.mug.id})
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/auth/login/', {'username': 'shopper', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in captured if q['sql'].startswith('INSERT') and 'cart_cartitem' in q['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(
+            dict(CartItem.objects.values_list('product_id', 'quantity')), {self.tea.id: 3, self.mug.id: 1},
+        )
+        # The cookie is cleared, so logging in again adds nothing.
+        self.assertEqual(response.cookies[guest.COOKIE_NAME].value, '')
+        self.client.post('/api/auth/login/', {'username': 'shopper', 'password': 'pw'})
+        self.assertEqual(CartItem.objects.get(product=self.tea).quantity, 3)
+
+    def test_cookie_is_only_shared_with_allowed_origins(self):
+        with self.settings(CORS_ALLOWED_ORIGINS=['https://shop.example']):
+            allowed = self.client.get('/api/cart/', HTTP_ORIGIN='https://shop.example')
+            other = self.client.get('/api/cart/', HTTP_ORIGIN='https://evil.example')
+        self.assertEqual(allowed['Access-Control-Allow-Origin'], 'https://shop.example')
+        self.assertEqual(allowed['Access-Control-Allow-Credentials'], 'true')
+        self.assertNotIn('Access-Control-Allow-Origin', other)
+
+
+@override_settings(CART_RESERVATIONS=True, CART_RESERVATION_SECONDS=600)
+class StockReservationTests(TestCase):
+    def setUp(self):
+        # Catalog responses are cached; version bumps only run on commit.
+        cache.clear()
+        category = Category.objects.create(name='Tea', slug='tea')
+        self.tea = Product.objects.create(category=category, name='Sencha', price=4, stock=5)
+        self.clients = []
+        for name in ('ann', 'bob'):
+            client = APIClient()
+            client.force_authenticate(get_user_model().objects.create_user(name, password='pw'))
+            self.clients.append(client)
+        self.ann, self.bob = self.clients
+
+    def add(self, client, quantity):
+        return client.post('/api/cart/add/', {'product_id': self.tea.id, 'quantity': quantity})
+
+    def reserved(self):
+        self.tea.refresh_from_db()
+        return self.tea.reserved_stock
+
+    def test_holds_never_exceed_stock(self):
+        self.assertEqual(self.add(self.ann, 3).status_code, 200)
+        response = self.add(self.bob, 3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['available'], 2)
+        # The refused add leaves no line behind.
+        self.assertEqual(CartItem.objects.filter(cart__user__username='bob').count(), 0)
+        self.assertEqual(self.add(self.bob, 2).status_code, 200)
+        self.assertEqual(self.reserved(), 5)
+
+        # Listings read the counter.
+        data = self.ann.get(f'/api/products/{self.tea.id}/').data
+        self.assertEqual((data['stock'], data['available_stock']), (5, 0))
+        self.assertEqual(self.ann.get('/api/products/', {'in_stock': 'true'}).data['results'], [])
+
+    def test_changing_lines_moves_holds(self):
+        self.add(self.ann, 3)
+        line = CartItem.objects.get()
+        # Ann's own hold counts towards what her line may grow to.
+        response = self.ann.post('/api/cart/update/', {'item_id': line.id, 'quantity': 6})
+        self.assertEqual((response.status_code, response.data['available']), (409, 5))
+        self.ann.post('/api/cart/update/', {'item_id': line.id, 'quantity': 1})
+        self.assertEqual(self.reserved(), 1)
+        self.ann.post('/api/cart/remove/', {'item_id': line.id})
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(StockHold.objects.exists())
+
+        response = self.ann.post('/api/cart/batch/', [{'op': 'set', 'product_id': self.tea.id, 'quantity': 9}], format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_expired_holds_are_released_in_batches(self):
+        self.add(self.ann, 2)
+        self.add(self.bob, 3)
+        StockHold.objects.update(expires_at=timezone.now())
+        call_command('release_stock_holds', batch_size=1, stdout=mock.Mock())
+        self.assertEqual(self.reserved(), 0)
+        self.assertFalse(StockHold.objects.exists())
+        # Lines stay in the cart and take a new hold when next changed.
+        self.add(self.ann, 1)
+        self.assertEqual(self.reserved(), 3)
+        self.assertEqual(StockHold.objects.get().quantity, 3)
+
+    def test_cached_detail_follows_holds_without_a_version_bump(self):
+        def available():
+            return self.bob.get(f'/api/products/{self.tea.id}/').data['available_stock']
+
+        self.assertEqual(available(), 5)
+        self.bob.get('/api/products/', {'in_stock': 'true'})
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.add(self.ann, 2)
+        # Still in stock: nothing to flush.
+        self.assertEqual(callbacks, [])
+        self.assertEqual(available(), 3)
+        StockHold.objects.update(expires_at=timezone.now())
+        reservations.release_expired()
+        self.assertEqual(available(), 5)
+
+        # Selling out moves the in-stock facet and filter.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.bob, 5)
+        self.assertEqual(self.ann.get('/api/products/', {'in_stock': 'true'}).data['results'], [])
+        self.assertEqual(self.ann.get('/api/products/').data['facets']['in_stock'], 0)
+
+    def test_conditional_get_sees_holds(self):
+        url = f'/api/products/{self.tea.id}/'
+        Product.objects.filter(id=self.tea.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        first = self.bob.get(url)
+        since, etag = first['Last-Modified'], first['ETag']
+        self.assertEqual(self.bob.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+        self.add(self.ann, 2)
+        response = self.bob.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual((response.status_code, response.data['available_stock']), (200, 3))
+        self.assertEqual(self.bob.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_login_holds_the_merged_guest_lines(self):
+        mug = Product.objects.create(category=self.tea.category, name='Mug', price=6, stock=1)
+        self.add(self.bob, 4)
+        guest_client = APIClient()
+        guest_client.post('/api/cart/add/', {'product_id': self.tea.id, 'quantity': 2})
+        guest_client.post('/api/cart/add/', {'product_id': mug.id})
+        self.assertEqual(self.reserved(), 4)
+
+        response = guest_client.post('/api/auth/login/', {'username': 'ann', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        # The mug is held; the tea line stays, unheld, as the shelf has only 1 left.
+        self.assertEqual(dict(CartItem.objects.filter(cart__user__username='ann').values_list('product_id', 'quantity')),
+                         {self.tea.id: 2, mug.id: 1})
+        self.assertEqual(list(StockHold.objects.filter(cart__user__username='ann').values_list('product_id', flat=True)),
+                         [mug.id])
+        mug.refresh_from_db()
+        self.assertEqual((self.reserved(), mug.reserved_stock), (4, 1))
+
+    def test_counter_survives_product_saves_and_recounts(self):
+        self.add(self.ann, 2)
+        stale = Product.objects.get(id=self.tea.id)
+        self.add(self.bob, 1)
+        stale.stock = 8
+        stale.save()
+        self.assertEqual(self.reserved(), 3)
+
+        Product.objects.filter(id=self.tea.id).update(reserved_stock=7)
+        self.assertEqual(reservations.recount(), 1)
+        self.assertEqual(self.reserved(), 3)
+
+
+class AddToCartConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+    ADDS = 25
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('shopper', password='pw')
+        category = Category.objects.create(name='Tea', slug='tea')
+        self.product = Product.objects.create(category=category, name='Sencha', price=4, stock=1000)
+
+    def add(self, quantity):
+        # Straight to the view: the test client re-raises exceptions caught
+        # through a global signal, i.e. other threads' too. SQLite's
+        # shared-cache test database rejects (rather than queues) a writer
+        # while another holds the lock, and a refused autocommit COMMIT
+        # leaves its transaction open: roll that back and retry.
+        while True:
+            request = APIRequestFactory().post(
+                '/api/cart/add/', {'product_id': self.product.id, 'quantity': quantity}, format='json',
+            )
+            force_authenticate(request, user=self.user)
+            try:
+                response = AddToCartView.as_view()(request)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                if connection.connection.in_transaction:
+                    connection.connection.rollback()
+                continue
+            self.assertEqual(response.status_code, 200)
+            return
+
+    def test_concurrent_adds_lose_no_increments(self):
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def shopper():
+            try:
+                start.wait()
+                for _ in range(self.ADDS):
+                    self.add(2)
+            except Exception as error:  # surfaced below
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=shopper) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        line = CartItem.objects.get(cart__user=self.user, product=self.product)
+        self.assertEqual(line.quantity, 2 * self.THREADS * self.ADDS)
+
+    def test_invalid_quantity_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for quantity in (0, -1, 'many'):
+            response = client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': quantity})
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
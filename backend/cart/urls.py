@@ -4,6 +4,7 @@ from .views import (
     AddToCartView,
     UpdateCartItemView,
     RemoveFromCartView,
+    CartBatchView,
 )
 
 urlpatterns = [
@@ -11,4 +12,5 @@ urlpatterns = [
     path('cart/add/', AddToCartView.as_view()),
     path('cart/update/', UpdateCartItemView.as_view()),
     path('cart/remove/', RemoveFromCartView.as_view()),
+    path('cart/batch/', CartBatchView.as_view()),
 ]
@@ -1,58 +1,110 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from rest_framework.exceptions import NotFound
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 
+from . import guest, lines, reservations
 from .models import Cart, CartItem
 from products.models import Product
-from .serializers import CartSerializer
+from .serializers import CartOperationSerializer, CartSerializer, cart_queryset
+
+
+def _guest_response(request, operations, data=None):
+    """Apply operations to the guest cookie cart; respond with ``data``, or the cart."""
+    try:
+        cart_lines = guest.apply(guest.load(request), operations)
+    except guest.TooManyLines as error:
+        return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    response = Response(data if data is not None else guest.representation(request, cart_lines))
+    guest.store(response, request, cart_lines)
+    return response
+
+
+def _out_of_stock(error):
+    return Response(
+        {"error": str(error), "product_id": error.product_id, "available": error.available},
+        status=status.HTTP_409_CONFLICT
+    )
+
+
+def _guest_item(request, item_id):
+    try:
+        product_id = int(item_id)
+    except (TypeError, ValueError):
+        raise NotFound()
+    if product_id not in guest.load(request):
+        raise NotFound()
+    return product_id
 
 
 class CartView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    """The user's cart, or for anonymous shoppers the guest cart in their cookie."""
+    permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
+        if not request.user.is_authenticated:
+            return Response(guest.representation(request, guest.load(request)))
+        cart, created = cart_queryset().get_or_create(user=request.user)
+        serializer = CartSerializer(cart, context={'request': request})
         return Response(serializer.data)
 
 
 class AddToCartView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
 
     def post(self, request):
         product_id = request.data.get('product_id')
-        quantity = int(request.data.get('quantity', 1))
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
 
         if not product_id:
             return Response(
                 {"error": "product_id is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if quantity <= 0:
+            return Response(
+                {"error": "quantity must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        product = get_object_or_404(Product, id=product_id)
-        cart, created = Cart.objects.get_or_create(user=request.user)
-
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product
-        )
-
-        if not created:
-            cart_item.quantity += quantity
-        else:
-            cart_item.quantity = quantity
-
-        cart_item.save()
+        product = get_object_or_404(Product.objects.only('id'), id=product_id)
+        if not request.user.is_authenticated:
+            return _guest_response(request, [(lines.ADD, product.id, quantity)], {"message": "Product added to cart"})
+        try:
+            with transaction.atomic():
+                cart, created = Cart.objects.get_or_create(user=request.user)
+                # One upsert: no read-modify-write for concurrent adds to race on.
+                lines.add(cart.id, [(product.id, quantity)])
+                reservations.sync(cart.id, [product.id])
+        except reservations.InsufficientStock as error:
+            return _out_of_stock(error)
         return Response({"message": "Product added to cart"})
 
 
 class UpdateCartItemView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
 
     def post(self, request):
         item_id = request.data.get('item_id')
-        quantity = int(request.data.get('quantity', 1))
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "quantity must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not request.user.is_authenticated:
+            # Guest lines are identified by product id.
+            product_id = _guest_item(request, item_id)
+            if quantity <= 0:
+                return _guest_response(request, [(lines.REMOVE, product_id, 0)], {"message": "Item removed from cart"})
+            return _guest_response(request, [(lines.SET, product_id, quantity)], {"message": "Cart item updated"})
 
         cart_item = get_object_or_404(
             CartItem,
@@ -60,20 +112,29 @@ class UpdateCartItemView(APIView):
             cart__user=request.user
         )
 
+        try:
+            with transaction.atomic():
+                if quantity <= 0:
+                    cart_item.delete()
+                else:
+                    cart_item.quantity = quantity
+                    cart_item.save()
+                reservations.sync(cart_item.cart_id, [cart_item.product_id])
+        except reservations.InsufficientStock as error:
+            return _out_of_stock(error)
         if quantity <= 0:
-            cart_item.delete()
             return Response({"message": "Item removed from cart"})
-
-        cart_item.quantity = quantity
-        cart_item.save()
         return Response({"message": "Cart item updated"})
 
 
 class RemoveFromCartView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
 
     def post(self, request):
         item_id = request.data.get('item_id')
+        if not request.user.is_authenticated:
+            product_id = _guest_item(request, item_id)
+            return _guest_response(request, [(lines.REMOVE, product_id, 0)], {"message": "Item removed from cart"})
 
         cart_item = get_object_or_404(
             CartItem,
@@ -81,5 +142,60 @@ class RemoveFromCartView(APIView):
             cart__user=request.user
         )
 
-        cart_item.delete()
+        with transaction.atomic():
+            cart_item.delete()
+            reservations.sync(cart_item.cart_id, [cart_item.product_id])
         return Response({"message": "Item removed from cart"})
+
+
+class CartBatchView(APIView):
+    """
+    POST a list of ``{"op": "add" | "set" | "remove", "product_id", "quantity"}``
+    operations. They are applied in order, in one transaction, with one
+    statement per kind of change, and the response is the resulting cart.
+    """
+    permission_classes = [permissions.AllowAny]
+    max_operations = 100
+
+    def post(self, request):
+        operations = request.data
+        if not isinstance(operations, list):
+            return Response(
+                {"error": "Expected a list of operations"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(operations) > self.max_operations:
+            return Response(
+                {"error": f"At most {self.max_operations} operations per batch"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ids = set()
+        for operation in operations:
+            try:
+                ids.add(int(operation.get('product_id')))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        serializer = CartOperationSerializer(
+            data=operations,
+            many=True,
+            context={'products': set(Product.objects.filter(id__in=ids).values_list('id', flat=True))},
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        operations = [
+            (operation['op'], operation['product_id'], operation.get('quantity', 0))
+            for operation in serializer.validated_data
+        ]
+        if not request.user.is_authenticated:
+            return _guest_response(request, operations)
+        try:
+            with transaction.atomic():
+                cart, created = Cart.objects.get_or_create(user=request.user)
+                lines.apply(cart.id, operations)
+                reservations.sync(cart.id, [product_id for op, product_id, quantity in operations])
+        except reservations.InsufficientStock as error:
+            return _out_of_stock(error)
+        cart = cart_queryset().get(pk=cart.pk)
+        return Response(CartSerializer(cart, context={'request': request}).data)
@@ -0,0 +1,104 @@
+"""
+Checkout in a fixed number of statements plus one stock UPDATE per product.
+
+The cart's lines and their products come back in one query, order items
+are inserted with one bulk_create, and stock is taken with one
+conditional UPDATE per product that only matches while the shelf still
+covers the line. Concurrent checkouts therefore cannot sell the same
+unit twice. Any short line rejects the whole order: place() raises and
+the caller's transaction rolls back whatever was already decremented.
+These UPDATEs skip post_save, so they touch updated_at themselves (for
+feed readers) and bump the catalog cache version once the order commits.
+"""
+from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.db.models.functions import Now
+
+from cart import reservations
+from cart.models import CartItem, StockHold
+from products import cache as catalog_cache, facets, sales
+from products.models import Product
+from .models import Order, OrderItem
+
+
+class EmptyCart(Exception):
+    pass
+
+
+class OutOfStock(Exception):
+    def __init__(self, shortages):
+        # {product_id: units still available}
+        self.shortages = shortages
+        super().__init__('Some items are no longer in stock')
+
+
+def take_stock(cart_id, quantities):
+    """
+    Decrement stock by ``{product_id: quantity}``, consuming the cart's
+    holds in reservation mode (cart/reservations.py): units the cart
+    holds move out of reserved_stock as they leave stock. Raises
+    OutOfStock naming every product the shelf cannot cover.
+    """
+    held = {}
+    if reservations.enabled():
+        held = dict(
+            StockHold.objects.select_for_update().filter(cart_id=cart_id).values_list('product_id', 'quantity')
+        )
+    short = []
+    # Sorted, so concurrent checkouts take product row locks in the same order.
+    for product_id, quantity in sorted(quantities.items()):
+        mine = held.get(product_id, 0)
+        taken = Product.objects.filter(
+            id=product_id, stock__gte=F('reserved_stock') - mine + quantity,
+        ).update(stock=F('stock') - quantity, reserved_stock=F('reserved_stock') - mine, updated_at=Now())
+        if not taken:
+            short.append(product_id)
+    if short:
+        raise OutOfStock({
+            product_id: max(stock - reserved + held.get(product_id, 0), 0)
+            for product_id, stock, reserved in Product.objects.filter(id__in=short).values_list(
+                'id', 'stock', 'reserved_stock',
+            )
+        })
+    if held:
+        StockHold.objects.filter(cart_id=cart_id).delete()
+    transaction.on_commit(catalog_cache.bump_version)
+    # The in-stock facet only moves when a product sells out.
+    if Product.objects.filter(id__in=list(quantities), stock__lte=F('reserved_stock')).exists():
+        facets.changed()
+
+
+def place(user, address):
+    """
+    Turn ``user``'s cart into an Order shipped to ``address`` (address,
+    city, postal_code, country) and empty the cart. Must run inside a
+    transaction; raises EmptyCart or OutOfStock.
+    """
+    cart_lines = list(
+        CartItem.objects.filter(cart__user=user).select_related('product').order_by('id')
+    )
+    if not cart_lines:
+        raise EmptyCart()
+    cart_id = cart_lines[0].cart_id
+
+    quantities = {}
+    for line in cart_lines:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+    take_stock(cart_id, quantities)
+
+    order = Order.objects.create(
+        user=user,
+        total_price=sum(line.product.price * line.quantity for line in cart_lines),
+        **address
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=line.product, price=line.product.price, quantity=line.quantity)
+        for line in cart_lines
+    ])
+    sales.record_sale(order.created_at, quantities.items())
+    CartItem.objects.filter(cart_id=cart_id).delete()
+
+    prefetch_related_objects(
+        [order], Prefetch('items', queryset=OrderItem.objects.select_related('product__category').order_by('id')),
+    )
+    return order
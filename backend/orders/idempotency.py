@@ -0,0 +1,74 @@
+"""
+Idempotency-Key support for order creation.
+
+A client that may retry a checkout (flaky mobile networks) sends the same
+``Idempotency-Key`` header with every attempt. The first attempt claims
+the key by inserting its row at the start of the checkout transaction
+and stores its response there before committing, so:
+
+* a repeat after that commit finds the row and gets the stored response
+  back, without touching the cart or order tables;
+* a duplicate sent while the first is still in flight blocks on the
+  unique (user, key) index until the first commits or rolls back, and
+  then replays its response or goes ahead itself;
+* a key reused with a different request is refused with 422.
+
+A checkout that fails rolls its claim back with everything else, so
+only created orders are remembered. Keys are forgotten after
+IDEMPOTENCY_KEY_SECONDS by ``purge()`` (the purge_idempotency_keys
+command).
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def fingerprint(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def claim(user, key, payload):
+    """
+    Claim ``key`` for a request with ``payload``, inside the caller's
+    transaction. Returns None if the caller should go ahead (and then
+    remember() its response), or the Response to send instead.
+    """
+    request_hash = fingerprint(payload)
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(user=user, key=key, request_hash=request_hash)
+        return None
+    except IntegrityError:
+        pass
+    stored = IdempotencyKey.objects.get(user=user, key=key)
+    if stored.request_hash != request_hash:
+        return Response(
+            {"detail": f"This {HEADER} was already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def remember(user, key, response):
+    IdempotencyKey.objects.filter(user=user, key=key).update(
+        status_code=response.status_code, response=response.data,
+    )
+
+
+def purge(now=None):
+    """Forget keys older than IDEMPOTENCY_KEY_SECONDS; returns how many."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.IDEMPOTENCY_KEY_SECONDS)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Forget order Idempotency-Keys older than IDEMPOTENCY_KEY_SECONDS.'
+
+    def handle(self, *args, **options):
+        purged = idempotency.purge()
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} idempotency keys'))
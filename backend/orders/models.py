@@ -25,6 +25,12 @@ class Order(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Order history: one user's orders, newest first (keyset paged).
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user}"
 
@@ -43,6 +49,24 @@ class OrderItem(models.Model):
         return f"{self.product.name} ({self.quantity})"
 
 
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key for order creation, with a hash of the request
+    it came with and the response it got (orders/idempotency.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+
 class ShippingAddress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='addresses')
     address = models.CharField(max_length=200)
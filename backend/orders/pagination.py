@@ -0,0 +1,6 @@
+from products.pagination import KeysetPagination
+
+
+class OrderPagination(KeysetPagination):
+    """A user's orders, newest first."""
+    ordering = ('-created_at', '-id')
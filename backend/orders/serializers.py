@@ -1,5 +1,7 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Order, OrderItem, ShippingAddress
+from cart.serializers import CartProductSerializer
 from products.serializers import ProductSerializer
 
 
@@ -23,3 +25,24 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'total_price', 'status', 'created_at', 'items', 'address', 'city', 'postal_code', 'country']
+
+
+class OrderLineSerializer(OrderItemSerializer):
+    """An order line with its product's cart fields: no reviews, so no per-line queries."""
+    product = CartProductSerializer(read_only=True)
+
+
+class PlacedOrderSerializer(OrderSerializer):
+    """The checkout response, from the order checkout.place() returns."""
+    items = OrderLineSerializer(many=True, read_only=True)
+
+
+class OrderListSerializer(OrderSerializer):
+    """Order history entries; expects items prefetched (order_history_queryset())."""
+    items = OrderLineSerializer(many=True, read_only=True)
+
+
+def order_history_queryset():
+    """Orders with their lines, products and categories prefetched in one extra query."""
+    lines = OrderItem.objects.select_related('product__category').order_by('id')
+    return Order.objects.prefetch_related(Prefetch('items', queryset=lines))
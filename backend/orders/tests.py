@@ -1,3 +1,261 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from cart.models import Cart, CartItem, StockHold
+from products.models import Category, Product
+from .models import IdempotencyKey, Order, OrderItem
+from .views import CreateOrderView
+
+
+ADDRESS = {'address': '1 Tea Street', 'city': 'Leeds', 'postal_code': 'LS1', 'country': 'UK'}
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        # Catalog responses are cached; version bumps only run on commit.
+        cache.clear()
+        self.user = get_user_model().objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Tea', slug='tea')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def line(self, quantity, stock=10, price=4):
+        product = Product.objects.create(category=self.category, name='Tea', price=price, stock=stock)
+        CartItem.objects.create(cart=self.cart, product=product, quantity=quantity)
+        return product
+
+    def checkout(self):
+        return self.client.post('/api/orders/add/', ADDRESS)
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock
+
+    def test_order_takes_stock_and_empties_cart(self):
+        sencha = self.line(2, price=4)
+        mug = self.line(1, price=6)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_price'], '14.00')
+        self.assertEqual([item['quantity'] for item in response.data['items']], [2, 1])
+        self.assertNotIn('reviews', response.data['items'][0]['product'])
+        self.assertEqual((self.stock(sencha), self.stock(mug)), (8, 9))
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.checkout().status_code, 400)
+
+    def test_only_stock_updates_grow_with_the_cart(self):
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.checkout().status_code, 201)
+            return [q['sql'] for q in captured if not q['sql'].startswith('UPDATE')]
+
+        self.line(1)
+        one = queries()
+        for _ in range(10):
+            self.line(1)
+        self.assertEqual(len(queries()), len(one))
+
+    def test_short_line_rejects_whole_order(self):
+        sencha = self.line(2, stock=5)
+        mug = self.line(3, stock=2)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['unavailable'], [{'product_id': mug.id, 'available': 2}])
+        self.assertEqual((self.stock(sencha), self.stock(mug)), (5, 2))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_cached_product_shows_the_new_stock(self):
+        sencha = self.line(3, stock=10)
+        before = Product.objects.values_list('updated_at', flat=True).get(id=sencha.id)
+        self.assertEqual(self.client.get(f'/api/products/{sencha.id}/').data['stock'], 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(self.client.get(f'/api/products/{sencha.id}/').data['stock'], 7)
+        self.assertGreater(Product.objects.values_list('updated_at', flat=True).get(id=sencha.id), before)
+
+    @override_settings(CART_RESERVATIONS=True, CART_RESERVATION_SECONDS=600)
+    def test_checkout_consumes_the_carts_holds(self):
+        product = Product.objects.create(category=self.category, name='Tea', price=4, stock=3)
+        self.client.post('/api/cart/add/', {'product_id': product.id, 'quantity': 2})
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user('other', password='pw'))
+        self.assertEqual(other.post('/api/cart/add/', {'product_id': product.id}).status_code, 200)
+
+        self.assertEqual(self.checkout().status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved_stock), (1, 1))
+        self.assertEqual(StockHold.objects.get().cart.user.username, 'other')
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Tea', slug='tea')
+        product = Product.objects.create(category=category, name='Sencha', price=4, stock=10)
+        days = [1, 2, 2, 2, 3, 5, 8]
+        self.orders = []
+        for i, day in enumerate(days):
+            order = Order.objects.create(
+                user=self.user, total_price=8, status='PAID' if i % 2 else 'PENDING', **ADDRESS,
+            )
+            Order.objects.filter(id=order.id).update(
+                created_at=timezone.make_aware(datetime(2026, 3, day, 12)),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, price=4, quantity=1) for _ in range(i + 1)
+            ])
+            self.orders.append(order)
+        other = get_user_model().objects.create_user('other', password='pw')
+        Order.objects.create(user=other, total_price=1, **ADDRESS)
+
+    def walk(self, params):
+        ids = []
+        response = self.client.get('/api/orders/myorders/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(order['id'] for order in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_newest_first_through_ties(self):
+        expected = list(
+            Order.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(self.walk({'page_size': 2}), expected)
+
+    def test_page_is_two_queries_without_reviews(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/myorders/', {'page_size': 10})
+        self.assertEqual(len(response.data['results'][0]['items']), 7)
+        self.assertNotIn('reviews', response.data['results'][0]['items'][0]['product'])
+
+    def test_status_and_date_filters(self):
+        ids = [order.id for order in self.orders]
+        self.assertEqual(self.walk({'status': 'paid'}), [ids[5], ids[3], ids[1]])
+        # A "to" date includes that whole day.
+        self.assertEqual(self.walk({'from': '2026-03-02', 'to': '2026-03-03'}), ids[4:0:-1])
+        self.assertEqual(self.walk({'to': '2026-03-02T11:00:00Z'}), [ids[0]])
+        response = self.client.get('/api/orders/myorders/', {'from': 'last week'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('shopper', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Tea', slug='tea')
+        self.product = Product.objects.create(category=category, name='Sencha', price=4, stock=10)
+        CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=self.product, quantity=2)
+
+    def checkout(self, key='attempt-1', **address):
+        return self.client.post('/api/orders/add/', {**ADDRESS, **address}, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeat_replays_the_stored_response(self):
+        first = self.checkout()
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as captured:
+            repeat = self.checkout()
+        self.assertEqual((repeat.status_code, repeat.data), (201, first.data))
+        self.assertEqual(repeat['Idempotent-Replayed'], 'true')
+        self.assertFalse([q for q in captured if 'orders_order' in q['sql'] or 'cart_' in q['sql']])
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+        # Keys belong to a request: a different one is refused...
+        self.assertEqual(self.checkout(city='York').status_code, 422)
+        # ...and a new key is a new checkout, here of an empty cart.
+        self.assertEqual(self.checkout('attempt-2').status_code, 400)
+        self.assertEqual(self.checkout('').status_code, 400)
+
+    def test_failed_checkouts_are_not_remembered(self):
+        Product.objects.filter(id=self.product.id).update(stock=1)
+        self.assertEqual(self.checkout().status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        Product.objects.filter(id=self.product.id).update(stock=5)
+        self.assertEqual(self.checkout().status_code, 201)
+
+    def test_old_keys_are_purged(self):
+        self.checkout()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=mock.Mock())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    SHOPPERS = 12
+    STOCK = 5
+
+    def setUp(self):
+        category = Category.objects.create(name='Tea', slug='tea')
+        self.product = Product.objects.create(category=category, name='Sencha', price=4, stock=self.STOCK)
+        self.shoppers = []
+        for i in range(self.SHOPPERS):
+            user = get_user_model().objects.create_user(f'shopper{i}', password='pw')
+            CartItem.objects.create(cart=Cart.objects.create(user=user), product=self.product, quantity=1)
+            self.shoppers.append(user)
+
+    def checkout(self, user, **headers):
+        # Straight to the view, retrying while SQLite's shared-cache test
+        # database refuses the write lock (see AddToCartConcurrencyTests).
+        while True:
+            request = APIRequestFactory().post('/api/orders/add/', ADDRESS, format='json', **headers)
+            force_authenticate(request, user=user)
+            try:
+                return CreateOrderView.as_view()(request)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                if connection.connection.in_transaction:
+                    connection.connection.rollback()
+
+    def race(self, attempts):
+        """Run ``(user, headers)`` checkouts at once; their responses."""
+        start = threading.Barrier(len(attempts))
+        responses, errors = [], []
+
+        def shopper(user, headers):
+            try:
+                start.wait()
+                responses.append(self.checkout(user, **headers))
+            except Exception as error:  # surfaced below
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=shopper, args=attempt) for attempt in attempts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return responses
+
+    def test_low_stock_is_never_oversold(self):
+        statuses = [response.status_code for response in self.race([(user, {}) for user in self.shoppers])]
+        self.assertEqual(sorted(statuses), [201] * self.STOCK + [409] * (self.SHOPPERS - self.STOCK))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(OrderItem.objects.filter(product=self.product).count(), self.STOCK)
+
+    def test_concurrent_retries_place_one_order(self):
+        user = self.shoppers[0]
+        responses = self.race([(user, {'HTTP_IDEMPOTENCY_KEY': 'tap'})] * 6)
+        self.assertEqual({(response.status_code, response.data['id']) for response in responses},
+                         {(201, Order.objects.get().id)})
@@ -1,86 +1,117 @@
+from datetime import datetime, time, timedelta
+
+from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from rest_framework.exceptions import ValidationError
 from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from .models import Order, OrderItem
-from cart.models import Cart, CartItem
-from .serializers import OrderSerializer
+from . import checkout, idempotency
+from .models import Order
+from .pagination import OrderPagination
+from .serializers import OrderListSerializer, OrderSerializer, PlacedOrderSerializer, order_history_queryset
 
 
 class CreateOrderView(APIView):
+    """
+    Place an order from the user's cart. Clients that may retry should send
+    an Idempotency-Key header; repeats get the first response replayed.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
-        user = request.user
         data = request.data
-
-        try:
-            cart = Cart.objects.get(user=user)
-        except Cart.DoesNotExist:
+        key = request.headers.get(idempotency.HEADER)
+        if key is not None and not 0 < len(key) <= idempotency.MAX_KEY_LENGTH:
             return Response(
-                {"detail": "Cart is empty"},
+                {"detail": f"{idempotency.HEADER} must be 1 to {idempotency.MAX_KEY_LENGTH} characters"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart_items = CartItem.objects.filter(cart=cart)
-
-        if not cart_items.exists():
-            return Response(
-                {"detail": "Cart is empty"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         # Validate Address Fields
         required_fields = ['address', 'city', 'postal_code', 'country']
         for field in required_fields:
             if not data.get(field):
-                 return Response(
+                return Response(
                     {"detail": f"Please provide {field}"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        total_price = sum(
-            item.product.price * item.quantity
-            for item in cart_items
-        )
-
-        order = Order.objects.create(
-            user=user,
-            total_price=total_price,
-            address=data.get('address'),
-            city=data.get('city'),
-            postal_code=data.get('postal_code'),
-            country=data.get('country')
-        )
-
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                price=item.product.price,
-                quantity=item.quantity
+        address = {field: data.get(field) for field in required_fields}
+        try:
+            with transaction.atomic():
+                if key is not None:
+                    replay = idempotency.claim(request.user, key, address)
+                    if replay is not None:
+                        return replay
+                order = checkout.place(request.user, address)
+                serializer = PlacedOrderSerializer(order, context={'request': request})
+                response = Response(serializer.data, status=status.HTTP_201_CREATED)
+                if key is not None:
+                    idempotency.remember(request.user, key, response)
+        except checkout.EmptyCart:
+            return Response(
+                {"detail": "Cart is empty"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-        # 🔥 Clear cart after order creation
-        cart_items.delete()
-
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except checkout.OutOfStock as error:
+            return Response(
+                {
+                    "detail": str(error),
+                    "unavailable": [
+                        {"product_id": product_id, "available": available}
+                        for product_id, available in sorted(error.shortages.items())
+                    ],
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        return response
 
 
-class MyOrdersView(APIView):
+class MyOrdersView(generics.ListAPIView):
+    """
+    The user's orders, newest first, keyset-paged. Filters: ``status``, and
+    ``from`` / ``to`` as ISO dates or datetimes (a ``to`` date includes
+    that whole day).
+    """
     permission_classes = [permissions.IsAuthenticated]
-
-    def get(self, request):
-        orders = Order.objects.filter(
-            user=request.user
-        ).order_by("-created_at")
-
-
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+    serializer_class = OrderListSerializer
+    pagination_class = OrderPagination
+
+    def _moment_param(self, name):
+        """``(moment, is_date)`` for an ISO date or datetime parameter, or ``(None, False)``."""
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return None, False
+        try:
+            moment, day = parse_datetime(value), parse_date(value)
+        except ValueError:
+            moment = day = None
+        if moment is None and day is None:
+            raise ValidationError({name: 'A valid ISO 8601 date or datetime is required.'})
+        if moment is None:
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment, day is not None
+
+    def get_queryset(self):
+        queryset = order_history_queryset().filter(user=self.request.user)
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            queryset = queryset.filter(status=order_status.upper())
+        start, _ = self._moment_param('from')
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        end, is_date = self._moment_param('to')
+        if is_date:
+            queryset = queryset.filter(created_at__lt=end + timedelta(days=1))
+        elif end is not None:
+            queryset = queryset.filter(created_at__lte=end)
+        return queryset
 
 
 class OrderDetailView(APIView):
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        from . import cache, signals  # noqa: F401
+        checks.register(cache.check_shared_backend, checks.Tags.caches, deploy=True)
@@ -0,0 +1,196 @@
+"""
+Versioned response cache for the anonymous catalog endpoints.
+
+Every cache key embeds a catalog version number. Product, Category and
+Review writes bump the version after their transaction commits (see
+products/signals.py), which orphans every cached catalog response at once
+in O(1); orphaned entries simply age out. Works with any Django cache
+backend that supports ``incr`` (file-based, memcached, Redis), but with
+several worker processes the backend must be shared between them: a
+local-memory cache is per process, so a bump in one worker would not
+invalidate the others' entries (``check --deploy`` warns about this).
+
+The same key doubles as a strong ETag, and each bump records the catalog's
+Last-Modified time, so conditional GETs are answered with a 304 before any
+serializer (or, for lists, any query) runs.
+
+Facet counts (products/facets.py) have a version of their own, bumped only
+by writes that move a product between facet buckets, so reviews, sales and
+recommendation runs that bump the catalog version leave them cached.
+"""
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'catalog:version'
+FACETS_VERSION_KEY = 'catalog:facets-version'
+LAST_MODIFIED_KEY = 'catalog:last-modified'
+STATS_KEYS = {
+    'hits': 'catalog:stats:hits',
+    'misses': 'catalog:stats:misses',
+    'not_modified': 'catalog:stats:not-modified',
+}
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_version(key=VERSION_KEY):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version lost to eviction or a restart
+        # never reuses a number that older cached entries were keyed on.
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+    return version
+
+
+def _incr_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        get_version(key)
+        return cache.incr(key)
+
+
+def bump_version():
+    cache.set(LAST_MODIFIED_KEY, int(time.time()), None)
+    return _incr_version(VERSION_KEY)
+
+
+def get_facets_version():
+    return get_version(FACETS_VERSION_KEY)
+
+
+def bump_facets_version():
+    cache.set(LAST_MODIFIED_KEY, int(time.time()), None)
+    return _incr_version(FACETS_VERSION_KEY)
+
+
+def get_last_modified():
+    """Unix time of the last catalog write seen by this cache."""
+    last_modified = cache.get(LAST_MODIFIED_KEY)
+    if last_modified is None:
+        # Unknown after eviction or restart: claim "now" so clients revalidate.
+        cache.add(LAST_MODIFIED_KEY, int(time.time()), None)
+        last_modified = cache.get(LAST_MODIFIED_KEY)
+    return last_modified
+
+
+def make_key(prefix, request=None, extra=()):
+    """
+    Key for ``prefix`` (and the request's path and query) at the current
+    version; ``extra`` parts tie it to other state, such as the facets version.
+    """
+    parts = [prefix, str(get_version()), *map(str, extra)]
+    if request is not None:
+        params = request.query_params
+        # Normalize: sorted names, sorted values, empty values dropped.
+        normalized = sorted(
+            (name, sorted(v for v in params.getlist(name) if v != ''))
+            for name in params
+        )
+        # Bodies hold absolute links (next pages, images) built from the host.
+        parts.append(request.get_host())
+        parts.append(request.path)
+        parts.append(repr([(name, values) for name, values in normalized if values]))
+    digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'catalog:{prefix}:{digest}'
+
+
+def get_stats_sample_rate():
+    return getattr(settings, 'CATALOG_CACHE_STATS_SAMPLE_RATE', 0.01)
+
+
+def _count(outcome):
+    # Sampled, to keep most cache writes off the read path: each counted
+    # request stands for 1 / rate requests. A rate of 0 turns counting off.
+    rate = get_stats_sample_rate()
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    key, step = STATS_KEYS[outcome], max(round(1 / rate), 1)
+    try:
+        cache.incr(key, step)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, step)
+
+
+def get_stats():
+    hits = cache.get(STATS_KEYS['hits'], 0)
+    misses = cache.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {
+        'version': get_version(),
+        'hits': hits,
+        'misses': misses,
+        'not_modified': cache.get(STATS_KEYS['not_modified'], 0),
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'sample_rate': get_stats_sample_rate(),
+    }
+
+
+def check_shared_backend(app_configs, **kwargs):
+    """Deploy check: catalog invalidation needs a cache every worker process shares."""
+    if settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache':
+        return []
+    return [checks.Warning(
+        'The default cache is per-process local memory, so a catalog version bump in '
+        'one worker process does not invalidate cached responses in the others.',
+        hint='Use a shared backend (file-based, memcached, Redis) when running several workers.',
+        id='products.W001',
+    )]
+
+
+class CachedCatalogMixin:
+    """
+    Serve GET from the versioned cache with ETag/Last-Modified validators;
+    answer matching conditional requests with 304 and store successful
+    responses on a miss.
+    """
+    cache_prefix = 'response'
+
+    def get_cache_key_extra(self):
+        """Parts besides the catalog version that the response depends on."""
+        return ()
+
+    def get_last_modified(self):
+        return get_last_modified()
+
+    def get(self, request, *args, **kwargs):
+        key = make_key(self.cache_prefix, request, self.get_cache_key_extra())
+        etag = '"%s"' % key.rsplit(':', 1)[-1]
+        entry = cache.get(key)
+        last_modified = entry[1] if entry is not None else self.get_last_modified()
+
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified,
+        )
+        if not_modified is not None:
+            _count('not_modified')
+            not_modified['ETag'] = etag
+            return not_modified
+
+        if entry is not None:
+            _count('hits')
+            response = Response(entry[0])
+        else:
+            _count('misses')
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, (response.data, last_modified), get_timeout())
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
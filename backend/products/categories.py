@@ -0,0 +1,75 @@
+"""
+Denormalized active-product counts on the category tree.
+
+``Category.product_count`` covers a category and all its descendants.
+Single product saves and deletes adjust it through the receivers in
+products/signals.py; bulk writers (batch admin endpoints, imports) collect
+per-category changes and apply them once per batch. An adjustment touches
+the category and its ancestors, read straight off the materialized path,
+with one UPDATE per distinct delta. ``recount()`` rebuilds every count
+from scratch (``manage.py recount_categories``).
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from .models import PATH_DIGITS, Category, Product, path_ids
+
+
+def active_counts(products):
+    """``Counter({category_id: n})`` of active products; ``products`` is a queryset or iterable."""
+    if hasattr(products, 'values_list'):
+        return Counter(dict(
+            products.filter(is_active=True).values_list('category').annotate(n=Count('id')).order_by()
+        ))
+    return Counter(product.category_id for product in products if product.is_active)
+
+
+def apply_count_changes(before, after=None):
+    """
+    Add ``after - before`` (both ``{category_id: n}``) to the counts of each
+    category and its ancestors. With a single argument, it is the delta.
+    """
+    changes = Counter(before) if after is None else Counter(after)
+    if after is not None:
+        changes.subtract(before)
+    changes = {category_id: delta for category_id, delta in changes.items() if delta}
+    if not changes:
+        return
+
+    totals = Counter()
+    for category_id, path in Category.objects.filter(id__in=changes).values_list('id', 'path'):
+        for ancestor_id in path_ids(path):
+            totals[ancestor_id] += changes[category_id]
+
+    by_delta = defaultdict(list)
+    for category_id, delta in totals.items():
+        if delta:
+            by_delta[delta].append(category_id)
+    for delta, ids in by_delta.items():
+        Category.objects.filter(id__in=ids).update(product_count=F('product_count') + delta)
+
+
+def init_root_paths(categories):
+    """Give categories inserted without save() (bulk_create) their root path."""
+    categories.filter(path='').update(
+        path=Concat(LPad(Cast('id', CharField()), PATH_DIGITS, Value('0')), Value('/')),
+        depth=0,
+    )
+
+
+def recount():
+    """Recompute every product_count from the products table; returns the number corrected."""
+    direct = active_counts(Product.objects.all())
+    categories = list(Category.objects.only('id', 'path', 'product_count'))
+    totals = Counter()
+    for category in categories:
+        for ancestor_id in path_ids(category.path):
+            totals[ancestor_id] += direct[category.id]
+
+    drifted = [c for c in categories if c.product_count != totals[c.id]]
+    for category in drifted:
+        category.product_count = totals[category.id]
+    Category.objects.bulk_update(drifted, ['product_count'], batch_size=1000)
+    return len(drifted)
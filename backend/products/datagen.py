@@ -0,0 +1,134 @@
+"""
+Row generators for ``manage.py generate_dataset``.
+
+Everything here is plain Python with no Django imports, so chunks can be
+built in spawned worker processes (like products/images.py) while the
+parent process does the inserts. Rows refer to users, categories and
+products by their index in the generated set; the parent maps indexes to
+primary keys.
+
+Distributions are skewed the way real shops are: category sizes and
+product popularity follow a Zipf-like curve, prices are log-normal,
+review counts are heavy tailed and ratings lean towards 4 and 5 stars.
+"""
+import math
+import random
+
+
+WORDS = (
+    'wireless', 'bluetooth', 'camera', 'laptop', 'phone', 'charger', 'leather',
+    'running', 'shoes', 'watch', 'gaming', 'console', 'headphones', 'speaker',
+    'portable', 'ultra', 'smart', 'fitness', 'cotton', 'jacket', 'steel',
+    'kitchen', 'mixer', 'organic', 'premium', 'compact', 'travel', 'backpack',
+)
+SYLLABLES = ('ka', 'lo', 'mi', 'ner', 'tas', 'vo', 'ri', 'zen', 'pa', 'dul', 'shi', 'gro')
+RATING_WEIGHTS = (5, 4, 8, 25, 58)  # 1..5 stars, in percent
+ORDER_STATUSES = (('SHIPPED', 60), ('PAID', 25), ('PENDING', 15))
+ADDRESSES = (
+    ('Berlin', 'Germany'), ('Paris', 'France'), ('London', 'United Kingdom'),
+    ('Madrid', 'Spain'), ('Toronto', 'Canada'), ('Austin', 'United States'),
+    ('Osaka', 'Japan'), ('Mumbai', 'India'),
+)
+MAX_PRICE_CENTS = 5_000_000
+
+_prices = None
+
+
+def init_worker(prices):
+    """Pool initializer: product prices in cents, indexed like the products."""
+    global _prices
+    _prices = prices
+
+
+def chunk_rng(seed, start):
+    # One independent, reproducible stream per chunk, whichever worker runs it.
+    return random.Random(seed * 1_000_003 + start)
+
+
+def zipf_index(rng, n):
+    """Index in ``range(n)``; index k is drawn roughly in proportion to 1 / (k + 1)."""
+    return min(n - 1, int(n ** rng.random()) - 1)
+
+
+def heavy_tail(rng, mean, cap, alpha=1.5):
+    """Pareto-distributed count with roughly the given mean: mostly small, a few huge."""
+    return min(cap, int((rng.paretovariate(alpha) - 1) * mean * (alpha - 1)))
+
+
+def vocabulary(seed, size=5000):
+    rng = random.Random(seed)
+    return list(WORDS) + [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size)]
+
+
+def product_chunk(seed, start, count, n_categories, n_users, mean_reviews):
+    """
+    Build ``count`` products starting at index ``start`` together with their
+    reviews, so rating aggregates are consistent from the first insert.
+
+    Returns ``(products, reviews)``: products are
+    ``(category_index, name, description, price_cents, stock, rating_sum, num_reviews)``
+    and reviews ``(product_offset, user_index, rating, comment)``.
+    """
+    rng = chunk_rng(seed, start)
+    words = vocabulary(seed)
+    products, reviews = [], []
+    for offset in range(count):
+        name = ' '.join([rng.choice(WORDS)] + rng.choices(words, k=2)).title()
+        description = ' '.join(rng.choices(words, k=rng.randint(8, 40)))
+        price = min(MAX_PRICE_CENTS, max(99, round(math.exp(rng.gauss(8.0, 1.1)))))
+        stock = 0 if rng.random() < 0.1 else 1 + int(rng.expovariate(1 / 40))
+
+        n_reviews = heavy_tail(rng, mean_reviews, min(n_users, 1000)) if n_users else 0
+        ratings = rng.choices((1, 2, 3, 4, 5), weights=RATING_WEIGHTS, k=n_reviews)
+        for user_index, rating in zip(rng.sample(range(n_users), n_reviews), ratings):
+            comment = ' '.join(rng.choices(words, k=rng.randint(3, 25))) if rng.random() < 0.6 else None
+            reviews.append((offset, user_index, rating, comment))
+
+        products.append((
+            zipf_index(rng, n_categories), name, description, price, stock,
+            sum(ratings), n_reviews,
+        ))
+    return products, reviews
+
+
+def _basket(rng, n_products, max_items):
+    size = min(n_products, rng.choices(range(1, max_items + 1), weights=range(max_items, 0, -1))[0])
+    picked = {}
+    while len(picked) < size:
+        picked.setdefault(zipf_index(rng, n_products), 1 if rng.random() < 0.8 else rng.randint(2, 4))
+    return list(picked.items())
+
+
+def order_chunk(seed, start, count, mean_orders, cart_ratio, order_days):
+    """
+    Build orders and carts for users ``start .. start + count - 1``; needs
+    :func:`init_worker` to have run with the product prices.
+
+    Returns ``(orders, carts)``: orders are
+    ``(user_index, status, address, city, postal_code, country, age_seconds, items)``
+    with items ``[(product_index, price_cents, quantity)]``, placed up to
+    ``order_days`` in the past and denser towards today, like a growing shop;
+    carts are ``(user_index, [(product_index, quantity)])``.
+    """
+    rng = chunk_rng(seed, start)
+    n_products = len(_prices)
+    statuses, status_weights = zip(*ORDER_STATUSES)
+    window = order_days * 86400
+    orders, carts = [], []
+    if not n_products:
+        return orders, carts
+    for user_index in range(start, start + count):
+        city, country = rng.choice(ADDRESSES)
+        address = f'{rng.randint(1, 300)} {rng.choice(WORDS).title()} Street'
+        postal_code = f'{rng.randint(10000, 99999)}'
+        for _ in range(heavy_tail(rng, mean_orders, 500)):
+            items = [
+                (product_index, _prices[product_index], quantity)
+                for product_index, quantity in _basket(rng, n_products, 5)
+            ]
+            status = rng.choices(statuses, weights=status_weights)[0]
+            age_seconds = int(window * rng.random() ** 2)
+            orders.append((user_index, status, address, city, postal_code, country, age_seconds, items))
+        if rng.random() < cart_ratio:
+            carts.append((user_index, _basket(rng, n_products, 6)))
+    return orders, carts
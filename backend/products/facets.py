@@ -0,0 +1,112 @@
+"""
+Facet counts for the product listing.
+
+Counts cover the whole active catalog and are computed in one aggregate
+query plus a read of the denormalized category counts, then cached under
+the facets version (products/cache.py). That version is bumped only when
+a write changes what some product contributes to the counts (see
+``facet_state()``): a category, price bucket, rating bucket or in-stock
+flag, or a category rename. Reviews that leave the rating bucket alone,
+sales and recommendation runs keep the counts cached, so listing
+requests almost never run the aggregate themselves.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from . import cache as catalog_cache
+from .models import Category, Product
+
+
+# (label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = (
+    ('0-1000', None, 1000),
+    ('1000-5000', 1000, 5000),
+    ('5000-20000', 5000, 20000),
+    ('20000-50000', 20000, 50000),
+    ('50000+', 50000, None),
+)
+
+# "N stars & up", matching the min_rating filter.
+RATING_BUCKETS = (4, 3, 2, 1)
+
+
+def _price_q(low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def price_bucket(price):
+    price = Decimal(str(price))
+    for label, low, high in PRICE_BUCKETS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return label
+    return None
+
+
+def rating_bucket(rating):
+    """How many of the RATING_BUCKETS ``rating`` counts in."""
+    if rating is None:
+        return 0
+    rating = Decimal(str(rating))
+    return sum(1 for stars in RATING_BUCKETS if rating >= stars)
+
+
+def facet_state(is_active, category_id, price, rating, available):
+    """What one product contributes to the facet counts; None if nothing."""
+    if not is_active:
+        return None
+    return (category_id, price_bucket(price), rating_bucket(rating), available > 0)
+
+
+def changed():
+    """Schedule a facets version bump for when the current transaction commits."""
+    transaction.on_commit(catalog_cache.bump_facets_version)
+
+
+def compute_facet_counts():
+    active = Product.objects.filter(is_active=True)
+
+    aggregates = {
+        f'price_{label}': Count('id', filter=_price_q(low, high))
+        for label, low, high in PRICE_BUCKETS
+    }
+    aggregates.update({
+        f'rating_{stars}': Count('id', filter=Q(rating__gte=stars))
+        for stars in RATING_BUCKETS
+    })
+    aggregates['in_stock'] = Count('id', filter=Q(stock__gt=F('reserved_stock')))
+    totals = active.aggregate(**aggregates)
+
+    # Denormalized subtree counts (products/categories.py): no GROUP BY.
+    categories = Category.objects.order_by('path').values(
+        'slug', 'name', 'depth', count=F('product_count'),
+    )
+
+    return {
+        'category': list(categories),
+        'price': [
+            {'range': label, 'min': low, 'max': high, 'count': totals[f'price_{label}']}
+            for label, low, high in PRICE_BUCKETS
+        ],
+        'rating': [
+            {'min_rating': stars, 'count': totals[f'rating_{stars}']}
+            for stars in RATING_BUCKETS
+        ],
+        'in_stock': totals['in_stock'],
+    }
+
+
+def get_facet_counts():
+    key = f'catalog:facets:{catalog_cache.get_facets_version()}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facet_counts()
+        cache.set(key, facets, catalog_cache.get_timeout())
+    return facets
@@ -0,0 +1,110 @@
+"""
+Flat product feed for partner syndication (``/api/products/feed/``).
+
+One compact row per product, read with ``.iterator()`` (a server-side
+cursor where the backend has them) and written out in chunks, so memory
+stays flat however large the catalog is. Rows carry the category inline
+and an absolute image URL; no reviews, no nested objects.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import filepath_to_uri
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+
+COLUMNS = (
+    'id', 'sku', 'name', 'description', 'price', 'stock', 'category', 'category_name',
+    'image_url', 'rating', 'num_reviews', 'is_active', 'updated_at',
+)
+QUERY_FIELDS = (
+    'id', 'sku', 'name', 'description', 'price', 'stock', 'category__slug', 'category__name',
+    'image', 'rating', 'numReviews', 'is_active', 'updated_at',
+)
+CHUNK_ROWS = 500
+
+
+# The feed body is written by the view; these only take part in content
+# negotiation (?format=ndjson|csv or Accept) and render error payloads.
+class NDJSONRenderer(JSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(JSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+def parse_since(value):
+    """``since`` as an aware datetime: ISO 8601 or Unix seconds. None if absent."""
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except (OverflowError, ValueError):
+        pass
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({'since': 'Use an ISO 8601 datetime or a Unix timestamp.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def rows(products, media_base):
+    """Feed rows for ``products``; ``media_base`` is the absolute MEDIA_URL."""
+    for (
+        product_id, sku, name, description, price, stock, category, category_name,
+        image, rating, num_reviews, is_active, updated_at,
+    ) in products.values_list(*QUERY_FIELDS).iterator(chunk_size=2000):
+        yield (
+            product_id, sku, name, description, str(price), stock, category, category_name,
+            media_base + filepath_to_uri(image) if image else None,
+            str(rating) if rating is not None else None,
+            num_reviews or 0, is_active, updated_at.isoformat(),
+        )
+
+
+def _chunked(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson(rows):
+    for chunk in _chunked(rows):
+        yield ''.join(
+            json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, separators=(',', ':')) + '\n'
+            for row in chunk
+        ).encode('utf-8')
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in _chunked(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only: an empty feed.
+        yield buffer.getvalue().encode('utf-8')
+
+
+ENCODERS = {'ndjson': ndjson, 'csv': csv_lines}
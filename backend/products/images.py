@@ -0,0 +1,127 @@
+"""
+Resized JPEG and WebP variants of product images.
+
+Uploads through the admin create/update views queue a job on a process
+pool (Pillow resizing is CPU bound and would block the request). The
+worker only touches files under MEDIA_ROOT, so it needs no Django setup;
+the parent process records the finished variants on the product when the
+job completes. ``manage.py generate_image_variants`` backfills existing
+images on the same pool.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1024)
+VARIANT_FORMATS = {
+    # format: (file extension, Pillow save options)
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'variants'
+
+_executor = None
+
+
+def variant_name(image_name, width, fmt):
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    extension = VARIANT_FORMATS[fmt][0]
+    return os.path.join(directory, VARIANT_DIR, f'{stem}-{width}w.{extension}').replace(os.sep, '/')
+
+
+def render_variants(media_root, image_name):
+    """
+    Write every variant of ``image_name`` and return
+    ``{format: {width: variant_name}}``. Runs in a worker process.
+    Images are never upscaled: widths are capped at the original width.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {fmt: {} for fmt in VARIANT_FORMATS}
+    with Image.open(os.path.join(media_root, image_name)) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for width in VARIANT_WIDTHS:
+            target = min(width, original.width)
+            if str(target) in variants['jpeg']:
+                break
+            height = max(1, round(original.height * target / original.width))
+            resized = original.resize((target, height), Image.LANCZOS)
+            for fmt, (_extension, options) in VARIANT_FORMATS.items():
+                name = variant_name(image_name, target, fmt)
+                path = os.path.join(media_root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                image = resized
+                if fmt == 'jpeg' and image.mode != 'RGB':
+                    image = image.convert('RGB')
+                image.save(path, fmt.upper(), **options)
+                variants[fmt][str(target)] = name
+    return variants
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            # Fresh interpreters: never fork a process holding DB connections.
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def save_variants(product_id, image_name, variants):
+    from django.utils import timezone
+
+    from . import cache as catalog_cache
+    from .models import Product
+
+    # Skip if the image was replaced while the job ran.
+    updated = Product.objects.filter(pk=product_id, image=image_name).update(
+        image_variants=variants, updated_at=timezone.now(),
+    )
+    if updated:
+        catalog_cache.bump_version()
+
+
+def _on_done(product_id, image_name, future):
+    try:
+        save_variants(product_id, image_name, future.result())
+    except Exception:
+        logger.exception('Image variants failed for product %s (%s)', product_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def queue_variants(product):
+    """Render variants for ``product.image`` in the background once committed."""
+    if not product.image:
+        return
+    product_id, image_name = product.pk, product.image.name
+
+    def submit():
+        future = get_executor().submit(render_variants, str(settings.MEDIA_ROOT), image_name)
+        future.add_done_callback(lambda f: _on_done(product_id, image_name, f))
+
+    transaction.on_commit(submit)
+
+
+def srcset(variants, build_url):
+    """``{format: "url 320w, url 640w"}`` for <source>/<img> srcset attributes."""
+    return {
+        fmt: ', '.join(
+            f'{build_url(name)} {width}w'
+            for width, name in sorted(by_width.items(), key=lambda item: int(item[0]))
+        )
+        for fmt, by_width in (variants or {}).items()
+        if by_width
+    }
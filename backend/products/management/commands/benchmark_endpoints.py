@@ -0,0 +1,291 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem, ShippingAddress
+from products import cache as catalog_cache
+from products.models import Product, Review
+
+
+URLCONFS = ('products.urls', 'cart.urls', 'orders.urls')
+BATCH_SIZE = 50
+
+
+def scenarios(f):
+    """
+    ``{route: [(label, method, user, path kwargs, data)]}`` for the fixtures
+    ``f``. ``user`` is None (anonymous), 'shopper' or 'admin'; ``data`` is
+    the query string for GET and the JSON body otherwise.
+    """
+    product = {'pk': f['product'].pk}
+    batch = [product.pk for product in f['batch']]
+    new_product = {
+        'name': 'Benchmark product', 'price': '19.99', 'stock': 5,
+        'category_id': f['product'].category_id,
+    }
+    address = {'address': '1 Bench Street', 'city': 'Berlin', 'postal_code': '10115', 'country': 'Germany'}
+    return {
+        'api/products/': [
+            ('page', 'get', None, {}, {}),
+            ('keyword', 'get', None, {}, {'keyword': f['keyword']}),
+            ('category by price', 'get', None, {}, {'category': f['product'].category.slug, 'sort': 'price'}),
+            ('filters', 'get', None, {}, {'min_rating': 4, 'in_stock': 'true', 'min_price': 10}),
+            ('cursor', 'get', None, {}, {'pagination': 'cursor'}),
+            ('trending', 'get', None, {}, {'sort': 'trending'}),
+            ('category best sellers', 'get', None, {}, {'category': f['product'].category.slug, 'sort': 'bestselling'}),
+        ],
+        'api/products/feed/': [
+            ('full ndjson', 'get', None, {}, {}),
+            ('since 1h csv', 'get', None, {}, {'format': 'csv', 'since': f['hour_ago']}),
+        ],
+        'api/products/suggest/': [
+            ('1 letter', 'get', None, {}, {'q': f['keyword'][:1]}),
+            ('word', 'get', None, {}, {'q': f['keyword']}),
+            ('two words', 'get', None, {}, {'q': ' '.join(f['product'].name.lower().split()[:2])[:-1]}),
+        ],
+        'api/products/<int:pk>/': [('detail', 'get', None, product, {})],
+        'api/products/<int:pk>/related/': [('related', 'get', None, product, {})],
+        'api/products/<int:pk>/reviews/': [
+            ('newest', 'get', None, product, {}),
+            ('create', 'post', 'admin', product, {'rating': 4, 'comment': 'Solid.'}),
+        ],
+        'api/categories/': [
+            ('tree', 'get', None, {}, {}),
+            ('subtree', 'get', None, {}, {'subtree': f['product'].category.slug}),
+        ],
+        'api/admin/products/create/': [('create', 'post', 'admin', {}, new_product)],
+        'api/admin/products/update/<int:pk>/': [('update', 'patch', 'admin', product, {'price': '21.50'})],
+        'api/admin/products/delete/<int:pk>/': [('delete', 'delete', 'admin', product, {})],
+        'api/admin/products/batch/create/': [
+            (f'create {BATCH_SIZE}', 'post', 'admin', {}, [dict(new_product, name=f'Bench {i}') for i in range(BATCH_SIZE)]),
+        ],
+        'api/admin/products/batch/update/': [
+            (f'update {len(batch)}', 'post', 'admin', {}, [{'id': pk, 'stock': 7} for pk in batch]),
+        ],
+        'api/admin/products/batch/delete/': [(f'delete {len(batch)}', 'post', 'admin', {}, {'ids': batch})],
+        'api/admin/catalog/cache/': [('stats', 'get', 'admin', {}, {})],
+        'api/cart/': [('view', 'get', 'shopper', {}, {}), ('guest view', 'get', None, {}, {})],
+        'api/cart/add/': [
+            ('add', 'post', 'shopper', {}, {'product_id': f['product'].pk, 'quantity': 1}),
+            ('guest add', 'post', None, {}, {'product_id': f['product'].pk, 'quantity': 1}),
+        ],
+        'api/cart/update/': [('update', 'post', 'shopper', {}, {'item_id': f['cart_item'].pk, 'quantity': 3})],
+        'api/cart/remove/': [('remove', 'post', 'shopper', {}, {'item_id': f['cart_item'].pk})],
+        'api/cart/batch/': [
+            ('add batch', 'post', 'shopper', {}, [{'op': 'add', 'product_id': pk, 'quantity': 1} for pk in batch]),
+            ('set and remove', 'post', 'shopper', {}, [
+                {'op': 'set', 'product_id': batch[0], 'quantity': 4}, {'op': 'remove', 'product_id': batch[1]},
+            ]),
+        ],
+        'api/orders/add/': [('checkout', 'post', 'shopper', {}, address)],
+        'api/orders/myorders/': [
+            ('list', 'get', 'shopper', {}, {}),
+            ('filtered', 'get', 'shopper', {}, {'status': 'pending', 'from': '2020-01-01'}),
+        ],
+        'api/orders/<int:pk>/': [
+            ('detail', 'get', 'shopper', {'pk': f['order'].pk}, {}),
+            ('status', 'patch', 'shopper', {'pk': f['order'].pk}, {'status': 'PAID'}),
+        ],
+        'api/orders/addresses/': [
+            ('list', 'get', 'shopper', {}, {}),
+            ('create', 'post', 'shopper', {}, address),
+        ],
+        'api/orders/addresses/<int:pk>/': [('delete', 'delete', 'shopper', {'pk': f['address'].pk}, {})],
+    }
+
+
+def routes():
+    """Every route string under the benchmarked URLconfs, in urls.py order."""
+    found = []
+    for resolver in get_resolver().url_patterns:
+        if isinstance(resolver, URLResolver) and getattr(resolver.urlconf_module, '__name__', None) in URLCONFS:
+            found.extend(str(resolver.pattern) + str(pattern.pattern) for pattern in resolver.url_patterns)
+    return found
+
+
+def percentile(timings, pct):
+    ordered = sorted(timings)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every products, cart and orders endpoint through the test client and '
+        'write p50/p95/p99 latency and query counts to a JSON report. Writes are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--output', default='endpoint-benchmark.json')
+        parser.add_argument('--compare', help='Earlier report to print deltas against.')
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Let the catalog response cache serve repeats (default: bump its version before each request).',
+        )
+        parser.add_argument('--only', help='Only routes containing this substring.')
+
+    def handle(self, *args, **options):
+        if not Product.objects.filter(is_active=True).exists():
+            raise CommandError('No active products; run generate_dataset first.')
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            fixtures = self.fixtures()
+            results, uncovered = self.run(fixtures, options)
+            # Nothing the benchmark created or changed survives.
+            transaction.set_rollback(True)
+
+        report = {
+            'commit': current_commit(),
+            'generated_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'rows': {
+                'products': Product.objects.count(),
+                'reviews': Review.objects.count(),
+                'users': get_user_model().objects.count(),
+                'orders': Order.objects.count(),
+            },
+            'repeat': options['repeat'],
+            'warm_cache': options['warm_cache'],
+            'endpoints': results,
+            'uncovered': uncovered,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as out:
+            json.dump(report, out, indent=2)
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = {
+                    (row['method'], row['route'], row['label']): row for row in json.load(f)['endpoints']
+                }
+        self.print_table(results, baseline)
+        for route in uncovered:
+            self.stderr.write(f'No benchmark scenario for {route}')
+        self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+    def fixtures(self):
+        """Pick representative rows and add whatever the scenarios need, inside the rolled back transaction."""
+        User = get_user_model()
+        # The most reviewed product: the heaviest detail and review pages.
+        product = Product.objects.filter(is_active=True).select_related('category').order_by('-numReviews', 'id').first()
+        admin = User.objects.create_user('benchmark-admin', password='unused', is_admin=True)
+
+        latest_order = Order.objects.order_by('-id').select_related('user').first()
+        shopper = latest_order.user if latest_order else User.objects.create_user('benchmark-shopper', password='unused')
+        cart, _ = Cart.objects.get_or_create(user=shopper)
+        cart_item = cart.items.first() or CartItem.objects.create(cart=cart, product=product, quantity=1)
+        order = latest_order
+        if order is None:
+            order = Order.objects.create(
+                user=shopper, total_price=product.price,
+                address='1 Bench Street', city='Berlin', postal_code='10115', country='Germany',
+            )
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=1)
+
+        return {
+            'product': product,
+            'keyword': product.name.split()[0].lower(),
+            'hour_ago': (timezone.now() - timedelta(hours=1)).isoformat(),
+            'batch': list(Product.objects.filter(is_active=True).order_by('-id')[:BATCH_SIZE]),
+            'admin': admin,
+            'shopper': shopper,
+            'cart_item': cart_item,
+            'order': order,
+            'address': ShippingAddress.objects.create(
+                user=shopper, address='1 Bench Street', city='Berlin', postal_code='10115', country='Germany',
+            ),
+        }
+
+    def run(self, fixtures, options):
+        client = Client()
+        tokens = {
+            'admin': f'Bearer {AccessToken.for_user(fixtures["admin"])}',
+            'shopper': f'Bearer {AccessToken.for_user(fixtures["shopper"])}',
+        }
+        table = scenarios(fixtures)
+        results, uncovered = [], []
+        for route in routes():
+            if options['only'] and options['only'] not in route:
+                continue
+            if route not in table:
+                uncovered.append(route)
+                continue
+            for label, method, user, kwargs, data in table[route]:
+                path = '/' + route
+                for name, value in kwargs.items():
+                    path = path.replace(f'<int:{name}>', str(value))
+                headers = {'Authorization': tokens[user]} if user else {}
+                if method == 'get':
+                    def call():
+                        return client.get(path, data, headers=headers)
+                else:
+                    def call():
+                        return getattr(client, method)(path, json.dumps(data), content_type='application/json', headers=headers)
+
+                timings, queries, status = [], set(), None
+                # One untimed warm-up, so imports and first-use caches don't skew p99.
+                for i in range(options['repeat'] + 1):
+                    if not options['warm_cache']:
+                        catalog_cache.bump_version()
+                    with transaction.atomic():
+                        with CaptureQueriesContext(connection) as captured:
+                            start = time.perf_counter()
+                            response = call()
+                            if response.streaming:
+                                # Streamed bodies are produced while being read.
+                                b''.join(response.streaming_content)
+                            elapsed = (time.perf_counter() - start) * 1000
+                        transaction.set_rollback(True)
+                    if i:
+                        timings.append(elapsed)
+                        queries.add(len(captured))
+                    status = response.status_code
+
+                results.append({
+                    'route': route,
+                    'label': label,
+                    'method': method.upper(),
+                    'status': status,
+                    'queries': max(queries),
+                    'queries_min': min(queries),
+                    'mean_ms': round(statistics.fmean(timings), 3),
+                    'p50_ms': round(percentile(timings, 50), 3),
+                    'p95_ms': round(percentile(timings, 95), 3),
+                    'p99_ms': round(percentile(timings, 99), 3),
+                })
+        return results, uncovered
+
+    def print_table(self, results, baseline):
+        for row in results:
+            line = (
+                f'{row["method"]:>6} {row["route"]:<40} {row["label"]:<18} {row["status"]:>3} '
+                f'{row["queries"]:>4}q  p50 {row["p50_ms"]:8.2f}  p95 {row["p95_ms"]:8.2f}  p99 {row["p99_ms"]:8.2f} ms'
+            )
+            before = baseline.get((row['method'], row['route'], row['label']))
+            if before:
+                change = (row['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                line += f'  p50 {change:+6.1f}%  queries {row["queries"] - before["queries"]:+d}'
+            self.stdout.write(line)
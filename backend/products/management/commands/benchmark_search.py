@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import categories, search
+from products.models import Category, Product
+
+
+WORDS = (
+    'wireless', 'bluetooth', 'camera', 'laptop', 'phone', 'charger', 'leather',
+    'running', 'shoes', 'watch', 'gaming', 'console', 'headphones', 'speaker',
+    'portable', 'ultra', 'smart', 'fitness', 'cotton', 'jacket', 'steel',
+    'kitchen', 'mixer', 'organic', 'premium', 'compact', 'travel', 'backpack',
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare full-text search latency against the old name__icontains scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--populate', type=int, default=0,
+            help='Bulk insert this many synthetic products (category "bench") first.',
+        )
+        parser.add_argument(
+            '--keyword', action='append', dest='keywords',
+            help='Keyword to search for (repeatable).',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=9)
+
+    def handle(self, *args, **options):
+        if options['populate']:
+            self.populate(options['populate'])
+
+        keywords = options['keywords'] or ['camera', 'wireless head', 'smart watch']
+        page_size = options['page_size']
+        base = Product.objects.filter(is_active=True).select_related('category')
+
+        def icontains(keyword):
+            queryset = base.filter(name__icontains=keyword).order_by('id')
+            return queryset.count(), list(queryset[:page_size])
+
+        def full_text(keyword):
+            queryset = search.search(base, keyword)
+            return queryset.count(), list(queryset[:page_size])
+
+        self.stdout.write(f'{Product.objects.count()} products, {options["repeat"]} runs per keyword')
+        for keyword in keywords:
+            for label, fn in (('icontains', icontains), ('search', full_text)):
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    hits, _page = fn(keyword)
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f'{keyword!r:>18} {label:>10}: {hits:>8} hits  '
+                    f'median {statistics.median(timings):8.2f} ms  '
+                    f'max {max(timings):8.2f} ms'
+                )
+
+    def populate(self, count, batch_size=10000):
+        category, _ = Category.objects.get_or_create(slug='bench', defaults={'name': 'Bench'})
+        rng = random.Random(42)
+        # A few thousand pseudo-words keep terms selective, like a real catalog.
+        syllables = ['ka', 'lo', 'mi', 'ner', 'tas', 'vo', 'ri', 'zen', 'pa', 'dul', 'shi', 'gro']
+        vocabulary = list(WORDS) + [
+            ''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(5000)
+        ]
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Product.objects.bulk_create([
+                Product(
+                    category=category,
+                    name=' '.join([rng.choice(WORDS)] + rng.choices(vocabulary, k=2)).title(),
+                    description=' '.join(rng.choices(vocabulary, k=20)),
+                    price=rng.randint(100, 100000) / 100,
+                    stock=rng.randint(0, 50),
+                )
+                for _ in range(size)
+            ])
+            created += size
+            self.stdout.write(f'Inserted {created}/{count}')
+
+        # bulk_create skips post_save, so index and count everything in one pass.
+        with transaction.atomic():
+            search.rebuild_index()
+            categories.recount()
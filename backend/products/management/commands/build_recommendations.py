@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from products import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Count co-purchases in orders placed since the last run and recompute the '
+        '"frequently bought together" neighbours of the products in them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recount every order from scratch.')
+        parser.add_argument('--top-k', type=int, default=recommendations.DEFAULT_TOP_K)
+        parser.add_argument('--min-count', type=int, default=1,
+                            help='Ignore pairs bought together in fewer orders than this.')
+        parser.add_argument('--settle-seconds', type=int, default=60,
+                            help='Leave orders younger than this for the next run.')
+
+    def handle(self, *args, **options):
+        run = recommendations.build(
+            full=options['full'],
+            top_k=options['top_k'],
+            min_count=options['min_count'],
+            settle_seconds=options['settle_seconds'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Full" if run.full else "Incremental"} run: {run.orders} orders, '
+            f'{run.products} products rescored, watermark order {run.last_order_id}'
+        ))
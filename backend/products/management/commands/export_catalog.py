@@ -0,0 +1,90 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat, Now
+
+from products.models import Product
+from products.signals import products_bulk_changed
+
+
+# Same columns import_catalog reads, so an export can be re-imported.
+COLUMNS = ('sku', 'name', 'description', 'price', 'stock', 'category', 'category_name', 'is_active', 'image')
+# Products created before imports (or through the API) have no sku, and
+# import_catalog upserts by sku (skipping rows without one). They export
+# with an empty sku unless --assign-skus first gives them 'legacy-<id>'.
+LEGACY_SKU_PREFIX = 'legacy-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream the catalog out as CSV or JSONL with constant memory. '
+        'Read-only unless --assign-skus is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for stdout.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--active-only', action='store_true')
+        parser.add_argument(
+            '--assign-skus', action='store_true',
+            help=f'First give products without a sku {LEGACY_SKU_PREFIX}<id> (a catalog write), '
+                 'so every exported row re-imports onto its product.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        products = Product.objects.order_by('id')
+        if options['active_only']:
+            products = products.filter(is_active=True)
+        self.assigned = 0
+        if options['assign_skus']:
+            self.assign_skus(products, options['chunk_size'])
+        rows = products.values_list(
+            'sku', 'name', 'description', 'price', 'stock',
+            'category__slug', 'category__name', 'is_active', 'image',
+        ).iterator(chunk_size=options['chunk_size'])
+
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        count = 0
+        try:
+            if fmt == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(COLUMNS)
+                for row in rows:
+                    writer.writerow(('' if row[0] is None else row[0], *row[1:]))
+                    count += 1
+            else:
+                for row in rows:
+                    record = dict(zip(COLUMNS, row))
+                    record['sku'] = record['sku'] or ''
+                    record['price'] = str(record['price'])
+                    stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    count += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        if path != '-':
+            if self.assigned:
+                self.stdout.write(f'Assigned {self.assigned} {LEGACY_SKU_PREFIX}<id> skus')
+            self.stdout.write(self.style.SUCCESS(f'Exported {count} products to {path}'))
+
+    def assign_skus(self, products, chunk_size):
+        """Give sku-less products a sku, so each exported row re-imports onto its product."""
+        ids = list(products.filter(Q(sku__isnull=True) | Q(sku='')).values_list('id', flat=True))
+        self.assigned = len(ids)
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            with transaction.atomic():
+                Product.objects.filter(id__in=chunk).update(
+                    sku=Concat(Value(LEGACY_SKU_PREFIX), Cast('id', CharField())),
+                    updated_at=Now(),
+                )
+                products_bulk_changed.send(sender=Product, changed=chunk)
@@ -0,0 +1,223 @@
+import multiprocessing
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products import categories, datagen, recommendations, sales, search
+from products.models import Category, Product, Review
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a large synthetic catalog: users, categories, '
+        'products, reviews, carts and orders with realistic distributions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--reviews-per-product', type=float, default=3.0, help='Mean; heavy tailed.')
+        parser.add_argument('--orders-per-user', type=float, default=2.0, help='Mean; heavy tailed.')
+        parser.add_argument(
+            '--order-days', type=int, default=365,
+            help='Orders are dated across this many days before now, denser towards today.',
+        )
+        parser.add_argument('--cart-ratio', type=float, default=0.3, help='Share of users with a non-empty cart.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--workers', type=int, default=multiprocessing.cpu_count(),
+            help='Processes building rows while this one inserts; 0 builds inline.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix', default='gen',
+            help='Prefix for generated usernames, category slugs and SKUs.',
+        )
+        parser.add_argument('--password', default='password', help='Password of every generated user.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = prefix = options['prefix']
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        if get_user_model().objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Generated users with prefix "{prefix}" already exist; pass another --prefix.')
+
+        started = time.monotonic()
+        self.categories = self.create_categories(options['categories'])
+        self.users = self.create_users(options['users'], options['password'])
+        self.products, prices = self.create_products(options['products'])
+        self.create_orders_and_carts(prices)
+
+        self.stdout.write('Rebuilding the search index and category counts')
+        with transaction.atomic():
+            search.rebuild_index()
+            categories.recount()
+        self.stdout.write('Building co-purchase recommendations and sales rankings')
+        recommendations.build(full=True, settle_seconds=0)
+        sales.rebuild_rollups()
+        sales.rank()
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
+
+    def pool(self, initializer=None, initargs=()):
+        workers = self.options['workers']
+        if not workers:
+            return None
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            # Fresh interpreters: never fork a process holding DB connections.
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def chunks(self, pool, fn, total, *args):
+        """Yield ``fn(seed, start, count, *args)`` per batch, in order, at most 2 per worker in flight."""
+        starts = iter(range(0, total, self.batch_size))
+        if pool is None:
+            for start in starts:
+                yield start, fn(self.seed, start, min(self.batch_size, total - start), *args)
+            return
+        pending = deque()
+        for start in starts:
+            pending.append((start, pool.submit(fn, self.seed, start, min(self.batch_size, total - start), *args)))
+            if len(pending) >= 2 * self.options['workers']:
+                start, future = pending.popleft()
+                yield start, future.result()
+        while pending:
+            start, future = pending.popleft()
+            yield start, future.result()
+
+    def progress(self, label, done, total, started):
+        rate = done / max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f'{label}: {done}/{total} ({rate:,.0f}/s)')
+
+    def create_categories(self, count):
+        # A two-level tree: one root per five categories, the rest below them.
+        created = []
+        roots = max(1, count // 5)
+        for i in range(count):
+            category, _ = Category.objects.get_or_create(
+                slug=f'{self.prefix}-cat-{i}',
+                defaults={
+                    'name': f'{datagen.WORDS[i % len(datagen.WORDS)].title()} {i}',
+                    'parent': created[i % roots] if i >= roots else None,
+                },
+            )
+            created.append(category)
+        return [category.id for category in created]
+
+    def create_users(self, count, password):
+        User = get_user_model()
+        # Hash once: PBKDF2 per user would dominate the whole run.
+        password = make_password(password)
+        ids = array('q')
+        started = time.monotonic()
+        for start in range(0, count, self.batch_size):
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{self.prefix}-{i}', email=f'{self.prefix}-{i}@example.com',
+                    password=password,
+                )
+                for i in range(start, min(start + self.batch_size, count))
+            ])
+            ids.extend(user.id for user in users)
+            self.progress('Users', len(ids), count, started)
+        return ids
+
+    def create_products(self, count):
+        ids, prices = array('q'), array('q')
+        started = time.monotonic()
+        pool = self.pool()
+        try:
+            for start, (rows, reviews) in self.chunks(
+                pool, datagen.product_chunk, count,
+                len(self.categories), len(self.users), self.options['reviews_per_product'],
+            ):
+                products = [
+                    Product(
+                        category_id=self.categories[category], sku=f'{self.prefix}-{start + offset:08d}',
+                        name=name, description=description, price=Decimal(price) / 100, stock=stock,
+                        rating_sum=rating_sum, numReviews=n_reviews,
+                        rating=(Decimal(rating_sum) / n_reviews).quantize(Decimal('0.01')) if n_reviews else None,
+                    )
+                    for offset, (category, name, description, price, stock, rating_sum, n_reviews)
+                    in enumerate(rows)
+                ]
+                with transaction.atomic():
+                    Product.objects.bulk_create(products)
+                    Review.objects.bulk_create([
+                        Review(
+                            product_id=products[offset].id, user_id=self.users[user],
+                            name=f'{self.prefix}-{user}', rating=rating, comment=comment,
+                        )
+                        for offset, user, rating, comment in reviews
+                    ], batch_size=self.batch_size)
+                ids.extend(product.id for product in products)
+                prices.extend(row[3] for row in rows)
+                self.progress('Products', len(ids), count, started)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return ids, prices
+
+    def create_orders_and_carts(self, prices):
+        total = len(self.users)
+        started = time.monotonic()
+        pool = self.pool(datagen.init_worker, (prices,))
+        if pool is None:
+            datagen.init_worker(prices)
+        n_orders = 0
+        now = timezone.now()
+        try:
+            for start, (orders, carts) in self.chunks(
+                pool, datagen.order_chunk, total,
+                self.options['orders_per_user'], self.options['cart_ratio'], self.options['order_days'],
+            ):
+                with transaction.atomic():
+                    created = Order.objects.bulk_create([
+                        Order(
+                            user_id=self.users[user], status=status, address=address, city=city,
+                            postal_code=postal_code, country=country,
+                            total_price=Decimal(sum(price * quantity for _, price, quantity in items)) / 100,
+                        )
+                        for user, status, address, city, postal_code, country, _age, items in orders
+                    ], batch_size=self.batch_size)
+                    # auto_now_add stamps every insert with now; backdate in one UPDATE per batch.
+                    for order, row in zip(created, orders):
+                        order.created_at = now - timedelta(seconds=row[6])
+                    Order.objects.bulk_update(created, ['created_at'], batch_size=self.batch_size)
+                    OrderItem.objects.bulk_create([
+                        OrderItem(
+                            order_id=order.id, product_id=self.products[product],
+                            price=Decimal(price) / 100, quantity=quantity,
+                        )
+                        for order, row in zip(created, orders)
+                        for product, price, quantity in row[-1]
+                    ], batch_size=self.batch_size)
+                    carts_created = Cart.objects.bulk_create(
+                        [Cart(user_id=self.users[user]) for user, _items in carts],
+                    )
+                    CartItem.objects.bulk_create([
+                        CartItem(cart_id=cart.id, product_id=self.products[product], quantity=quantity)
+                        for cart, (_user, items) in zip(carts_created, carts)
+                        for product, quantity in items
+                    ], batch_size=self.batch_size)
+                n_orders += len(orders)
+                done = min(start + self.batch_size, total)
+                self.progress(f'Users with orders/carts ({n_orders} orders)', done, total, started)
+        finally:
+            if pool is not None:
+                pool.shutdown()
@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from products import cache as catalog_cache
+from products import images
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Backfill resized JPEG/WebP variants for existing product images, in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes (default: settings.IMAGE_VARIANT_WORKERS, %s; '
+                 'the CPU count only if that setting is unset).' % getattr(settings, 'IMAGE_VARIANT_WORKERS', None),
+        )
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Re-render products that already have variants.',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image=None)
+        if not options['force']:
+            products = products.filter(image_variants={})
+        pending = list(products.values_list('id', 'image').order_by('id'))
+        if not pending:
+            self.stdout.write('No product images need variants.')
+            return
+
+        workers = options['workers'] or getattr(settings, 'IMAGE_VARIANT_WORKERS', None)
+        media_root = str(settings.MEDIA_ROOT)
+        done, failed, batch = 0, 0, []
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(images.render_variants, media_root, image_name): (product_id, image_name)
+                for product_id, image_name in pending
+            }
+            for future in as_completed(futures):
+                product_id, image_name = futures[future]
+                try:
+                    variants = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{image_name}: {exc}')
+                    continue
+                batch.append(Product(id=product_id, image_variants=variants, updated_at=timezone.now()))
+                if len(batch) >= options['batch_size']:
+                    done += self.flush(batch)
+                    batch = []
+                    self.stdout.write(f'{done}/{len(pending)} products updated')
+            done += self.flush(batch)
+
+        catalog_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Variants written for {done} products ({failed} failed)'
+        ))
+
+    def flush(self, batch):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            Product.objects.bulk_update(batch, ['image_variants', 'updated_at'])
+        return len(batch)
@@ -0,0 +1,170 @@
+import csv
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products import categories
+from products.models import Category, Product
+from products.signals import products_bulk_changed
+
+
+# Columns understood in CSV headers / JSONL keys. sku, name, price and
+# category (a slug) are required.
+COLUMNS = ('sku', 'name', 'description', 'price', 'stock', 'category', 'category_name', 'is_active', 'image')
+# Always rewritten on an existing sku; the optional columns below only when
+# the feed carries them, so a partial feed (say sku,name,price,category)
+# leaves descriptions, stock and images alone.
+UPDATE_FIELDS = ['name', 'price', 'category', 'updated_at']
+OPTIONAL_FIELDS = ['description', 'stock', 'is_active', 'image']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL catalog feed into Product, upserting by sku in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.batch_size = options['batch_size']
+        # slug -> id for every category, loaded once; new slugs are added as seen.
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.processed = self.skipped = 0
+        self.started = time.monotonic()
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            rows = csv.DictReader(stream) if fmt == 'csv' else self.read_jsonl(stream)
+            batch = []
+            for line, row in enumerate(rows, start=2 if fmt == 'csv' else 1):
+                product = self.build(line, row)
+                if product is not None:
+                    batch.append(product)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+            self.flush(batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.processed} products ({self.skipped} rows skipped) '
+            f'in {time.monotonic() - self.started:.1f}s'
+        ))
+
+    def read_jsonl(self, stream):
+        for line, text in enumerate(stream, start=1):
+            text = text.strip()
+            if not text:
+                continue
+            try:
+                yield json.loads(text)
+            except ValueError:
+                raise CommandError(f'Line {line}: invalid JSON')
+
+    def skip(self, line, reason):
+        self.skipped += 1
+        self.stderr.write(f'Line {line}: {reason}; skipped')
+
+    def build(self, line, row):
+        sku = str(row.get('sku') or '').strip()
+        name = str(row.get('name') or '').strip()
+        slug = str(row.get('category') or '').strip()
+        if not (sku and name and slug):
+            return self.skip(line, 'sku, name and category are required')
+        try:
+            price = Decimal(str(row.get('price')))
+            stock = int(row.get('stock') or 0)
+        except (InvalidOperation, TypeError, ValueError):
+            return self.skip(line, 'invalid price or stock')
+
+        is_active = row.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() in TRUE_VALUES if is_active.strip() else True
+
+        product = Product(
+            sku=sku,
+            name=name,
+            description=row.get('description') or '',
+            price=price,
+            stock=stock,
+            is_active=bool(is_active),
+            image=row.get('image') or None,
+        )
+        # Resolved to category_id in flush(), once per batch.
+        product.import_category = (slug, row.get('category_name'))
+        product.import_fields = UPDATE_FIELDS + [field for field in OPTIONAL_FIELDS if field in row]
+        return product
+
+    def resolve_categories(self, batch):
+        missing = {}
+        for product in batch:
+            slug, name = product.import_category
+            if slug not in self.categories:
+                missing.setdefault(slug, name or slug.replace('-', ' ').title())
+        if missing:
+            Category.objects.bulk_create(
+                [Category(slug=slug, name=name) for slug, name in missing.items()],
+                ignore_conflicts=True,
+            )
+            categories.init_root_paths(Category.objects.filter(slug__in=missing))
+            self.categories.update(
+                Category.objects.filter(slug__in=missing).values_list('slug', 'id')
+            )
+        for product in batch:
+            product.category_id = self.categories[product.import_category[0]]
+
+    def reset_changed_variants(self, batch, skus):
+        """
+        Resized variants belong to the old image: a row whose image differs
+        from the stored one also clears image_variants, for
+        generate_image_variants to render again.
+        """
+        with_image = [product for product in batch if 'image' in product.import_fields]
+        if not with_image:
+            return
+        stored = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'image'))
+        for product in with_image:
+            if (product.image.name or '') != (stored.get(product.sku) or ''):
+                product.image_variants = {}
+                product.import_fields = product.import_fields + ['image_variants']
+
+    def flush(self, batch):
+        if not batch:
+            return
+        # A feed may repeat a sku; the last row wins, as in a sequential upsert.
+        batch = list({product.sku: product for product in batch}.values())
+        skus = [product.sku for product in batch]
+        with transaction.atomic():
+            self.resolve_categories(batch)
+            before = categories.active_counts(Product.objects.filter(sku__in=skus))
+            self.reset_changed_variants(batch, skus)
+            # One upsert per set of columns (JSONL rows may differ in keys).
+            groups = {}
+            for product in batch:
+                groups.setdefault(tuple(product.import_fields), []).append(product)
+            for fields, group in groups.items():
+                Product.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=list(fields),
+                )
+            ids = list(Product.objects.filter(sku__in=skus).values_list('id', flat=True))
+            categories.apply_count_changes(
+                before, categories.active_counts(Product.objects.filter(id__in=ids)),
+            )
+            products_bulk_changed.send(sender=Product, changed=ids)
+
+        self.processed += len(batch)
+        rate = self.processed / max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(f'{self.processed} products upserted ({rate:,.0f}/s)')
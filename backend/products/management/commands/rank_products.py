@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products import sales
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed trending and best-seller scores from the sales rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-rollups', action='store_true',
+                            help='Recompute the hourly and daily rollups from order items first.')
+
+    def handle(self, *args, **options):
+        if options['rebuild_rollups']:
+            sales.rebuild_rollups()
+        ranked = sales.rank()
+        self.stdout.write(self.style.SUCCESS(f'Scored {ranked} products'))
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from products import cache as catalog_cache
+from products.models import Product, Review
+
+
+class Command(BaseCommand):
+    help = 'Backfill and reconcile Product rating/numReviews/rating_sum from Review rows, in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted products without writing.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            # Walk products by primary key so each chunk is an index range scan.
+            products = list(
+                Product.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'rating', 'numReviews', 'rating_sum', 'updated_at')[:chunk_size]
+            )
+            if not products:
+                break
+            last_id = products[-1].id
+
+            stats = {
+                row['product']: row
+                for row in Review.objects.filter(product__in=products)
+                .values('product').annotate(total=Sum('rating'), n=Count('id'))
+            }
+
+            drifted = []
+            for product in products:
+                row = stats.get(product.id, {'total': 0, 'n': 0})
+                total, n = row['total'], row['n']
+                rating = (Decimal(total) / n).quantize(Decimal('0.01')) if n else None
+                if (product.rating_sum, product.numReviews or 0, product.rating) != (total, n, rating):
+                    product.rating_sum, product.numReviews, product.rating = total, n, rating
+                    product.updated_at = timezone.now()
+                    drifted.append(product)
+
+            if drifted and not options['dry_run']:
+                with transaction.atomic():
+                    Product.objects.bulk_update(
+                        drifted, ['rating_sum', 'numReviews', 'rating', 'updated_at']
+                    )
+            checked += len(products)
+            fixed += len(drifted)
+            self.stdout.write(f'Checked {checked} products, {fixed} drifted')
+
+        if fixed and not options['dry_run']:
+            catalog_cache.bump_version()
+            catalog_cache.bump_facets_version()
+        verb = 'would be fixed' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{fixed} of {checked} products {verb}'))
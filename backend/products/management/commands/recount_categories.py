@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import cache as catalog_cache, categories
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized active-product counts of every category.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            corrected = categories.recount()
+        if corrected:
+            catalog_cache.bump_version()
+            catalog_cache.bump_facets_version()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} category counts'))
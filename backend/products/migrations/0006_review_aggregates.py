@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:45
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def drop_duplicate_reviews(apps, schema_editor):
+    # Keep each user's first review of a product before adding the constraint.
+    Review = apps.get_model('products', 'Review')
+    duplicates = (
+        Review.objects.exclude(product=None).exclude(user=None)
+        .values('product', 'user')
+        .annotate(first_id=Min('id'), n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        Review.objects.filter(product=row['product'], user=row['user']).exclude(
+            id=row['first_id']
+        ).delete()
+
+
+def seed_rating_sum(apps, schema_editor):
+    # Rebuild the aggregates from the surviving Review rows (as
+    # reconcile_ratings does), so they agree with them from the start.
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    stats = {
+        row['product']: (row['total'], row['n'])
+        for row in Review.objects.exclude(product=None)
+        .values('product').annotate(total=Sum('rating'), n=Count('id'))
+    }
+    for product in Product.objects.only('rating', 'numReviews', 'rating_sum').iterator():
+        total, n = stats.get(product.id, (0, 0))
+        rating = (Decimal(total) / n).quantize(Decimal('0.01')) if n else None
+        if (product.rating_sum, product.numReviews, product.rating) != (total, n, rating):
+            product.rating_sum, product.numReviews, product.rating = total, n, rating
+            product.save(update_fields=['rating_sum', 'numReviews', 'rating'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_facet_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(drop_duplicate_reviews, migrations.RunPython.noop),
+        migrations.RunPython(seed_rating_sum, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('product', 'user'), name='unique_review_per_user'),
+        ),
+    ]
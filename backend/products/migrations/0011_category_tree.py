@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_paths_and_counts(apps, schema_editor):
+    # Every existing category becomes a root counting its own active products.
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    counts = dict(
+        Product.objects.filter(is_active=True).values_list('category').annotate(n=Count('id')).order_by()
+    )
+    for category in Category.objects.only('id'):
+        category.path = f'{category.id:08d}/'
+        category.product_count = counts.get(category.id, 0)
+        category.save(update_fields=['path', 'product_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='products.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(seed_paths_and_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+VECTOR_COLUMN = 'search_vector'
+VECTOR_INDEX = 'product_search_vector_idx'
+
+
+def create_search_vector(apps, schema_editor):
+    # PostgreSQL only: SQLite searches through its FTS5 mirror (0003).
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"ALTER TABLE products_product ADD COLUMN IF NOT EXISTS {VECTOR_COLUMN} tsvector")
+    schema_editor.execute(
+        f"UPDATE products_product p SET {VECTOR_COLUMN} = "
+        "setweight(to_tsvector(p.name), 'A') || setweight(to_tsvector(c.name), 'B') "
+        "|| setweight(to_tsvector(p.description), 'C') "
+        "FROM products_category c WHERE c.id = p.category_id"
+    )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX} ON products_product USING GIN ({VECTOR_COLUMN})"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {VECTOR_INDEX}")
+    schema_editor.execute(f"ALTER TABLE products_product DROP COLUMN IF EXISTS {VECTOR_COLUMN}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_product_reserved_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -1,13 +1,99 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
 
+
+# Width of each zero-padded id in Category.path.
+PATH_DIGITS = 8
+
+
+def path_segment(category_id):
+    return f'{category_id:0{PATH_DIGITS}d}/'
+
+
+def path_ids(path):
+    """Ids along ``path``, root first and the category itself last."""
+    return [int(segment) for segment in path.split('/') if segment]
+
+
+def subtree_end(path):
+    # Every descendant path extends ``path``; '0' sorts right after '/'.
+    return path[:-1] + '0'
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
+    parent = models.ForeignKey(
+        'self',
+        related_name='children',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    # Materialized path: the padded ids of every ancestor and the category
+    # itself, e.g. '00000001/00000007/'. A subtree is one range scan of the
+    # path index, [path, subtree_end(path)), and sorting by path lists the
+    # tree depth first.
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Active products in this category and all its descendants, maintained
+    # incrementally by products/categories.py.
+    product_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def subtree(self):
+        """This category and all its descendants."""
+        return Category.objects.filter(path__gte=self.path, path__lt=subtree_end(self.path))
+
+    def save(self, *args, **kwargs):
+        previous = None
+        if self.pk is not None:
+            previous = Category.objects.filter(pk=self.pk).values('path', 'product_count').first()
+        parent_path = self.parent.path if self.parent_id else ''
+        if previous and previous['path'] and parent_path.startswith(previous['path']):
+            raise ValueError('A category cannot be moved under itself or one of its descendants.')
+        if previous is not None:
+            self.path = parent_path + path_segment(self.pk)
+            self.depth = self.path.count('/') - 1
+            # product_count is only ever adjusted in SQL; never write back a
+            # value this instance may have read before other changes.
+            self.product_count = previous['product_count']
+            if kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != 'product_count'
+                ]
+        super().save(*args, **kwargs)
+
+        if previous is None:
+            # The id is only known after the insert.
+            self.path = parent_path + path_segment(self.pk)
+            self.depth = self.path.count('/') - 1
+            Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+        elif previous['path'] and previous['path'] != self.path:
+            self._move_subtree(previous['path'], previous['product_count'])
+
+    def _move_subtree(self, old_path, count):
+        old_depth = old_path.count('/') - 1
+        Category.objects.filter(path__gt=old_path, path__lt=subtree_end(old_path)).update(
+            path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+            depth=F('depth') + (self.depth - old_depth),
+        )
+        # The subtree's products leave the old ancestors and join the new ones.
+        old_ancestors = set(path_ids(old_path)[:-1])
+        new_ancestors = set(path_ids(self.path)[:-1])
+        Category.objects.filter(id__in=old_ancestors - new_ancestors).update(
+            product_count=F('product_count') - count
+        )
+        Category.objects.filter(id__in=new_ancestors - old_ancestors).update(
+            product_count=F('product_count') + count
+        )
+
+
 class Product(models.Model):
     category = models.ForeignKey(
         Category,
@@ -15,14 +101,54 @@ class Product(models.Model):
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=200)
+    # Supplier stock-keeping unit; the upsert key for catalog imports.
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField()
+    # Units held by shoppers' carts in reservation mode (cart/reservations.py);
+    # kept in step with the holds so listings never sum them.
+    reserved_stock = models.IntegerField(default=0, editable=False)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # {format: {width: path}} of resized copies, filled in by products/images.py.
+    image_variants = models.JSONField(default=dict, blank=True)
     rating = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
     numReviews = models.IntegerField(null=True, blank=True, default=0)
+    # Running total of review ratings; rating == rating_sum / numReviews.
+    rating_sum = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    # Time-decayed units sold, from SalesRollup; rewritten by products/sales.py.
+    trending_score = models.FloatField(default=0)
+    bestselling_score = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination: newest first, and by price.
+            models.Index(fields=['is_active', 'created_at', 'id'], name='product_active_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='product_active_price_idx'),
+            # Faceted filters: category first, then the range/sort column.
+            models.Index(fields=['is_active', 'category', 'price'], name='product_active_cat_price_idx'),
+            models.Index(fields=['is_active', 'category', 'created_at'], name='product_active_cat_new_idx'),
+            models.Index(fields=['is_active', 'rating'], name='product_active_rating_idx'),
+            models.Index(fields=['is_active', 'trending_score', 'id'], name='product_active_trending_idx'),
+            models.Index(fields=['is_active', 'bestselling_score', 'id'], name='product_active_bestsell_idx'),
+        ]
+
+    @property
+    def available_stock(self):
+        return max(self.stock - self.reserved_stock, 0)
+
+    def save(self, *args, **kwargs):
+        # reserved_stock is only ever adjusted in SQL; never write back a
+        # value this instance may have read before carts changed it.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reserved_stock'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -35,5 +161,77 @@ class Review(models.Model):
     comment = models.TextField(null=True, blank=True)
     createdAt = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'user'], name='unique_review_per_user'),
+        ]
+        indexes = [
+            # Review paging (newest / highest rated) and the detail histogram.
+            models.Index(fields=['product', '-createdAt', '-id'], name='review_product_newest_idx'),
+            models.Index(fields=['product', '-rating', '-createdAt', '-id'], name='review_product_rating_idx'),
+        ]
+
     def __str__(self):
         return str(self.rating)
+
+
+class CoPurchase(models.Model):
+    """
+    Sparse item-item co-occurrence matrix over orders: the number of orders
+    containing both products, stored in both directions. The diagonal
+    (product == other) is the number of orders containing the product.
+    Built by ``manage.py build_recommendations``.
+    """
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    other = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_copurchase_pair'),
+        ]
+
+
+class RelatedProduct(models.Model):
+    """Precomputed top-k "frequently bought together" neighbours of a product."""
+    product = models.ForeignKey(Product, related_name='related_products', on_delete=models.CASCADE)
+    related = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-score'], name='related_product_score_idx'),
+        ]
+
+
+class RecommendationRun(models.Model):
+    """One build_recommendations run; the latest one's last_order_id is the incremental watermark."""
+    full = models.BooleanField(default=False)
+    last_order_id = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    products = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Run up to order {self.last_order_id}'
+
+
+class SalesRollup(models.Model):
+    """Units of a product sold per UTC hour or day, added to as orders are placed."""
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = ((HOUR, 'Hour'), (DAY, 'Day'))
+
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'period', 'start'], name='unique_sales_rollup'),
+        ]
+        indexes = [
+            # The ranking job reads one period's recent buckets.
+            models.Index(fields=['period', 'start'], name='sales_rollup_period_start_idx'),
+        ]
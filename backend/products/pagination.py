@@ -1,7 +1,185 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class StandardResultsSetPagination(PageNumberPagination):
     """Simple page-number pagination with configurable page_size."""
     page_size = 9
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on a composite ordering, with opaque next and
+    previous cursors.
+
+    Unlike CursorPagination, which keys on the first ordering field and
+    falls back to OFFSET among ties, the cursor here carries every ordering
+    value, so each page is a single range scan however many rows share a
+    value. A previous page is the same scan with the ordering reversed.
+    The last ordering field must be unique (normally ``id``). Nullable
+    fields sort their NULLs last in either direction.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('-id',)
+    sort_orderings = {}
+
+    def get_ordering(self, request, queryset, view):
+        sort = request.query_params.get('sort')
+        return self.sort_orderings.get(sort, self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.nullable = [queryset.model._meta.get_field(field).null for field in self.fields]
+
+        # A "before" cursor reads backwards from its row and flips the page.
+        reverse, position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*[
+            self._order_by(name, field, nullable, reverse)
+            for name, field, nullable in zip(self.ordering, self.fields, self.nullable)
+        ])
+        if position is not None:
+            queryset = queryset.filter(self._beyond(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        return self.page
+
+    @staticmethod
+    def _order_by(name, field, nullable, reverse):
+        descending = name.startswith('-') != reverse
+        if not nullable:
+            return f'-{field}' if descending else field
+        # NULLs last reading forwards, so first reading backwards.
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        return F(field).desc(**nulls) if descending else F(field).asc(**nulls)
+
+    def _beyond(self, position, reverse):
+        # (a, b, c) past (x, y, z) as OR of prefix-equal, then strictly past.
+        # Forwards: past a value come the NULLs, past a NULL nothing.
+        # Backwards: before a value only values, before a NULL every value.
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            field = self.fields[i]
+            if position[i] is None:
+                if not reverse:
+                    continue
+                step = Q(**{f'{field}__isnull': False})
+            else:
+                lookup = 'lt' if name.startswith('-') != reverse else 'gt'
+                step = Q(**{f'{field}__{lookup}': position[i]})
+                if self.nullable[i] and not reverse:
+                    step |= Q(**{f'{field}__isnull': True})
+            for j in range(i):
+                if position[j] is None:
+                    step &= Q(**{f'{self.fields[j]}__isnull': True})
+                else:
+                    step &= Q(**{self.fields[j]: position[j]})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request, model):
+        """``(reverse, position)`` from the request's cursor; ``(False, None)`` without one."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            (direction, values), = cursor.items()
+            if direction not in ('after', 'before') or len(values) != len(self.fields):
+                raise ValueError
+            return direction == 'before', [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (AttributeError, TypeError, ValueError, DjangoValidationError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            if value is not None:
+                value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            values.append(value)
+        encoded = urlsafe_b64encode(json.dumps({direction: values}).encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], 'after')
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], 'before')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class CatalogCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for the catalog (``?pagination=cursor``): opaque
+    next and previous cursors and no COUNT(*), so deep pages cost the same
+    as the first. Cursors carry every ordering value, so pages stay range
+    scans through ties (equal prices, the many zero sales scores).
+
+    Ordered newest first on (created_at, id), or by any ``sort`` the list
+    view accepts: ``price`` / ``-price``, ``-rating``, ``trending`` and
+    ``bestselling``.
+    """
+    page_size = 9
+    ordering = ('-created_at', '-id')
+    sort_orderings = {
+        'newest': ('-created_at', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        '-rating': ('-rating', '-id'),
+        'trending': ('-trending_score', '-id'),
+        'bestselling': ('-bestselling_score', '-id'),
+    }
+
+
+class ReviewPagination(KeysetPagination):
+    """Reviews of one product: newest first, or highest rating with sort=-rating."""
+    ordering = ('-createdAt', '-id')
+    sort_orderings = {
+        'newest': ('-createdAt', '-id'),
+        '-rating': ('-rating', '-createdAt', '-id'),
+    }
@@ -0,0 +1,217 @@
+"""
+"Frequently bought together" recommendations from order history.
+
+``build()`` (``manage.py build_recommendations``) turns OrderItem rows
+into baskets, one per order, and accumulates the sparse item-item
+co-occurrence matrix C = XᵀX, where X is the order x product incidence
+matrix, in the CoPurchase table. With NumPy/SciPy installed each chunk of
+orders is one sparse matrix product; without them the same counts come
+from a pure Python loop over each basket's pairs.
+
+Neighbours are scored by cosine similarity, C[a, b] / sqrt(C[a, a] C[b, b]),
+and the top k per product are written to RelatedProduct, which the
+``/api/products/<pk>/related/`` endpoint reads with one indexed lookup.
+
+Runs are incremental: only orders after the previous run's watermark are
+counted, and only the products in them are rescored. Orders younger than
+``settle_seconds`` are left for the next run, so transactions still
+committing are not skipped. A run commits as a whole, watermark included.
+Scores of untouched neighbours drift slightly as their order counts grow;
+``--full`` rebuilds everything.
+"""
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from .models import CoPurchase, RecommendationRun, RelatedProduct
+
+
+DEFAULT_TOP_K = 20
+# Bulk buyers' giant orders say little about what goes together.
+MAX_BASKET = 50
+CHUNK_ORDERS = 20000
+CHUNK_PRODUCTS = 2000
+
+
+def _sparse():
+    try:
+        import numpy
+        import scipy.sparse
+    except ImportError:
+        return None, None
+    return numpy, scipy.sparse
+
+
+def baskets(after_order_id, last_order_id):
+    """``(order_id, sorted product ids)`` for orders in (after, last], in order."""
+    from orders.models import OrderItem
+
+    rows = (
+        OrderItem.objects.filter(order_id__gt=after_order_id, order_id__lte=last_order_id)
+        .order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=10000)
+    )
+    for order_id, items in groupby(rows, key=itemgetter(0)):
+        basket = sorted({product_id for _order_id, product_id in items})
+        if len(basket) <= MAX_BASKET:
+            yield order_id, basket
+
+
+def count_pairs(chunk):
+    """Co-occurrence counts ``{(a, b): n}`` (both directions, with the diagonal) for a list of baskets."""
+    numpy, sparse = _sparse()
+    if numpy is None:
+        counts = Counter()
+        for basket in chunk:
+            for product_id in basket:
+                counts[product_id, product_id] += 1
+            for a, b in combinations(basket, 2):
+                counts[a, b] += 1
+                counts[b, a] += 1
+        return counts
+
+    rows = numpy.repeat(numpy.arange(len(chunk)), [len(basket) for basket in chunk])
+    ids, columns = numpy.unique(
+        numpy.fromiter((p for basket in chunk for p in basket), dtype=numpy.int64), return_inverse=True,
+    )
+    incidence = sparse.csr_matrix(
+        (numpy.ones(len(rows), dtype=numpy.int32), (rows, columns)), shape=(len(chunk), len(ids)),
+    )
+    matrix = (incidence.T @ incidence).tocoo()
+    return dict(zip(
+        zip(ids[matrix.row].tolist(), ids[matrix.col].tolist()), matrix.data.tolist(),
+    ))
+
+
+def add_counts(counts):
+    """Add ``counts`` to the CoPurchase table."""
+    rows = [(a, b, n) for (a, b), n in counts.items()]
+    table = CoPurchase._meta.db_table
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), 5000):
+                cursor.executemany(
+                    f"INSERT INTO {table} (product_id, other_id, count) VALUES (%s, %s, %s) "
+                    f"ON CONFLICT (product_id, other_id) DO UPDATE SET count = {table}.count + excluded.count",
+                    rows[start:start + 5000],
+                )
+        return
+    for start in range(0, len(rows), 1000):
+        batch = rows[start:start + 1000]
+        existing = {
+            (pair.product_id, pair.other_id): pair
+            for pair in CoPurchase.objects.filter(
+                product_id__in={a for a, _b, _n in batch}, other_id__in={b for _a, b, _n in batch},
+            )
+        }
+        new = []
+        for a, b, n in batch:
+            if (a, b) in existing:
+                existing[a, b].count += n
+            else:
+                new.append(CoPurchase(product_id=a, other_id=b, count=n))
+        CoPurchase.objects.bulk_update(existing.values(), ['count'])
+        CoPurchase.objects.bulk_create(new)
+
+
+def top_neighbours(rows, totals, top_k, min_count):
+    """``{product: [(related, score)]}`` from ``(product, other, count)`` rows and diagonal ``totals``."""
+    numpy, _sparse_module = _sparse()
+    rows = [row for row in rows if row[2] >= min_count and row[0] != row[1]]
+    if not rows:
+        return {}
+    if numpy is None:
+        grouped = defaultdict(list)
+        for a, b, n in rows:
+            grouped[a].append((n / math.sqrt(totals[a] * totals[b]), n, b))
+        return {
+            a: [(b, score) for score, _n, b in sorted(scored, key=lambda s: (-s[0], -s[1], s[2]))[:top_k]]
+            for a, scored in grouped.items()
+        }
+
+    products, others, counts = (numpy.array(column, dtype=numpy.int64) for column in zip(*rows))
+    scores = counts / numpy.sqrt(
+        numpy.fromiter((totals[a] for a in products.tolist()), dtype=numpy.float64, count=len(products))
+        * numpy.fromiter((totals[b] for b in others.tolist()), dtype=numpy.float64, count=len(others))
+    )
+    # Sort by product, then best score (and count, then id) first; keep each group's first k.
+    order = numpy.lexsort((others, -counts, -scores, products))
+    products, others, scores = products[order], others[order], scores[order]
+    starts = numpy.r_[0, numpy.flatnonzero(numpy.diff(products)) + 1]
+    rank = numpy.arange(len(products)) - numpy.repeat(starts, numpy.diff(numpy.r_[starts, len(products)]))
+    keep = rank < top_k
+    result = defaultdict(list)
+    for a, b, score in zip(products[keep].tolist(), others[keep].tolist(), scores[keep].tolist()):
+        result[a].append((b, score))
+    return result
+
+
+def rescore(product_ids, top_k=DEFAULT_TOP_K, min_count=1):
+    """Rewrite the RelatedProduct rows of ``product_ids`` from the CoPurchase table."""
+    totals = dict(CoPurchase.objects.filter(product=F('other')).values_list('product_id', 'count'))
+    product_ids = sorted(product_ids)
+    for start in range(0, len(product_ids), CHUNK_PRODUCTS):
+        chunk = product_ids[start:start + CHUNK_PRODUCTS]
+        rows = CoPurchase.objects.filter(product_id__in=chunk).values_list('product_id', 'other_id', 'count')
+        neighbours = top_neighbours(list(rows), totals, top_k, min_count)
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product_id__in=chunk).delete()
+            RelatedProduct.objects.bulk_create([
+                RelatedProduct(product_id=a, related_id=b, score=score)
+                for a, related in neighbours.items()
+                for b, score in related
+            ], batch_size=5000)
+
+
+def build(full=False, top_k=DEFAULT_TOP_K, min_count=1, settle_seconds=60, log=None):
+    """Count new orders (all orders with ``full``) and rescore the products in them."""
+    from orders.models import Order
+
+    previous = RecommendationRun.objects.order_by('-id').first()
+    if previous is None:
+        full = True
+    after = 0 if full else previous.last_order_id
+    settled = timezone.now() - timedelta(seconds=settle_seconds)
+    last = Order.objects.filter(id__gt=after, created_at__lte=settled).aggregate(last=Max('id'))['last']
+
+    run = RecommendationRun(full=full, last_order_id=after if last is None else last)
+    # One transaction from the --full wipe to the watermark: a run that dies
+    # part way leaves the table as the previous run left it, rather than
+    # counts the next run would add again.
+    with transaction.atomic():
+        if full:
+            CoPurchase.objects.all().delete()
+            RelatedProduct.objects.all().delete()
+
+        touched = set()
+        if last is not None:
+            chunk = []
+            for _order_id, basket in baskets(after, last):
+                chunk.append(basket)
+                if len(chunk) >= CHUNK_ORDERS:
+                    touched.update(_flush(chunk, run, log))
+                    chunk = []
+            touched.update(_flush(chunk, run, log))
+
+        rescore(touched, top_k=top_k, min_count=min_count)
+        run.products = len(touched)
+        run.save()
+        transaction.on_commit(catalog_cache.bump_version)
+    return run
+
+
+def _flush(chunk, run, log):
+    if not chunk:
+        return set()
+    counts = count_pairs(chunk)
+    add_counts(counts)
+    run.orders += len(chunk)
+    if log:
+        log(f'Counted {run.orders} orders ({len(counts)} pairs in the last chunk)')
+    return {a for a, _b in counts}
@@ -0,0 +1,130 @@
+"""
+Best-seller and trending rankings (``/api/products/?sort=trending|bestselling``).
+
+CreateOrderView adds each order's units to per-product hourly and daily
+SalesRollup rows, in the order's transaction, so no request ever
+aggregates OrderItem. ``rank()`` (``manage.py rank_products``, run every
+few minutes) sums recent rollups with exponential time decay and writes
+the results to ``Product.trending_score`` (hourly buckets, short half-life)
+and ``Product.bestselling_score`` (daily buckets, long half-life), which
+the listing sorts on through an index like any other column.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from .models import Product, SalesRollup
+
+
+HOUR, DAY = SalesRollup.HOUR, SalesRollup.DAY
+PERIODS = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+# (rollup period, window, half-life) per score field.
+RANKINGS = {
+    'trending_score': (HOUR, timedelta(hours=72), timedelta(hours=6)),
+    'bestselling_score': (DAY, timedelta(days=90), timedelta(days=14)),
+}
+# Hourly buckets are only read for trending.
+HOURLY_RETENTION = timedelta(days=7)
+
+
+def bucket(when, period):
+    """Start of the UTC hour or day containing ``when``."""
+    start = when.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if period == DAY else start
+
+
+def record_sale(when, quantities):
+    """Add ``(product_id, units)`` pairs sold at ``when`` to the hourly and daily rollups."""
+    units = Counter()
+    for product_id, quantity in quantities:
+        units[product_id] += quantity
+    start_field = SalesRollup._meta.get_field('start')
+    rows = [
+        (product_id, period, start_field.get_db_prep_value(bucket(when, period), connection), n)
+        for period in PERIODS
+        for product_id, n in sorted(units.items())
+        if n > 0
+    ]
+    if not rows:
+        return
+    table = SalesRollup._meta.db_table
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (product_id, period, start, units) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (product_id, period, start) DO UPDATE SET units = {table}.units + excluded.units",
+                rows,
+            )
+        return
+    for product_id, period, _start, n in rows:
+        key = {'product_id': product_id, 'period': period, 'start': bucket(when, period)}
+        if not SalesRollup.objects.filter(**key).update(units=F('units') + n):
+            SalesRollup.objects.create(units=n, **key)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from OrderItem, e.g. after a bulk import of orders."""
+    from orders.models import OrderItem
+
+    with transaction.atomic():
+        SalesRollup.objects.all().delete()
+        for period, trunc in ((HOUR, TruncHour), (DAY, TruncDay)):
+            rows = (
+                OrderItem.objects
+                .annotate(start=trunc('order__created_at', tzinfo=dt_timezone.utc))
+                .values_list('product_id', 'start').annotate(units=Sum('quantity')).order_by()
+            )
+            SalesRollup.objects.bulk_create((
+                SalesRollup(product_id=product_id, period=period, start=start, units=units)
+                for product_id, start, units in rows.iterator(chunk_size=5000)
+            ), batch_size=5000)
+
+
+def decayed_units(period, window, half_life, now):
+    """``{product_id: score}``: units in ``period`` buckets of the last ``window``, halved every ``half_life``."""
+    scores = defaultdict(float)
+    middle = PERIODS[period] / 2
+    rows = (
+        SalesRollup.objects.filter(period=period, start__gte=now - window)
+        .values_list('product_id', 'start', 'units').iterator(chunk_size=10000)
+    )
+    for product_id, start, units in rows:
+        age = max(now - start - middle, timedelta(0))
+        scores[product_id] += units * 0.5 ** (age / half_life)
+    return scores
+
+
+def rank(now=None):
+    """Rewrite every product's trending and best-seller scores; returns how many were written."""
+    now = now or timezone.now()
+    scores = {
+        field: decayed_units(period, window, half_life, now)
+        for field, (period, window, half_life) in RANKINGS.items()
+    }
+    # Products that dropped out of every window go back to zero.
+    ids = set(Product.objects.filter(
+        Q(trending_score__gt=0) | Q(bestselling_score__gt=0)
+    ).values_list('id', flat=True))
+    for field_scores in scores.values():
+        ids.update(field_scores)
+
+    fields = list(RANKINGS)
+    rows = [
+        [round(scores[field].get(product_id, 0.0), 6) for field in fields] + [product_id]
+        for product_id in sorted(ids)
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Plain UPDATEs: no updated_at bump (a score change is not a product
+        # change), and far cheaper than bulk_update()'s CASE expressions.
+        cursor.executemany(
+            f"UPDATE {Product._meta.db_table} SET {', '.join(f'{field} = %s' for field in fields)} WHERE id = %s",
+            rows,
+        )
+        SalesRollup.objects.filter(period=HOUR, start__lt=now - HOURLY_RETENTION).delete()
+    catalog_cache.bump_version()
+    return len(rows)
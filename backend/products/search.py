@@ -0,0 +1,173 @@
+"""
+Full-text product search.
+
+On SQLite the catalog is mirrored into an FTS5 virtual table (name,
+description and category name) keyed by product id and ranked with bm25.
+On PostgreSQL the same columns, weighted A/C/B, are stored in a tsvector
+column with a GIN index (migration 0015, PostgreSQL only, so it is not a
+model field) and matched with ``@@``, ranked with ts_rank. Any other
+backend falls back to icontains lookups.
+
+The index is kept in sync by the receivers in products/signals.py, in
+batches of INDEX_BATCH products, and can be rebuilt with
+``manage.py rebuild_search_index``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+
+FTS_TABLE = 'products_product_fts'
+VECTOR_COLUMN = 'search_vector'
+
+# Products per index statement, so large reindexes (a category rename)
+# never build one unbounded IN list.
+INDEX_BATCH = 500
+
+# bm25 column weights: name, description, category.
+FTS_WEIGHTS = (10.0, 1.0, 4.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def uses_vector():
+    return connection.vendor == 'postgresql'
+
+
+def uses_index():
+    """Whether this backend keeps a search index that needs maintaining."""
+    return uses_fts() or uses_vector()
+
+
+def _batches(product_ids):
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), INDEX_BATCH):
+        yield product_ids[start:start + INDEX_BATCH]
+
+
+def _select_rows_sql(where=''):
+    product_table = Product._meta.db_table
+    category_table = Product._meta.get_field('category').related_model._meta.db_table
+    return (
+        f"SELECT p.id, p.name, p.description, c.name "
+        f"FROM {product_table} p JOIN {category_table} c ON c.id = p.category_id "
+        f"{where}"
+    )
+
+
+def _update_vectors_sql(where=''):
+    product_table = Product._meta.db_table
+    category_table = Product._meta.get_field('category').related_model._meta.db_table
+    return (
+        f"UPDATE {product_table} p SET {VECTOR_COLUMN} = "
+        "setweight(to_tsvector(p.name), 'A') || setweight(to_tsvector(c.name), 'B') "
+        "|| setweight(to_tsvector(p.description), 'C') "
+        f"FROM {category_table} c WHERE c.id = p.category_id {where}"
+    )
+
+
+def rebuild_index():
+    """Repopulate the index from scratch in a single statement."""
+    if uses_vector():
+        with connection.cursor() as cursor:
+            cursor.execute(_update_vectors_sql())
+        return
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, description, category, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, description, category) "
+            + _select_rows_sql()
+        )
+
+
+def index_products(product_ids):
+    """Insert or refresh the index rows for the given products."""
+    if uses_vector():
+        with connection.cursor() as cursor:
+            for batch in _batches(product_ids):
+                cursor.execute(_update_vectors_sql('AND p.id = ANY(%s)'), [batch])
+        return
+    if not uses_fts():
+        return
+    for batch in _batches(product_ids):
+        remove_products(batch)
+        placeholders = ', '.join(['%s'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, description, category) "
+                + _select_rows_sql(f"WHERE p.id IN ({placeholders})"),
+                batch,
+            )
+
+
+def remove_products(product_ids):
+    # A tsvector goes with its row; only the FTS mirror has rows to drop.
+    if not uses_fts():
+        return
+    for batch in _batches(product_ids):
+        placeholders = ', '.join(['%s'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+                batch,
+            )
+
+
+def _fts_query(keyword):
+    # Quote every token so user input can never be parsed as FTS syntax,
+    # and prefix-match the tokens so partial words still hit.
+    tokens = _TOKEN_RE.findall(keyword)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(queryset, keyword):
+    """Filter ``queryset`` to products matching ``keyword``, best match first."""
+    keyword = keyword.strip()
+    if not keyword:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        match = _fts_query(keyword)
+        if not match:
+            return queryset.filter(name__icontains=keyword)
+        # Join the FTS table so SQLite drives the query from the index and
+        # computes bm25 once per hit.
+        product_table = Product._meta.db_table
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {product_table}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+            select={'search_rank': f"bm25({FTS_TABLE}, {weights})"},
+        ).order_by('search_rank', 'id')
+
+    if vendor == 'postgresql':
+        # Matched on the stored vector, so the GIN index drives the query.
+        product_table = Product._meta.db_table
+        return queryset.extra(
+            where=[f"{product_table}.{VECTOR_COLUMN} @@ websearch_to_tsquery(%s)"],
+            params=[keyword],
+            select={'search_rank': f"ts_rank({product_table}.{VECTOR_COLUMN}, websearch_to_tsquery(%s))"},
+            select_params=[keyword],
+        ).order_by('-search_rank', 'id')
+
+    return queryset.filter(
+        Q(name__icontains=keyword)
+        | Q(description__icontains=keyword)
+        | Q(category__name__icontains=keyword)
+    )
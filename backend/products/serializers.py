@@ -1,11 +1,19 @@
+from django.db.models import Count
+from django.utils import timezone
 from rest_framework import serializers
+from . import images
 from .models import Category, Product, Review
 
 
+# Reviews embedded in a product payload; the rest are paged via
+# GET /api/products/<pk>/reviews/.
+REVIEW_EMBED_LIMIT = 5
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug']
+        fields = ['id', 'name', 'slug', 'parent', 'depth', 'product_count']
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -14,7 +22,14 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ReviewInputSerializer(serializers.Serializer):
+    """A posted review, checked before it reaches the running rating aggregates."""
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class ProductListSerializer(serializers.ModelSerializer):
+    """Catalog listing representation: no embedded reviews."""
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         source='category',
@@ -22,25 +37,26 @@ class ProductSerializer(serializers.ModelSerializer):
     )
     category = CategorySerializer(read_only=True)
     image_url = serializers.SerializerMethodField(read_only=True)
-    reviews = serializers.SerializerMethodField(read_only=True)
+    image_srcset = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Product
         fields = [
             'id',
             'name',
+            'sku',
             'description',
             'price',
             'stock',
             'image',
             'image_url',
+            'image_srcset',
             'is_active',
             'created_at',
             'category',
             'category_id',
             'rating',
             'numReviews',
-            'reviews',
         ]
 
     def get_image_url(self, obj):
@@ -51,10 +67,113 @@ class ProductSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_image_srcset(self, obj):
+        if not obj.image:
+            return {}
+        request = self.context.get('request')
+        storage = obj.image.storage
+
+        def build_url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return images.srcset(obj.image_variants, build_url)
+
+
+class ProductSerializer(ProductListSerializer):
+    """Full product representation with embedded reviews (detail/admin)."""
+    # stock less what carts hold in reservation mode (cart/reservations.py).
+    # Not in listings: holds change it without a catalog version bump.
+    available_stock = serializers.IntegerField(read_only=True)
+    reviews = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(ProductListSerializer.Meta):
+        fields = ProductListSerializer.Meta.fields + ['available_stock', 'reviews']
+
     def get_reviews(self, obj):
-        reviews = obj.review_set.all()
+        reviews = obj.review_set.order_by('-createdAt', '-id')[:REVIEW_EMBED_LIMIT]
         serializer = ReviewSerializer(reviews, many=True)
         return serializer.data
 
 
+class ProductDetailSerializer(ProductSerializer):
+    """Product page: latest reviews plus a star-rating histogram."""
+    rating_histogram = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['rating_histogram']
+
+    def get_rating_histogram(self, obj):
+        counts = dict(
+            obj.review_set.values_list('rating').annotate(n=Count('id')).order_by()
+        )
+        return {str(stars): counts.get(stars, 0) for stars in range(1, 6)}
+
+
+class BatchCategoryField(serializers.PrimaryKeyRelatedField):
+    """Resolves category ids from the ``categories`` map the batch view preloads."""
+
+    def to_internal_value(self, data):
+        categories = self.context.get('categories')
+        if categories is None:
+            return super().to_internal_value(data)
+        try:
+            return categories[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+class ProductBatchListSerializer(serializers.ListSerializer):
+    """
+    many=True writes in bulk. For updates ``instance`` is a ``{id: Product}``
+    map and each item names its product with ``id``.
+    """
+
+    def to_internal_value(self, data):
+        # Products matched to each validated item, in order, for update().
+        self.targets = []
+        self.target_ids = set()
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        product = self.instance.get(data.get('id')) if isinstance(data, dict) else None
+        if product is None:
+            raise serializers.ValidationError({'id': ['Product not found.']})
+        # Each product once per batch, so the count deltas see it once.
+        if product.pk in self.target_ids:
+            raise serializers.ValidationError({'id': ['Product is repeated in this batch.']})
+        self.child.instance = product
+        attrs = super().run_child_validation(data)
+        self.targets.append(product)
+        self.target_ids.add(product.pk)
+        return attrs
+
+    def create(self, validated_data):
+        return Product.objects.bulk_create([Product(**attrs) for attrs in validated_data])
+
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        # One bulk_update per distinct field set, so untouched columns are
+        # never rewritten with the values read before the batch.
+        groups = {}
+        for product, attrs in zip(self.targets, validated_data):
+            for attr, value in attrs.items():
+                setattr(product, attr, value)
+            product.updated_at = now
+            groups.setdefault(frozenset(attrs) | {'updated_at'}, []).append(product)
+        for fields, products in groups.items():
+            Product.objects.bulk_update(products, sorted(fields))
+        return self.targets
+
+
+class ProductBatchSerializer(ProductListSerializer):
+    category_id = BatchCategoryField(
+        queryset=Category.objects.all(),
+        source='category',
+        write_only=True
+    )
 
+    class Meta(ProductListSerializer.Meta):
+        list_serializer_class = ProductBatchListSerializer
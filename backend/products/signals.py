@@ -0,0 +1,217 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, FloatField, When
+from django.db.models.functions import Cast, Coalesce, Now
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import cache as catalog_cache, categories, facets, search, suggest
+from .models import Category, Product, Review
+
+
+# Sent by bulk writers (imports, batch admin endpoints) that bypass
+# post_save/post_delete, once per batch: changed=[ids], deleted=[ids].
+# Those writers also adjust category counts themselves, with
+# categories.apply_count_changes().
+products_bulk_changed = Signal()
+
+_bulk = threading.local()
+
+
+@contextmanager
+def bulk_changes():
+    """
+    Silence the per-row index, count and cache receivers, e.g. around a batch
+    delete; the caller sends products_bulk_changed once instead.
+    """
+    previous = getattr(_bulk, 'active', False)
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = previous
+
+
+def _in_bulk():
+    return getattr(_bulk, 'active', False)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if raw or _in_bulk():
+        return
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    if _in_bulk():
+        return
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_suggestions(sender, instance, raw=False, **kwargs):
+    if raw or _in_bulk():
+        return
+    product_id = instance.pk
+    transaction.on_commit(lambda: suggest.products_changed([product_id]))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_suggestions(sender, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(suggest.categories_changed)
+
+
+@receiver(pre_save, sender=Product)
+def remember_counted_category(sender, instance, raw=False, **kwargs):
+    # Where the product was counted before this save, if anywhere, and what
+    # it contributed to the facet counts.
+    instance._counted_in = instance._facet_state = None
+    if raw or _in_bulk() or instance._state.adding:
+        return
+    row = Product.objects.filter(pk=instance.pk).values_list(
+        'category_id', 'is_active', 'price', 'rating', 'stock', 'reserved_stock',
+    ).first()
+    if row is None:
+        return
+    category_id, is_active, price, rating, stock, reserved = row
+    if is_active:
+        instance._counted_in = category_id
+    instance._facet_state = facets.facet_state(is_active, category_id, price, rating, stock - reserved)
+    # save() never writes the counter, so judge the new state by this value.
+    instance._reserved_before = reserved
+
+
+@receiver(post_save, sender=Product)
+def count_product(sender, instance, raw=False, **kwargs):
+    if raw or _in_bulk():
+        return
+    changes = Counter()
+    if getattr(instance, '_counted_in', None) is not None:
+        changes[instance._counted_in] -= 1
+    if instance.is_active:
+        changes[instance.category_id] += 1
+    categories.apply_count_changes(changes)
+
+
+@receiver(post_delete, sender=Product)
+def uncount_product(sender, instance, **kwargs):
+    if _in_bulk() or not instance.is_active:
+        return
+    categories.apply_count_changes({instance.category_id: -1})
+    facets.changed()
+
+
+@receiver(post_save, sender=Product)
+def refresh_facets(sender, instance, raw=False, **kwargs):
+    if raw or _in_bulk():
+        return
+    reserved = getattr(instance, '_reserved_before', instance.reserved_stock)
+    state = facets.facet_state(
+        instance.is_active, instance.category_id, instance.price, instance.rating,
+        instance.stock - reserved,
+    )
+    if state != getattr(instance, '_facet_state', None):
+        facets.changed()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_facets(sender, raw=False, **kwargs):
+    # Facets list every category with its name and count.
+    if raw:
+        return
+    facets.changed()
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    # The category name is part of every product row in the index.
+    if raw or created:
+        return
+    search.index_products(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products(sender, instance, created, raw=False, **kwargs):
+    # Products embed their category, so a rename changes their representation.
+    if raw or created:
+        return
+    instance.products.update(updated_at=timezone.now())
+
+
+def apply_rating_change(product_id, count, total):
+    """
+    Add ``count`` reviews rating ``total`` in all (negative to take them
+    away) to the product's running aggregates, in one statement so
+    concurrent reviews cannot overwrite each other.
+    """
+    rating_before = Product.objects.filter(pk=product_id).values_list('rating', flat=True).first()
+    num_reviews = Coalesce(F('numReviews'), 0) + count
+    rating_sum = F('rating_sum') + total
+    Product.objects.filter(pk=product_id).update(
+        updated_at=Now(),
+        numReviews=num_reviews,
+        rating_sum=rating_sum,
+        rating=Case(
+            When(
+                GreaterThan(num_reviews, 0),
+                then=Cast(
+                    Cast(rating_sum, FloatField()) / num_reviews,
+                    DecimalField(max_digits=7, decimal_places=2),
+                ),
+            ),
+            default=None,
+        ),
+    )
+    # update() bypasses post_save; the Review write schedules the catalog
+    # version bump. Facets only move when the rating crosses a bucket boundary.
+    rating_after = Product.objects.filter(pk=product_id).values_list('rating', flat=True).first()
+    if facets.rating_bucket(rating_after) != facets.rating_bucket(rating_before):
+        facets.changed()
+
+
+@receiver(post_delete, sender=Review)
+def unrate_product(sender, instance, **kwargs):
+    # Reviews deleted one by one (admin, API). A deleted product's reviews
+    # are kept with product=NULL and have no aggregate left to adjust.
+    if instance.product_id is None or _in_bulk():
+        return
+    apply_rating_change(instance.product_id, -1, -instance.rating)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_catalog_version(sender, **kwargs):
+    if _in_bulk():
+        return
+    # After commit, so no request can cache pre-commit data under the new version.
+    transaction.on_commit(catalog_cache.bump_version)
+
+
+@receiver(products_bulk_changed)
+def sync_bulk_changes(sender, changed=(), deleted=(), **kwargs):
+    search.remove_products(deleted)
+    search.index_products(changed)
+    ids = [*changed, *deleted]
+
+    def after_commit():
+        catalog_cache.bump_version()
+        catalog_cache.bump_facets_version()
+        suggest.products_changed(ids)
+
+    transaction.on_commit(after_commit)
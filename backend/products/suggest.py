@@ -0,0 +1,282 @@
+"""
+In-process prefix index for search-as-you-type (``/api/products/suggest/``).
+
+Product and category names are split into normalized words. Each word has
+a postings array of entries, heaviest first (products by review count,
+categories by product count). A prefix maps to a range of the sorted
+vocabulary found with bisect, and the postings in that range are merged
+lazily by weight, so the top k come out without scanning every match.
+One- and two-letter prefixes, whose ranges are huge, keep a precomputed
+top list. Queries of several fairly rare words intersect their entry sets
+instead.
+
+The index is built on first use (wsgi.py warms it at startup) and kept
+current in this process by the receivers in products/signals.py after
+each commit. Other processes notice a catalog version bump at most every
+``SUGGEST_REFRESH_SECONDS`` and pull the products changed since their
+last sync; a hard delete only reaches them on the next rebuild. Queries
+otherwise never touch the database.
+"""
+import bisect
+import heapq
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import cache as catalog_cache
+
+
+TOP_CACHE = 50
+MAX_SCAN = 5000
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """Lower-case words with accents stripped: 'Crème Brûlée' -> ['creme', 'brulee']."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return [sys.intern(word) for word in _WORD_RE.findall(text.lower())]
+
+
+class PrefixIndex:
+    """Weighted word-prefix index over ``(key, label, weight)`` entries."""
+
+    def __init__(self, items=()):
+        self.keys = []          # entry -> key, or None once replaced/removed
+        self.labels = []
+        self.texts = []         # entry -> ' word word ...', for word-prefix checks
+        self.weights = array('q')
+        self.entry_of = {}      # key -> live entry
+        self.vocabulary = []    # sorted distinct words
+        self.postings = {}      # word -> array of entries, heaviest first
+        self.top = {}           # 1-2 letter prefix -> entries, heaviest first
+        self.dead = 0
+
+        # Adding in weight order leaves every postings array sorted.
+        for key, label, weight in sorted(items, key=lambda item: -item[2]):
+            entry = self._append(key, label, weight)
+            for word in self._words(entry):
+                if word not in self.postings:
+                    self.postings[word] = array('q')
+                self.postings[word].append(entry)
+                for prefix in {word[:1], word[:2]}:
+                    top = self.top.setdefault(prefix, [])
+                    if len(top) < TOP_CACHE and (not top or top[-1] != entry):
+                        top.append(entry)
+        self.vocabulary = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.entry_of)
+
+    def _append(self, key, label, weight):
+        entry = len(self.keys)
+        self.keys.append(key)
+        self.labels.append(label)
+        self.texts.append(' ' + ' '.join(dict.fromkeys(normalize(label))))
+        self.weights.append(weight)
+        self.entry_of[key] = entry
+        return entry
+
+    def _words(self, entry):
+        return self.texts[entry].split()
+
+    def _weight_key(self, entry):
+        return -self.weights[entry]
+
+    def remove(self, key):
+        entry = self.entry_of.pop(key, None)
+        if entry is not None:
+            # Tombstone: skipped by queries, dropped by the next compaction.
+            self.keys[entry] = None
+            self.dead += 1
+
+    def add(self, key, label, weight):
+        self.remove(key)
+        entry = self._append(key, label, weight)
+        for word in self._words(entry):
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = array('q')
+                bisect.insort(self.vocabulary, word)
+            postings.insert(bisect.bisect_right(postings, -weight, key=self._weight_key), entry)
+            for prefix in {word[:1], word[:2]}:
+                top = self.top.setdefault(prefix, [])
+                if entry not in top:
+                    top.insert(bisect.bisect_right(top, -weight, key=self._weight_key), entry)
+                    del top[TOP_CACHE:]
+
+    def live_items(self):
+        for key, entry in self.entry_of.items():
+            yield key, self.labels[entry], self.weights[entry]
+
+    def needs_compaction(self):
+        return self.dead > max(1000, len(self.keys) // 2)
+
+    def _range(self, prefix):
+        """Postings of every vocabulary word starting with ``prefix``."""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff')
+        return [self.postings[word] for word in self.vocabulary[start:end]]
+
+    def _stream(self, prefix, postings):
+        if len(prefix) <= 2:
+            top = self.top.get(prefix, [])
+            yield from top
+            if len(top) < TOP_CACHE:
+                # Never truncated: that was every match.
+                return
+        yield from heapq.merge(*postings, key=self._weight_key)
+
+    def search(self, text, limit):
+        """``[(key, label)]`` of the heaviest entries with a word starting with every query word."""
+        tokens = list(dict.fromkeys(normalize(text)))
+        if not tokens or limit <= 0:
+            return []
+        ranges = sorted(
+            ((token, self._range(token)) for token in tokens),
+            key=lambda item: sum(len(postings) for postings in item[1]),
+        )
+        sizes = [sum(len(p) for p in postings) for _token, postings in ranges]
+        if len(ranges) > 1 and sizes[-1] <= MAX_SCAN:
+            # Several fairly rare words: intersect their entry sets.
+            candidates = set().union(*ranges[0][1])
+            for _token, postings in ranges[1:]:
+                candidates.intersection_update(set().union(*postings))
+            entries = heapq.nsmallest(
+                limit, (e for e in candidates if self.keys[e] is not None), key=self._weight_key,
+            )
+            return [(self.keys[entry], self.labels[entry]) for entry in entries]
+
+        # Otherwise walk the heaviest matches of the most selective word and
+        # check the others against each entry's words.
+        token, postings = ranges[0]
+        others = [' ' + other for other, _postings in ranges[1:]]
+        found, seen = [], set()
+        for scanned, entry in enumerate(self._stream(token, postings)):
+            if scanned >= MAX_SCAN:
+                break
+            if entry in seen or self.keys[entry] is None:
+                continue
+            seen.add(entry)
+            text = self.texts[entry]
+            if all(other in text for other in others):
+                found.append((self.keys[entry], self.labels[entry]))
+                if len(found) >= limit:
+                    break
+        return found
+
+
+def _product_items(products):
+    for product_id, name, num_reviews in products.values_list('id', 'name', 'numReviews').iterator(chunk_size=5000):
+        yield product_id, name, num_reviews or 0
+
+
+def _category_index():
+    from .models import Category
+
+    return PrefixIndex(
+        ((slug, name, count) for slug, name, count in Category.objects.values_list('slug', 'name', 'product_count'))
+    )
+
+
+class Suggester:
+    def __init__(self):
+        from .models import Product
+
+        self.lock = threading.RLock()
+        self.version = catalog_cache.get_version()
+        self.synced_at = timezone.now()
+        self.checked_at = time.monotonic()
+        self.products = PrefixIndex(_product_items(Product.objects.filter(is_active=True)))
+        self.categories = _category_index()
+
+    def refresh_products(self, ids):
+        from .models import Product
+
+        ids = set(ids)
+        rows = Product.objects.filter(id__in=ids).values_list('id', 'name', 'numReviews', 'is_active')
+        with self.lock:
+            for product_id, name, num_reviews, is_active in rows:
+                ids.discard(product_id)
+                if is_active:
+                    self.products.add(product_id, name, num_reviews or 0)
+                else:
+                    self.products.remove(product_id)
+            for product_id in ids:
+                self.products.remove(product_id)
+            if self.products.needs_compaction():
+                self.products = PrefixIndex(list(self.products.live_items()))
+
+    def refresh_categories(self):
+        categories = _category_index()
+        with self.lock:
+            self.categories = categories
+
+    def catch_up(self):
+        """Apply changes made by other processes, at most every SUGGEST_REFRESH_SECONDS."""
+        from .models import Product
+
+        now = time.monotonic()
+        if now - self.checked_at < getattr(settings, 'SUGGEST_REFRESH_SECONDS', 30):
+            return
+        self.checked_at = now
+        version = catalog_cache.get_version()
+        if version == self.version:
+            return
+        started = timezone.now()
+        changed = Product.objects.filter(updated_at__gte=self.synced_at).values_list('id', flat=True)
+        self.refresh_products(list(changed))
+        self.refresh_categories()
+        self.version, self.synced_at = version, started
+
+    def suggest(self, text, limit, category_limit=3):
+        self.catch_up()
+        with self.lock:
+            return {
+                'products': [
+                    {'id': key, 'name': label} for key, label in self.products.search(text, limit)
+                ],
+                'categories': [
+                    {'slug': key, 'name': label} for key, label in self.categories.search(text, category_limit)
+                ],
+            }
+
+
+_suggester = None
+_build_lock = threading.Lock()
+
+
+def get_suggester():
+    global _suggester
+    if _suggester is None:
+        with _build_lock:
+            if _suggester is None:
+                _suggester = Suggester()
+    return _suggester
+
+
+def warm():
+    """Build the index in a background thread (called from wsgi.py)."""
+    threading.Thread(target=get_suggester, name='suggest-index', daemon=True).start()
+
+
+def reset():
+    global _suggester
+    _suggester = None
+
+
+def products_changed(ids):
+    # Nothing to update until the index has been built.
+    if _suggester is not None:
+        _suggester.refresh_products(ids)
+
+
+def categories_changed():
+    if _suggester is not None:
+        _suggester.refresh_categories()
@@ -1,3 +1,1076 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from . import cache as catalog_cache, facets, images, recommendations, sales, search, suggest
+from .models import Category, CoPurchase, Product, RecommendationRun, Review, SalesRollup
+
+
+class CatalogTestCase(TestCase):
+    # Version bumps run on commit, which TestCase never reaches: start clean.
+    def setUp(self):
+        cache.clear()
+
+
+class ProductListQueryCountTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('reviewer', password='pass12345')
+        cls.category = Category.objects.create(name='Device', slug='device')
+        for i in range(60):
+            product = Product.objects.create(
+                category=cls.category,
+                name=f'Product {i}',
+                price=10 + i,
+                stock=5,
+            )
+            Review.objects.create(product=product, user=user, name='reviewer', rating=4)
+
+    def test_list_queries_constant_in_page_size(self):
+        # One COUNT plus one page query joined with category; facets are cached.
+        facets.get_facet_counts()
+        for page_size in (5, 50):
+            catalog_cache.bump_version()
+            facets.get_facet_counts()
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/products/', {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_list_omits_reviews(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('reviews', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['category']['slug'], 'device')
+
+    def test_detail_embeds_reviews(self):
+        product = Product.objects.first()
+        # Last-Modified lookup, product+category, latest reviews, histogram.
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/products/{product.pk}/')
+        self.assertEqual(len(response.data['reviews']), 1)
+        self.assertEqual(response.data['rating_histogram']['4'], 1)
+
+
+class ProductSearchTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        audio = Category.objects.create(name='Audio', slug='audio')
+        cls.headphones = Product.objects.create(
+            category=audio, name='Noise Cancelling Headphones', price=199, stock=3,
+        )
+        cls.speaker = Product.objects.create(
+            category=audio, name='Portable Speaker',
+            description='Pairs with headphones over bluetooth', price=99, stock=3,
+        )
+        Product.objects.create(category=audio, name='Laptop Stand', price=30, stock=3)
+
+    def search(self, keyword):
+        response = self.client.get('/api/products/', {'keyword': keyword})
+        return [p['id'] for p in response.data['results']]
+
+    def test_name_match_ranks_above_description_match(self):
+        self.assertEqual(self.search('headphones'), [self.headphones.pk, self.speaker.pk])
+
+    def test_matches_category_name_and_prefixes(self):
+        self.assertEqual(len(self.search('audi')), 3)
+
+    def test_index_follows_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.speaker.name = 'Bookshelf Speaker'
+            self.speaker.description = ''
+            self.speaker.save()
+        self.assertEqual(self.search('headphones'), [self.headphones.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.headphones.delete()
+        self.assertEqual(self.search('headphones'), [])
+
+    def test_category_rename_reindexes_in_batches(self):
+        with mock.patch.object(search, 'INDEX_BATCH', 2), self.captureOnCommitCallbacks(execute=True):
+            audio = Category.objects.get(slug='audio')
+            audio.name = 'Hifi'
+            audio.save()
+        self.assertEqual(len(self.search('hifi')), 3)
+        self.assertEqual(self.search('audio'), [])
+
+    def test_fts_syntax_in_input_is_harmless(self):
+        self.assertEqual(self.search('"headphones (*'), [self.headphones.pk, self.speaker.pk])
+
+
+class ProductCursorPaginationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Device', slug='device')
+        for i in range(25):
+            Product.objects.create(category=category, name=f'Product {i}', price=100 - i, stock=1)
+
+    def walk(self, params):
+        ids = []
+        response = self.client.get('/api/products/', params)
+        while True:
+            self.assertNotIn('count', response.data)
+            ids.extend(p['id'] for p in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def walk_back(self, params):
+        """Page forward to the end, then back by previous links; every id in order."""
+        response = self.client.get('/api/products/', params)
+        self.assertIsNone(response.data['previous'])
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+        pages = [[p['id'] for p in response.data['results']]]
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            self.assertTrue(response.data['next'])
+            pages.insert(0, [p['id'] for p in response.data['results']])
+        return [product_id for page in pages for product_id in page]
+
+    def test_cursor_walk_is_newest_first_without_count(self):
+        ids = self.walk({'pagination': 'cursor', 'page_size': 10})
+        expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_cursor_walk_by_price(self):
+        ids = self.walk({'pagination': 'cursor', 'sort': 'price', 'page_size': 7})
+        expected = list(Product.objects.order_by('price', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_every_sort_pages_through_ties_without_offset(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # Mostly equal prices and scores, and ratings with NULLs among them.
+        for i, product in enumerate(Product.objects.order_by('id')):
+            Product.objects.filter(id=product.id).update(
+                price=10 + i % 2, trending_score=0, bestselling_score=i % 3 == 0,
+                rating=None if i % 4 == 0 else i % 3,
+            )
+        products = list(Product.objects.values('id', 'price', 'rating', 'bestselling_score', 'trending_score'))
+        expected = {
+            'price': sorted(products, key=lambda p: (p['price'], p['id'])),
+            '-price': sorted(products, key=lambda p: (-p['price'], -p['id'])),
+            '-rating': sorted(products, key=lambda p: (p['rating'] is None, -(p['rating'] or 0), -p['id'])),
+            'trending': sorted(products, key=lambda p: -p['id']),
+            'bestselling': sorted(products, key=lambda p: (-p['bestselling_score'], -p['id'])),
+        }
+        for sort, rows in expected.items():
+            with self.subTest(sort=sort), CaptureQueriesContext(connection) as captured:
+                ids = self.walk({'pagination': 'cursor', 'sort': sort, 'page_size': 4})
+                self.assertEqual(ids, [p['id'] for p in rows])
+                self.assertEqual(self.walk_back({'pagination': 'cursor', 'sort': sort, 'page_size': 4}),
+                                 [p['id'] for p in rows])
+                self.assertFalse([q['sql'] for q in captured if 'OFFSET' in q['sql']])
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['count'], 25)
+
+
+class ProductFilterTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name='Phones', slug='phones')
+        cls.shoes = Category.objects.create(name='Shoes', slug='shoes')
+        cls.cheap_phone = Product.objects.create(
+            category=cls.phones, name='Cheap Phone', price=800, stock=0, rating=3.5,
+        )
+        cls.flagship = Product.objects.create(
+            category=cls.phones, name='Flagship Phone', price=60000, stock=4, rating=4.8,
+        )
+        cls.runner = Product.objects.create(
+            category=cls.shoes, name='Runner', price=4500, stock=9, rating=4.1,
+        )
+        Product.objects.create(
+            category=cls.shoes, name='Retired Shoe', price=100, stock=1, is_active=False,
+        )
+
+    def ids(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return [p['id'] for p in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.ids(category='phones'), [self.cheap_phone.pk, self.flagship.pk])
+        self.assertEqual(self.ids(min_price=1000, max_price=50000), [self.runner.pk])
+        self.assertEqual(self.ids(min_rating=4, sort='-rating'), [self.flagship.pk, self.runner.pk])
+        self.assertEqual(self.ids(in_stock='true', sort='price'), [self.runner.pk, self.flagship.pk])
+
+    def test_invalid_number_is_rejected(self):
+        response = self.client.get('/api/products/', {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_facet_counts(self):
+        data = self.client.get('/api/products/').data['facets']
+        self.assertEqual(
+            [(c['slug'], c['count']) for c in data['category']],
+            [('phones', 2), ('shoes', 1)],
+        )
+        self.assertEqual([b['count'] for b in data['price']], [1, 1, 0, 0, 1])
+        self.assertEqual([b['count'] for b in data['rating']], [2, 3, 3, 3])
+        self.assertEqual(data['in_stock'], 2)
+
+    def test_facets_served_from_cache_until_catalog_changes(self):
+        self.client.get('/api/products/')
+        # A different page misses the response cache but reuses the facets.
+        with self.assertNumQueries(2):
+            self.client.get('/api/products/', {'sort': 'price'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.runner.is_active = False
+            self.runner.save()
+        data = self.client.get('/api/products/').data['facets']
+        self.assertEqual([c['count'] for c in data['category']], [2, 0])
+
+
+    def test_facets_outlive_changes_that_leave_the_buckets_alone(self):
+        reviewer = APIClient()
+        reviewer.force_authenticate(get_user_model().objects.create_user('critic', password='pw'))
+        self.client.get('/api/products/')
+        with mock.patch.object(facets, 'compute_facet_counts', wraps=facets.compute_facet_counts) as compute:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.runner.description = 'Light'
+                self.runner.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                # 4.8 -> 5.0 stays in the 4-star bucket.
+                reviewer.post(f'/api/products/{self.flagship.pk}/reviews/', {'rating': 5})
+            self.assertEqual(self.client.get('/api/products/', {'sort': '-rating'}).data['results'][0]['rating'], '5.00')
+            self.assertFalse(compute.called)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.runner.price = 60000
+                self.runner.save()
+            data = self.client.get('/api/products/').data['facets']
+            self.assertEqual(compute.call_count, 1)
+        self.assertEqual([b['count'] for b in data['price']], [1, 0, 0, 0, 2])
+
+class ProductReviewAggregateTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [User.objects.create_user(f'user{i}', password='pass12345') for i in range(3)]
+        category = Category.objects.create(name='Device', slug='device')
+        cls.product = Product.objects.create(category=category, name='Phone', price=10, stock=1)
+
+    def review(self, user, rating):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            f'/api/products/{self.product.pk}/reviews/', {'rating': rating, 'comment': 'ok'},
+        )
+
+    def test_migration_seeds_aggregates_from_reviews(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        migration = import_module('products.migrations.0006_review_aggregates')
+        for user, rating in zip(self.users, (5, 3)):
+            Review.objects.create(product=self.product, user=user, rating=rating)
+        Product.objects.filter(id=self.product.id).update(rating='4.50', numReviews=9, rating_sum=0)
+        migration.seed_rating_sum(apps, None)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum, str(self.product.rating)), (2, 8, '4.00'))
+
+    def test_running_aggregate(self):
+        for user, rating in zip(self.users, (5, 4, 4)):
+            self.assertEqual(self.review(user, rating).status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum), (3, 13))
+        self.assertEqual(str(self.product.rating), '4.33')
+
+    def test_second_review_rejected_by_constraint(self):
+        self.review(self.users[0], 5)
+        response = self.review(self.users[0], 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Product already reviewed')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum), (1, 5))
+
+    def test_rating_out_of_range_is_rejected(self):
+        for rating in (0, 6, 50, 'five'):
+            self.assertEqual(self.review(self.users[0], rating).status_code, 400)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum, self.product.rating), (0, 0, None))
+
+    def test_deleting_a_review_takes_it_out_of_the_aggregate(self):
+        for user, rating in zip(self.users, (5, 4, 2)):
+            self.review(user, rating)
+        Review.objects.get(user=self.users[0]).delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum, str(self.product.rating)), (2, 6, '3.00'))
+        for review in Review.objects.all():
+            review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum, self.product.rating), (0, 0, None))
+
+    def test_reconcile_ratings_repairs_drift(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        Review.objects.create(product=self.product, user=self.users[0], rating=2)
+        Review.objects.create(product=self.product, user=self.users[1], rating=5)
+        call_command('reconcile_ratings', chunk_size=1, stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.numReviews, self.product.rating_sum), (2, 7))
+        self.assertEqual(str(self.product.rating), '3.50')
+
+
+class ProductReviewListTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        category = Category.objects.create(name='Device', slug='device')
+        cls.product = Product.objects.create(category=category, name='Phone', price=10, stock=1)
+        cls.reviews = [
+            Review.objects.create(
+                product=cls.product,
+                user=User.objects.create_user(f'user{i}', password='pass12345'),
+                rating=rating,
+            )
+            for i, rating in enumerate([5, 3, 5, 4, 5, 1, 4, 5])
+        ]
+
+    def walk(self, params):
+        ids = []
+        response = self.client.get(f'/api/products/{self.product.pk}/reviews/', params)
+        while True:
+            ids.extend(r['id'] for r in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_newest_first(self):
+        ids = self.walk({'page_size': 3})
+        self.assertEqual(ids, [r.pk for r in reversed(self.reviews)])
+
+    def test_highest_rating_pages_through_ties(self):
+        ids = self.walk({'page_size': 2, 'sort': '-rating'})
+        expected = list(
+            Review.objects.order_by('-rating', '-createdAt', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_bad_cursor_is_404(self):
+        response = self.client.get(f'/api/products/{self.product.pk}/reviews/', {'cursor': 'nope'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_or_inactive_product_is_404(self):
+        self.assertEqual(self.client.get('/api/products/99999/reviews/').status_code, 404)
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/reviews/').status_code, 404)
+
+    def test_detail_embeds_capped_reviews_and_histogram(self):
+        from .serializers import REVIEW_EMBED_LIMIT
+
+        response = self.client.get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(
+            [r['id'] for r in response.data['reviews']],
+            [r.pk for r in reversed(self.reviews)][:REVIEW_EMBED_LIMIT],
+        )
+        self.assertEqual(
+            response.data['rating_histogram'], {'1': 1, '2': 0, '3': 1, '4': 2, '5': 4},
+        )
+
+
+@override_settings(CATALOG_CACHE_STATS_SAMPLE_RATE=1)
+class CatalogResponseCacheTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Device', slug='device')
+        cls.product = Product.objects.create(category=category, name='Phone', price=10, stock=3)
+
+    def test_repeat_requests_skip_the_database(self):
+        self.client.get('/api/products/', {'page_size': 5, 'keyword': ''})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', {'keyword': '', 'page_size': '5'})
+        self.assertEqual(response.data['results'][0]['stock'], 3)
+        self.assertEqual(catalog_cache.get_stats()['hits'], 1)
+
+    def test_write_bumps_version_and_invalidates(self):
+        url = f'/api/products/{self.product.pk}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).update(stock=0)
+            self.product.refresh_from_db()
+            self.product.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['stock'], 0)
+        self.assertEqual(catalog_cache.get_stats()['misses'], 2)
+
+    def test_stats_are_sampled(self):
+        with override_settings(CATALOG_CACHE_STATS_SAMPLE_RATE=0):
+            self.client.get('/api/categories/')
+        self.assertEqual(catalog_cache.get_stats()['misses'], 0)
+        with override_settings(CATALOG_CACHE_STATS_SAMPLE_RATE=0.5), mock.patch('random.random', return_value=0.2):
+            self.client.get('/api/categories/')
+        self.assertEqual(catalog_cache.get_stats()['hits'], 2)
+
+    def test_deploy_check_flags_per_process_cache(self):
+        self.assertEqual([w.id for w in catalog_cache.check_shared_backend(None)], ['products.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(catalog_cache.check_shared_backend(None), [])
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'shop.example'])
+    def test_hosts_are_cached_apart(self):
+        Product.objects.filter(pk=self.product.pk).update(image='products/phone.jpg')
+        url = f'/api/products/{self.product.pk}/'
+        self.client.get(url)
+        response = self.client.get(url, HTTP_HOST='shop.example')
+        self.assertEqual(response.data['image_url'], 'http://shop.example/media/products/phone.jpg')
+
+    def test_categories_cached(self):
+        self.client.get('/api/categories/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories/')
+        self.assertEqual(response.data[0]['slug'], 'device')
+
+
+class ConditionalGetTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Device', slug='device')
+        cls.product = Product.objects.create(category=category, name='Phone', price=10, stock=3)
+
+    def test_list_etag_revalidates_without_queries(self):
+        response = self.client.get('/api/products/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_catalog(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Shoes', slug='shoes')
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_detail_if_modified_since_skips_serializer(self):
+        url = f'/api/products/{self.product.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_review_touches_updated_at(self):
+        before = self.product.updated_at
+        user = get_user_model().objects.create_user('reviewer', password='pass12345')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post(f'/api/products/{self.product.pk}/reviews/', {'rating': 4})
+        self.product.refresh_from_db()
+        self.assertGreater(self.product.updated_at, before)
+
+
+class ImageVariantTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        from PIL import Image
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, 'products'))
+        Image.new('RGB', (800, 400), 'purple').save(os.path.join(self.media_root, 'products/tv.png'))
+        category = Category.objects.create(name='Device', slug='device')
+        self.product = Product.objects.create(
+            category=category, name='TV', price=10, stock=1, image='products/tv.png',
+        )
+
+    def test_render_caps_at_original_width(self):
+        variants = images.render_variants(self.media_root, 'products/tv.png')
+        self.assertEqual(sorted(variants['webp'], key=int), ['320', '640', '800'])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, variants['jpeg']['640'])))
+
+    def test_backfill_command_and_srcset(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        with self.settings(MEDIA_ROOT=self.media_root):
+            call_command('generate_image_variants', workers=1, stdout=StringIO())
+            response = self.client.get(f'/api/products/{self.product.pk}/')
+        srcset = response.data['image_srcset']
+        self.assertEqual(
+            srcset['webp'],
+            'http://testserver/media/products/variants/tv-320w.webp 320w, '
+            'http://testserver/media/products/variants/tv-640w.webp 640w, '
+            'http://testserver/media/products/variants/tv-800w.webp 800w',
+        )
+
+
+class CatalogImportExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.phones = Category.objects.create(name='Phones', slug='phones')
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def call(self, *args, **kwargs):
+        from django.core.management import call_command
+        from io import StringIO
+
+        call_command(*args, stdout=StringIO(), stderr=StringIO(), **kwargs)
+
+    def test_csv_upsert_and_jsonl_round_trip(self):
+        feed = self.write('feed.csv', (
+            'sku,name,price,stock,category,category_name\n'
+            'A1,Phone,100.00,5,phones,\n'
+            'B2,Kettle,20.50,0,kitchen,Kitchen & Home\n'
+            ',Missing Sku,1,1,phones,\n'
+        ))
+        self.call('import_catalog', feed, batch_size=1)
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Category.objects.get(slug='kitchen').name, 'Kitchen & Home')
+
+        self.call('import_catalog', self.write('update.jsonl', (
+            '{"sku": "A1", "name": "Phone 2", "price": "90", "stock": 7, "category": "phones"}\n'
+        )))
+        phone = Product.objects.get(sku='A1')
+        self.assertEqual((phone.name, phone.stock, str(phone.price)), ('Phone 2', 7, '90.00'))
+        self.assertEqual(Product.objects.count(), 2)
+
+        out = os.path.join(self.tmp, 'out.jsonl')
+        self.call('export_catalog', out, chunk_size=1)
+        with open(out) as fh:
+            exported = [json.loads(line) for line in fh]
+        self.assertEqual(
+            [(r['sku'], r['category'], r['price']) for r in exported],
+            [('A1', 'phones', '90.00'), ('B2', 'kitchen', '20.50')],
+        )
+
+    def test_partial_feed_keeps_missing_columns(self):
+        self.call('import_catalog', self.write('feed.csv', (
+            'sku,name,description,price,stock,category,image\n'
+            'A1,Phone,Slim,100,5,phones,products/a.jpg\n'
+            'B2,Case,Tough,10,9,phones,products/b.jpg\n'
+        )))
+        Product.objects.update(image_variants={'webp': {'320': 'products/variants/x.webp'}})
+
+        self.call('import_catalog', self.write('prices.csv', (
+            'sku,name,price,category\nA1,Phone,90,phones\n'
+        )))
+        phone = Product.objects.get(sku='A1')
+        self.assertEqual((phone.description, phone.stock, phone.image.name), ('Slim', 5, 'products/a.jpg'))
+        self.assertEqual(str(phone.price), '90.00')
+        self.assertTrue(phone.image_variants)
+
+        self.call('import_catalog', self.write('images.jsonl', (
+            '{"sku": "A1", "name": "Phone", "price": "90", "category": "phones", "image": "products/a2.jpg"}\n'
+            '{"sku": "B2", "name": "Case", "price": "10", "category": "phones", "image": "products/b.jpg"}\n'
+        )))
+        phone, case = Product.objects.order_by('sku')
+        self.assertEqual((phone.image.name, phone.image_variants), ('products/a2.jpg', {}))
+        self.assertTrue(case.image_variants)
+
+    def test_legacy_products_round_trip_with_assign_skus(self):
+        legacy = Product.objects.create(category=self.phones, name='Old Phone', price=50, stock=2)
+        out = os.path.join(self.tmp, 'out.jsonl')
+        # A plain export writes nothing, and the sku is empty.
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.call('export_catalog', out)
+        self.assertEqual(callbacks, [])
+        legacy.refresh_from_db()
+        self.assertIsNone(legacy.sku)
+        with open(out) as fh:
+            self.assertEqual(json.loads(fh.readline())['sku'], '')
+
+        out = os.path.join(self.tmp, 'out.csv')
+        self.call('export_catalog', out, assign_skus=True)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.sku, f'legacy-{legacy.id}')
+        with open(out) as fh:
+            self.write('in.csv', fh.read().replace('Old Phone', 'Older Phone'))
+        self.call('import_catalog', os.path.join(self.tmp, 'in.csv'))
+        self.assertEqual(list(Product.objects.values_list('id', 'name')), [(legacy.id, 'Older Phone')])
+
+    def test_imported_products_are_searchable(self):
+        self.call('import_catalog', self.write('feed.csv', (
+            'sku,name,price,stock,category\nZ9,Espresso Grinder,199,3,phones\n'
+        )))
+        response = self.client.get('/api/products/', {'keyword': 'grinder'})
+        self.assertEqual(response.data['results'][0]['sku'], 'Z9')
+
+
+class CategoryTreeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.electronics = Category.objects.create(name='Electronics', slug='electronics')
+        self.phones = Category.objects.create(name='Phones', slug='phones', parent=self.electronics)
+        self.android = Category.objects.create(name='Android', slug='android', parent=self.phones)
+        self.laptops = Category.objects.create(name='Laptops', slug='laptops', parent=self.electronics)
+        self.pixel = Product.objects.create(category=self.android, name='Pixel', price=500, stock=1)
+        Product.objects.create(category=self.laptops, name='Notebook', price=900, stock=1)
+        Product.objects.create(category=self.phones, name='Old phone', price=50, stock=1, is_active=False)
+
+    def counts(self):
+        return dict(Category.objects.values_list('slug', 'product_count'))
+
+    def test_paths_and_subtree_counts(self):
+        self.android.refresh_from_db()
+        self.assertEqual(self.android.path, self.phones.path + f'{self.android.pk:08d}/')
+        self.assertEqual(self.android.depth, 2)
+        self.assertEqual(
+            [c.slug for c in self.phones.subtree().order_by('path')], ['phones', 'android'],
+        )
+        self.assertEqual(self.counts(), {'electronics': 2, 'phones': 1, 'android': 1, 'laptops': 1})
+
+    def test_counts_follow_product_changes(self):
+        self.pixel.category = self.laptops
+        self.pixel.save()
+        self.assertEqual(self.counts(), {'electronics': 2, 'phones': 0, 'android': 0, 'laptops': 2})
+        self.pixel.is_active = False
+        self.pixel.save()
+        self.assertEqual(self.counts()['laptops'], 1)
+        Product.objects.get(name='Notebook').delete()
+        self.assertEqual(self.counts(), {'electronics': 0, 'phones': 0, 'android': 0, 'laptops': 0})
+
+    def test_moving_a_subtree(self):
+        gadgets = Category.objects.create(name='Gadgets', slug='gadgets')
+        self.phones.parent = gadgets
+        self.phones.save()
+        self.android.refresh_from_db()
+        self.assertTrue(self.android.path.startswith(gadgets.path))
+        self.assertEqual(self.android.depth, 2)
+        self.assertEqual(self.counts(), {'electronics': 1, 'gadgets': 1, 'phones': 1, 'android': 1, 'laptops': 1})
+
+        self.electronics.parent = self.laptops
+        with self.assertRaises(ValueError):
+            self.electronics.save()
+
+    def test_listing_filters_by_subtree(self):
+        response = self.client.get('/api/products/', {'category': 'electronics'})
+        self.assertEqual({p['name'] for p in response.data['results']}, {'Pixel', 'Notebook'})
+        response = self.client.get('/api/products/', {'category': 'unknown'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_category_endpoint(self):
+        data = self.client.get('/api/categories/').data
+        self.assertEqual(
+            [(c['slug'], c['depth'], c['product_count']) for c in data],
+            [('electronics', 0, 2), ('phones', 1, 1), ('android', 2, 1), ('laptops', 1, 1)],
+        )
+        data = self.client.get('/api/categories/', {'parent': 'electronics'}).data
+        self.assertEqual([c['slug'] for c in data], ['phones', 'laptops'])
+        data = self.client.get('/api/categories/', {'subtree': 'phones'}).data
+        self.assertEqual([c['slug'] for c in data], ['phones', 'android'])
+
+    def test_batch_writes_and_recount(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        api = APIClient()
+        api.force_authenticate(get_user_model().objects.create_user('admin', is_admin=True))
+        api.post('/api/admin/products/batch/update/', [
+            {'id': self.pixel.pk, 'category_id': self.laptops.pk},
+        ], format='json')
+        self.assertEqual(self.counts(), {'electronics': 2, 'phones': 0, 'android': 0, 'laptops': 2})
+        api.post('/api/admin/products/batch/delete/', {'ids': [self.pixel.pk]}, format='json')
+        self.assertEqual(self.counts()['electronics'], 1)
+
+        Category.objects.update(product_count=7)
+        call_command('recount_categories', stdout=StringIO())
+        self.assertEqual(self.counts(), {'electronics': 1, 'phones': 0, 'android': 0, 'laptops': 1})
+
+
+class ProductFeedTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        phones = Category.objects.create(name='Phones', slug='phones')
+        self.phone = Product.objects.create(
+            category=phones, name='Phone', sku='P1', price='199.00', stock=3, image='products/p.jpg',
+        )
+        self.hidden = Product.objects.create(category=phones, name='Hidden', price=5, stock=0, is_active=False)
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_full_feed(self):
+        response = self.client.get('/api/products/feed/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['sku'], 'P1')
+        self.assertEqual(rows[0]['price'], '199.00')
+        self.assertEqual(rows[0]['category'], 'phones')
+        self.assertEqual(rows[0]['image_url'], 'http://testserver/media/products/p.jpg')
+        self.assertNotIn('reviews', rows[0])
+
+    def test_csv_and_gzip(self):
+        import csv
+        import gzip
+
+        response = self.client.get('/api/products/feed/', {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = list(csv.reader(gzip.decompress(self.read(response)).decode().splitlines()))
+        self.assertEqual(lines[0][:3], ['id', 'sku', 'name'])
+        self.assertEqual([line[1] for line in lines[1:]], ['P1'])
+
+    def test_since_returns_changes_including_deactivations(self):
+        first = self.client.get('/api/products/feed/')
+        self.read(first)
+        Product.objects.filter(pk=self.phone.pk).update(updated_at='2000-01-01T00:00:00Z')
+        self.hidden.save()
+
+        response = self.client.get('/api/products/feed/', {'since': '2020-01-01T00:00:00Z'})
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([(r['name'], r['is_active']) for r in rows], [('Hidden', False)])
+        # Unix seconds work too.
+        response = self.client.get('/api/products/feed/', {'since': '0'})
+        self.assertEqual(len(self.read(response).splitlines()), 2)
+        self.assertIn('X-Feed-Timestamp', first)
+
+    def test_bad_since(self):
+        response = self.client.get('/api/products/feed/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductSuggestTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        suggest.reset()
+        self.addCleanup(suggest.reset)
+        self.wearables = Category.objects.create(name='Smart Wearables', slug='wearables')
+        self.watch = Product.objects.create(
+            category=self.wearables, name='Smart Watch', price=100, stock=1, numReviews=50,
+        )
+        Product.objects.create(category=self.wearables, name='Smart Phone', price=300, stock=1, numReviews=5)
+        Product.objects.create(category=self.wearables, name='Crème Brûlée Torch', price=20, stock=1)
+        Product.objects.create(category=self.wearables, name='Smartish Hidden', price=1, stock=1, is_active=False)
+
+    def names(self, q, **params):
+        response = self.client.get('/api/products/suggest/', {'q': q, **params})
+        return [p['name'] for p in response.data['products']]
+
+    def test_prefix_matches_ranked_by_popularity(self):
+        self.assertEqual(self.names('sma'), ['Smart Watch', 'Smart Phone'])
+        self.assertEqual(self.names('wat'), ['Smart Watch'])
+        self.assertEqual(self.names('sm ph'), ['Smart Phone'])
+        self.assertEqual(self.names('creme bru'), ['Crème Brûlée Torch'])
+        self.assertEqual(self.names('sma', limit=1), ['Smart Watch'])
+        data = self.client.get('/api/products/suggest/', {'q': 'wear'}).data
+        self.assertEqual(data['categories'], [{'slug': 'wearables', 'name': 'Smart Wearables'}])
+
+    def test_queries_skip_the_database(self):
+        self.names('s')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('smart w'), ['Smart Watch'])
+
+    def test_index_follows_product_signals(self):
+        self.names('s')
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(category=self.wearables, name='Smart Ring', price=80, stock=1, numReviews=90)
+        self.assertEqual(self.names('smart')[0], 'Smart Ring')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.watch.is_active = False
+            self.watch.save()
+        self.assertNotIn('Smart Watch', self.names('smart'))
+
+    def test_other_processes_catch_up(self):
+        from django.test import override_settings
+        from django.utils import timezone
+
+        self.names('s')
+        Product.objects.filter(pk=self.watch.pk).update(name='Steel Watch', updated_at=timezone.now())
+        catalog_cache.bump_version()
+        with override_settings(SUGGEST_REFRESH_SECONDS=0):
+            self.assertEqual(self.names('steel'), ['Steel Watch'])
+
+    def test_short_prefixes_beyond_the_top_list(self):
+        index = suggest.PrefixIndex((i, f'Alpha {i}', i) for i in range(suggest.TOP_CACHE + 10))
+        for i in range(suggest.TOP_CACHE + 10 - 5, suggest.TOP_CACHE + 10):
+            index.remove(i)
+        index.add('new', 'Alpine', 1000)
+        keys = [key for key, _label in index.search('a', 8)]
+        self.assertEqual(keys, ['new'] + list(range(suggest.TOP_CACHE + 4, suggest.TOP_CACHE - 3, -1)))
+
+
+class ProductRecommendationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user('buyer', password='pw')
+        category = Category.objects.create(name='Coffee', slug='coffee')
+        self.grinder, self.beans, self.filters, self.mug = (
+            Product.objects.create(category=category, name=name, price=10, stock=5)
+            for name in ('Grinder', 'Beans', 'Filters', 'Mug')
+        )
+
+    def order(self, *products):
+        from orders.models import Order, OrderItem
+
+        order = Order.objects.create(user=self.user, total_price=0, address='a', city='c', postal_code='p', country='x')
+        OrderItem.objects.bulk_create(OrderItem(order=order, product=p, price=10, quantity=1) for p in products)
+
+    def related(self, product):
+        response = self.client.get(f'/api/products/{product.pk}/related/')
+        return [(item['name'], item['score']) for item in response.data['results']]
+
+    def build(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return recommendations.build(settle_seconds=0, **kwargs)
+
+    def test_neighbours_ranked_by_cosine_similarity(self):
+        self.order(self.grinder, self.beans)
+        self.order(self.grinder, self.beans, self.filters)
+        self.order(self.beans, self.mug)
+        self.build()
+        # beans: 3 orders, grinder: 2, filters: 1, mug: 1.
+        self.assertEqual(self.related(self.grinder), [('Beans', round(2 / 6 ** 0.5, 4)), ('Filters', 0.7071)])
+        self.assertEqual([name for name, _score in self.related(self.beans)], ['Grinder', 'Filters', 'Mug'])
+        # The product's existence check, then the neighbours.
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/products/{self.mug.pk}/related/', {'limit': 1})
+        self.assertEqual(self.client.get('/api/products/99999/related/').status_code, 404)
+
+    def test_pure_python_path_matches_numpy(self):
+        baskets = [[1, 2], [1, 2, 3], [2, 4], [3]]
+        counts = recommendations.count_pairs(baskets)
+        totals = {a: n for (a, b), n in counts.items() if a == b}
+        rows = [(a, b, n) for (a, b), n in counts.items()]
+        neighbours = recommendations.top_neighbours(rows, totals, 2, 1)
+        with mock.patch.object(recommendations, '_sparse', return_value=(None, None)):
+            self.assertEqual(dict(recommendations.count_pairs(baskets)), dict(counts))
+            self.assertEqual(dict(recommendations.top_neighbours(rows, totals, 2, 1)), dict(neighbours))
+        self.assertEqual(counts[1, 2], 2)
+        self.assertEqual(counts[2, 2], 3)
+        self.assertEqual([b for b, _score in neighbours[2]], [1, 4])
+
+    def test_incremental_runs_only_count_new_orders(self):
+        self.order(self.grinder, self.beans)
+        self.build()
+        self.assertEqual(self.related(self.mug), [])
+        self.order(self.mug, self.beans)
+        run = self.build()
+        self.assertEqual((run.full, run.orders, run.products), (False, 1, 2))
+        self.assertEqual([name for name, _score in self.related(self.mug)], ['Beans'])
+        self.assertEqual([name for name, _score in self.related(self.beans)], ['Grinder', 'Mug'])
+        self.assertEqual(self.build(full=True).orders, 2)
+        self.assertEqual([name for name, _score in self.related(self.beans)], ['Grinder', 'Mug'])
+
+        # Inactive neighbours are hidden without a rebuild.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mug.is_active = False
+            self.mug.save()
+        self.assertEqual([name for name, _score in self.related(self.beans)], ['Grinder'])
+
+    def test_failed_run_counts_nothing(self):
+        self.order(self.grinder, self.beans)
+        self.build()
+        self.order(self.grinder, self.beans)
+        with mock.patch.object(recommendations, 'rescore', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.build()
+            with self.assertRaises(RuntimeError):
+                self.build(full=True)
+        self.assertEqual(RecommendationRun.objects.count(), 1)
+        self.assertEqual(CoPurchase.objects.get(product=self.grinder, other=self.beans).count, 1)
+        self.assertEqual(self.related(self.grinder), [('Beans', 1.0)])
+
+        self.assertEqual(self.build().orders, 1)
+        self.assertEqual(CoPurchase.objects.get(product=self.grinder, other=self.beans).count, 2)
+
+
+class ProductSalesRankingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user('buyer', password='pw')
+        self.kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        self.toys = Category.objects.create(name='Toys', slug='toys')
+        self.kettle, self.pan = (
+            Product.objects.create(category=self.kitchen, name=name, price=10, stock=50)
+            for name in ('Kettle', 'Pan')
+        )
+        self.kite = Product.objects.create(category=self.toys, name='Kite', price=10, stock=50)
+
+    def checkout(self, **quantities):
+        from cart.models import Cart, CartItem
+
+        cart, _created = Cart.objects.get_or_create(user=self.user)
+        for name, quantity in quantities.items():
+            CartItem.objects.create(cart=cart, product=getattr(self, name), quantity=quantity)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        address = {'address': 'a', 'city': 'c', 'postal_code': 'p', 'country': 'x'}
+        self.assertEqual(client.post('/api/orders/add/', address, format='json').status_code, 201)
+
+    def names(self, **params):
+        return [p['name'] for p in self.client.get('/api/products/', params).data['results']]
+
+    def test_orders_update_hourly_and_daily_rollups(self):
+        self.checkout(kettle=2, pan=1)
+        self.checkout(kettle=3)
+        rollups = SalesRollup.objects.filter(product=self.kettle)
+        self.assertEqual(sorted(rollups.values_list('period', 'units')), [('day', 5), ('hour', 5)])
+        self.assertEqual(rollups.get(period='day').start.hour, 0)
+
+        expected = sorted(SalesRollup.objects.values_list('product', 'period', 'start', 'units'))
+        sales.rebuild_rollups()
+        self.assertEqual(sorted(SalesRollup.objects.values_list('product', 'period', 'start', 'units')), expected)
+
+    def test_rankings_decay_and_sort_the_listing(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        # The kite sold more, but two days ago; the pan is selling now.
+        sales.record_sale(now - timedelta(days=2), [(self.kite.pk, 10)])
+        sales.record_sale(now, [(self.pan.pk, 3), (self.kettle.pk, 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sales.rank(now), 3)
+
+        self.assertEqual(self.names(sort='trending'), ['Pan', 'Kettle', 'Kite'])
+        self.assertEqual(self.names(sort='bestselling'), ['Kite', 'Pan', 'Kettle'])
+        self.assertEqual(self.names(sort='bestselling', category='kitchen'), ['Pan', 'Kettle'])
+        self.assertEqual(self.names(sort='trending', pagination='cursor', page_size=2), ['Pan', 'Kettle'])
+
+        # A week later nothing is trending any more.
+        sales.rank(now + timedelta(days=7))
+        self.assertEqual(Product.objects.filter(trending_score__gt=0).count(), 0)
+        self.assertEqual(SalesRollup.objects.filter(period='hour').count(), 0)
+
+
+class ProductBatchAdminTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user('admin', password='pass12345', is_admin=True)
+        cls.category = Category.objects.create(name='Device', slug='device')
+        cls.products = [
+            Product.objects.create(category=cls.category, name=f'P{i}', price=10, stock=1)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_requires_admin(self):
+        response = APIClient().post('/api/admin/products/batch/delete/', {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch_create(self):
+        payload = [
+            {'name': f'New {i}', 'price': '5.00', 'stock': i, 'category_id': self.category.pk}
+            for i in range(20)
+        ]
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.api.post('/api/admin/products/batch/create/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created'] * 20)
+        self.assertEqual(Product.objects.filter(name__startswith='New').count(), 20)
+        # One version bump for the whole batch.
+        self.assertEqual(len(callbacks), 1)
+
+    def test_batch_create_is_all_or_nothing(self):
+        payload = [
+            {'name': 'Good', 'price': '5.00', 'stock': 1, 'category_id': self.category.pk},
+            {'name': 'Bad', 'price': 'free', 'stock': 1, 'category_id': 999},
+        ]
+        response = self.api.post('/api/admin/products/batch/create/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['valid', 'invalid'])
+        self.assertEqual(set(response.data['results'][1]['errors']), {'price', 'category_id'})
+        self.assertFalse(Product.objects.filter(name='Good').exists())
+
+    def test_batch_update_touches_only_given_fields(self):
+        first, second, _ = self.products
+        payload = [{'id': first.pk, 'price': '7.50'}, {'id': second.pk, 'stock': 40}]
+        # Load products, savepoint, one UPDATE per field set, search reindex
+        # (delete + insert), release: independent of the number of items.
+        with self.assertNumQueries(7):
+            response = self.api.post('/api/admin/products/batch/update/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((str(first.price), first.stock), ('7.50', 1))
+        self.assertEqual((str(second.price), second.stock), ('10.00', 40))
+
+    def test_batch_update_unknown_id(self):
+        response = self.api.post(
+            '/api/admin/products/batch/update/', [{'id': 999, 'stock': 1}], format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id', response.data['results'][0]['errors'])
+
+    def test_batch_update_rejects_repeated_ids(self):
+        first = self.products[0]
+        other = Category.objects.create(name='Other', slug='other')
+        response = self.api.post('/api/admin/products/batch/update/', [
+            {'id': first.pk, 'category_id': other.pk}, {'id': first.pk, 'category_id': other.pk},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['valid', 'invalid'])
+        self.assertIn('id', response.data['results'][1]['errors'])
+        self.category.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.category.product_count, other.product_count), (3, 0))
+
+    def test_batch_delete(self):
+        ids = [p.pk for p in self.products[:2]] + [999]
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.api.post('/api/admin/products/batch/delete/', {'ids': ids}, format='json')
+        self.assertEqual(
+            [r['status'] for r in response.data['results']], ['deleted', 'deleted', 'not_found'],
+        )
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(len(callbacks), 1)
+
+
+class DatasetBenchmarkTests(CatalogTestCase):
+    def call(self, *args, **kwargs):
+        from django.core.management import call_command
+        from io import StringIO
+
+        call_command(*args, stdout=StringIO(), stderr=StringIO(), **kwargs)
+
+    def test_generated_dataset_is_consistent(self):
+        from datetime import timedelta
+        from django.db.models import Count, Max, Min, Sum
+        from django.utils import timezone
+        from orders.models import Order
+
+        self.call('generate_dataset', users=30, products=60, categories=4, batch_size=25, workers=0)
+        self.assertEqual(Product.objects.count(), 60)
+        self.assertEqual(get_user_model().objects.count(), 30)
+        self.assertTrue(Order.objects.exists())
+        # Orders are spread over the default year rather than all stamped now.
+        dates = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        self.assertGreater(dates['last'] - dates['first'], timedelta(days=30))
+        self.assertLessEqual(timezone.now() - dates['first'], timedelta(days=365, minutes=1))
+        for product in Product.objects.annotate(n=Count('review'), total=Sum('review__rating')):
+            self.assertEqual((product.numReviews, product.rating_sum), (product.n, product.total or 0))
+        # The search index was rebuilt after the bulk inserts.
+        self.assertEqual(self.client.get('/api/products/', {'keyword': 'smart watch'}).status_code, 200)
+
+    def test_benchmark_covers_every_route(self):
+        self.call('generate_dataset', users=10, products=20, categories=2, workers=0)
+        products = Product.objects.count()
+        with tempfile.NamedTemporaryFile(suffix='.json') as report:
+            self.call('benchmark_endpoints', repeat=2, output=report.name)
+            data = json.load(report)
+        self.assertEqual(data['uncovered'], [])
+        self.assertTrue(all(row['status'] < 500 for row in data['endpoints']))
+        self.assertEqual(
+            {'api/cart/', 'api/orders/myorders/', 'api/admin/products/batch/delete/'}
+            - {row['route'] for row in data['endpoints']},
+            set(),
+        )
+        # Writes made while timing are rolled back.
+        self.assertEqual(Product.objects.count(), products)
@@ -1,23 +1,37 @@
 from django.urls import path
-from . import views
 from .views import (
     ProductListView,
     ProductDetailView,
+    ProductFeedView,
+    ProductSuggestView,
+    ProductRelatedView,
+    ProductReviewListView,
     CategoryListView,
     ProductCreateView,
     ProductUpdateView,
     ProductDeleteView,
+    CatalogCacheStatsView,
+    ProductBatchCreateView,
+    ProductBatchUpdateView,
+    ProductBatchDeleteView,
 )
 
 urlpatterns = [
     # Public
     path('products/', ProductListView.as_view()),
+    path('products/feed/', ProductFeedView.as_view()),
+    path('products/suggest/', ProductSuggestView.as_view()),
     path('products/<int:pk>/', ProductDetailView.as_view()),
-    path('products/<int:pk>/reviews/', views.createProductReview, name='create-review'),
+    path('products/<int:pk>/related/', ProductRelatedView.as_view()),
+    path('products/<int:pk>/reviews/', ProductReviewListView.as_view(), name='product-reviews'),
     path('categories/', CategoryListView.as_view()),
 
     # Admin
     path('admin/products/create/', ProductCreateView.as_view()),
     path('admin/products/update/<int:pk>/', ProductUpdateView.as_view()),
     path('admin/products/delete/<int:pk>/', ProductDeleteView.as_view()),
+    path('admin/products/batch/create/', ProductBatchCreateView.as_view()),
+    path('admin/products/batch/update/', ProductBatchUpdateView.as_view()),
+    path('admin/products/batch/delete/', ProductBatchDeleteView.as_view()),
+    path('admin/catalog/cache/', CatalogCacheStatsView.as_view()),
 ]
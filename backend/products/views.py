@@ -1,102 +1,436 @@
+import re
+
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
 
 # ... existing imports ...
-from .models import Product, Category, Review
-from .serializers import ProductSerializer, CategorySerializer
+from rest_framework.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from django.shortcuts import get_object_or_404
+from django.db.models import F
+
+from .models import Product, Category, RelatedProduct, Review
+from . import cache as catalog_cache, categories, facets, feed, images, search, suggest
+from .signals import apply_rating_change, bulk_changes, products_bulk_changed
+from .serializers import (
+    ProductBatchSerializer,
+    ProductSerializer,
+    ProductListSerializer,
+    ProductDetailSerializer,
+    CategorySerializer,
+    ReviewInputSerializer,
+    ReviewSerializer,
+)
 
 # ... existing views ...
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def createProductReview(request, pk):
-    user = request.user
-    product = Product.objects.get(id=pk)
+from .serializers import ProductSerializer, CategorySerializer
+from rest_framework import permissions
+from .permissions import IsAdminUserCustom
+from rest_framework.permissions import AllowAny
+from .pagination import StandardResultsSetPagination, CatalogCursorPagination, ReviewPagination
 
-    # 1. Check if user already reviewed
-    alreadyExists = product.review_set.filter(user=user).exists()
-    if alreadyExists:
-        return Response({'detail': 'Product already reviewed'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # 2. Check if rating is provided
-    data = request.data
-    rating = data.get('rating', 0) 
-    if rating == 0:
-        return Response({'detail': 'Please select a rating'}, status=status.HTTP_400_BAD_REQUEST)
+class ProductListView(catalog_cache.CachedCatalogMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
+    pagination_class = StandardResultsSetPagination
+    authentication_classes = []
 
-    # 3. Create review
-    review = Review.objects.create(
-        user=user,
-        product=product,
-        name=user.username,
-        rating=rating,
-        comment=data.get('comment', '')
-    )
+    @property
+    def paginator(self):
+        # ?pagination=cursor opts into keyset paging; page numbers stay the default.
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = CatalogCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
-    # 4. Update Product stats
-    reviews = product.review_set.all()
-    product.numReviews = len(reviews)
+    # Orderings for ?sort= in page-number mode (cursor mode: see CatalogCursorPagination).
+    sort_orderings = {
+        'newest': ('-created_at', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        '-rating': ('-rating', '-id'),
+        'trending': ('-trending_score', '-id'),
+        'bestselling': ('-bestselling_score', '-id'),
+    }
 
-    total = 0
-    for i in reviews:
-        total += i.rating
+    def _number_param(self, name):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({name: 'A valid number is required.'})
 
-    product.rating = total / len(reviews)
-    product.save()
+    def get_queryset(self):
+        params = self.request.query_params
+        # Category is embedded in every row, so join it in the page query.
+        queryset = (
+            Product.objects.filter(is_active=True)
+            .select_related('category')
+            .order_by('id')
+        )
 
-    return Response('Review Added')
+        category = params.get('category')
+        if category:
+            # The category and everything below it: one range scan on path.
+            node = Category.objects.filter(slug=category).first()
+            if node is None:
+                return queryset.none()
+            queryset = queryset.filter(category__in=node.subtree())
 
+        min_price = self._number_param('min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        max_price = self._number_param('max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
 
+        min_rating = self._number_param('min_rating')
+        if min_rating is not None:
+            queryset = queryset.filter(rating__gte=min_rating)
 
+        if params.get('in_stock') in ('1', 'true', 'True'):
+            queryset = queryset.filter(stock__gt=F('reserved_stock'))
 
+        keyword = params.get('keyword')
+        if keyword:
+            queryset = search.search(queryset, keyword)
 
-from .serializers import ProductSerializer, CategorySerializer
-from rest_framework import permissions
-from .permissions import IsAdminUserCustom
-from rest_framework.permissions import AllowAny
-from .pagination import StandardResultsSetPagination
+        # An explicit sort overrides search relevance.
+        sort = params.get('sort')
+        if sort in self.sort_orderings:
+            queryset = queryset.order_by(*self.sort_orderings[sort])
 
+        return queryset
 
-class ProductListView(generics.ListAPIView):
-    serializer_class = ProductSerializer
-    pagination_class = StandardResultsSetPagination
+    def get_cache_key_extra(self):
+        # Pages embed the facets, and in_stock pages depend on what they count.
+        return (catalog_cache.get_facets_version(),)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = facets.get_facet_counts()
+        return response
+
+
+class ProductDetailView(catalog_cache.CachedCatalogMixin, generics.RetrieveAPIView):
+    queryset = Product.objects.filter(is_active=True).select_related('category')
+    serializer_class = ProductDetailSerializer
     authentication_classes = []
 
-    def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True)
-        keyword = self.request.query_params.get('keyword')
-        if keyword:
-            queryset = queryset.filter(name__icontains=keyword)
-        return queryset
+    def get_cache_key_extra(self):
+        # Holds change available_stock without a catalog version bump but
+        # touch updated_at, so each product's entry follows its own row.
+        self.updated_at = (
+            Product.objects.filter(pk=self.kwargs['pk'], is_active=True)
+            .values_list('updated_at', flat=True).first()
+        )
+        return (self.updated_at,)
 
+    def get_last_modified(self):
+        return int(self.updated_at.timestamp()) if self.updated_at else None
 
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.filter(is_active=True)
-    serializer_class = ProductSerializer
+
+class ProductRelatedView(catalog_cache.CachedCatalogMixin, generics.ListAPIView):
+    """
+    "Frequently bought together": up to ``?limit=`` (default 8, max 20)
+    active products, best co-purchase score first, precomputed by
+    ``manage.py build_recommendations``. Empty for products never ordered;
+    404 for unknown or inactive ones.
+    """
+    serializer_class = ProductListSerializer
     authentication_classes = []
+    permission_classes = [AllowAny]
+    pagination_class = None
+
+    def list(self, request, pk):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        get_object_or_404(Product, pk=pk, is_active=True)
+        related = list(
+            RelatedProduct.objects.filter(product_id=pk, related__is_active=True)
+            .select_related('related__category').order_by('-score')[:limit]
+        )
+        results = self.get_serializer([row.related for row in related], many=True).data
+        for item, row in zip(results, related):
+            item['score'] = round(row.score, 4)
+        return Response({'product': pk, 'results': results})
+
+
+class ProductSuggestView(APIView):
+    """
+    Search-as-you-type: ``?q=<text>&limit=<n>`` returns the most reviewed
+    products and the largest categories whose names have a word starting
+    with each word of ``q``, from the in-process index in products/suggest.py.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        text = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return Response({'query': text, **suggest.get_suggester().suggest(text, limit)})
+
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class ProductFeedView(APIView):
+    """
+    Stream the active catalog, one flat row per product, as NDJSON
+    (default) or CSV (``?format=csv`` or ``Accept: text/csv``), gzipped
+    on the fly for clients that accept it.
+
+    ``?since=<ISO 8601 | Unix time>`` returns only products changed at or
+    after that moment, oldest change first and including deactivated
+    ones (``is_active: false``), so partners can sync incrementally; pass
+    the previous response's ``X-Feed-Timestamp`` as the next ``since``.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [feed.NDJSONRenderer, feed.CSVRenderer]
+
+    def get(self, request):
+        since = feed.parse_since(request.query_params.get('since'))
+        started = timezone.now()
+        if since is None:
+            products = Product.objects.filter(is_active=True).order_by('id')
+        else:
+            products = Product.objects.filter(updated_at__gte=since).order_by('updated_at', 'id')
 
+        fmt = request.accepted_renderer.format
+        media_base = request.build_absolute_uri(default_storage.url(''))
+        content = feed.ENCODERS[fmt](feed.rows(products, media_base))
+        gzip = ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if gzip:
+            content = compress_sequence(content)
 
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.all()
+        response = StreamingHttpResponse(content, content_type=f'{request.accepted_renderer.media_type}; charset=utf-8')
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        response['Content-Disposition'] = f'inline; filename="products.{fmt}"'
+        response['X-Feed-Timestamp'] = started.isoformat()
+        return response
+
+
+class ProductReviewListView(generics.ListAPIView):
+    """GET: keyset-paged reviews of a product (?sort=newest|-rating). POST: add a review."""
+    serializer_class = ReviewSerializer
+    pagination_class = ReviewPagination
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        return Review.objects.filter(product_id=self.kwargs['pk'])
+
+    def list(self, request, *args, **kwargs):
+        # Unknown and inactive products are 404s, as on the detail view.
+        get_object_or_404(Product, pk=self.kwargs['pk'], is_active=True)
+        return super().list(request, *args, **kwargs)
+
+    def post(self, request, pk):
+        user = request.user
+        product = get_object_or_404(Product, id=pk)
+
+        serializer = ReviewInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'detail': 'Please select a rating from 1 to 5'}, status=status.HTTP_400_BAD_REQUEST)
+        rating = serializer.validated_data['rating']
+
+        with transaction.atomic():
+            # Create review; the (product, user) constraint rejects repeats
+            try:
+                with transaction.atomic():
+                    Review.objects.create(
+                        user=user,
+                        product=product,
+                        name=user.username,
+                        rating=rating,
+                        comment=serializer.validated_data['comment'],
+                    )
+            except IntegrityError:
+                return Response({'detail': 'Product already reviewed'}, status=status.HTTP_400_BAD_REQUEST)
+
+            apply_rating_change(product.pk, 1, rating)
+
+        return Response('Review Added')
+
+
+class CategoryListView(catalog_cache.CachedCatalogMixin, generics.ListAPIView):
+    """
+    The category tree, depth first. ``?parent=<slug>`` lists that
+    category's children, ``?subtree=<slug>`` the category and all its
+    descendants.
+    """
     serializer_class = CategorySerializer
     authentication_classes = []
 
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = Category.objects.all()
+        if params.get('subtree'):
+            node = Category.objects.filter(slug=params['subtree']).first()
+            if node is None:
+                return queryset.none()
+            queryset = node.subtree()
+        if params.get('parent'):
+            queryset = queryset.filter(parent__slug=params['parent'])
+        return queryset.order_by('path')
+
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAdminUserCustom]
+
+    def get(self, request):
+        return Response(catalog_cache.get_stats())
+
 
 class ProductCreateView(generics.CreateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]   #[IsAdminUserCustom]
 
+    def perform_create(self, serializer):
+        product = serializer.save()
+        images.queue_variants(product)
+
 
 class ProductUpdateView(generics.UpdateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]   #[IsAdminUserCustom]
 
+    def perform_update(self, serializer):
+        if 'image' not in serializer.validated_data:
+            serializer.save()
+            return
+        # Old variants belong to the old file; new ones arrive from the pool.
+        product = serializer.save(image_variants={})
+        images.queue_variants(product)
+
 
 class ProductDeleteView(generics.DestroyAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]   #[IsAdminUserCustom]
+
+
+def _batch_context(request, items):
+    # Resolve every referenced category in one query instead of one per item.
+    ids = set()
+    for item in items if isinstance(items, list) else []:
+        try:
+            ids.add(int(item.get('category_id')))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return {'request': request, 'categories': Category.objects.in_bulk(ids)}
+
+
+def _batch_error_response(serializer, items):
+    errors = serializer.errors
+    if isinstance(errors, dict) and not all(isinstance(key, int) for key in errors):
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+    if isinstance(errors, list):
+        errors = dict(enumerate(errors))
+    results = [
+        {'index': index, 'status': 'invalid', 'errors': errors[index]}
+        if errors.get(index) else {'index': index, 'status': 'valid'}
+        for index in range(len(items))
+    ]
+    return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProductBatchCreateView(APIView):
+    """POST a list of products; all are created in one transaction or none are."""
+    permission_classes = [IsAdminUserCustom]
+
+    def post(self, request):
+        items = request.data
+        serializer = ProductBatchSerializer(
+            data=items, many=True, context=_batch_context(request, items),
+        )
+        if not serializer.is_valid():
+            return _batch_error_response(serializer, items)
+
+        with transaction.atomic():
+            products = serializer.save()
+            categories.apply_count_changes(categories.active_counts(products))
+            products_bulk_changed.send(sender=Product, changed=[p.pk for p in products])
+
+        results = [
+            {'index': index, 'id': product.pk, 'status': 'created'}
+            for index, product in enumerate(products)
+        ]
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
+
+
+class ProductBatchUpdateView(APIView):
+    """POST a list of partial products, each with its ``id``; all or nothing."""
+    permission_classes = [IsAdminUserCustom]
+
+    def post(self, request):
+        items = request.data
+        ids = [item.get('id') for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+        serializer = ProductBatchSerializer(
+            instance=Product.objects.in_bulk([i for i in ids if isinstance(i, int)]),
+            data=items,
+            many=True,
+            partial=True,
+            context=_batch_context(request, items),
+        )
+        if not serializer.is_valid():
+            return _batch_error_response(serializer, items)
+
+        before = categories.active_counts(serializer.instance.values())
+        with transaction.atomic():
+            products = serializer.save()
+            categories.apply_count_changes(before, categories.active_counts(products))
+            products_bulk_changed.send(sender=Product, changed=[p.pk for p in products])
+
+        results = [
+            {'index': index, 'id': product.pk, 'status': 'updated'}
+            for index, product in enumerate(products)
+        ]
+        return Response({'results': results})
+
+
+class ProductBatchDeleteView(APIView):
+    """POST ``{"ids": [...]}``; existing products are deleted in one statement."""
+    permission_classes = [IsAdminUserCustom]
+
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response(
+                {'ids': ['A list of product ids is required.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic(), bulk_changes():
+            existing = set(Product.objects.filter(id__in=ids).values_list('id', flat=True))
+            counts = categories.active_counts(Product.objects.filter(id__in=existing))
+            Product.objects.filter(id__in=existing).delete()
+            categories.apply_count_changes(counts, {})
+            products_bulk_changed.send(sender=Product, deleted=list(existing))
+
+        results = [
+            {'id': product_id, 'status': 'deleted' if product_id in existing else 'not_found'}
+            for product_id in ids
+        ]
+        return Response({'results': results})
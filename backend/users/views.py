@@ -1,11 +1,27 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
+
+from cart import guest
 from .serializers import RegisterSerializer, UserSerializer, MyTokenObtainPairSerializer
 
 
 class MyTokenObtainPairView(TokenObtainPairView):
+    """Log in; a guest cart from the cookie is merged into the user's cart."""
     serializer_class = MyTokenObtainPairSerializer
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
+        guest.merge(serializer.user, request, response)
+        return response
+
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
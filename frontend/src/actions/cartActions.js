@@ -8,13 +8,7 @@ import {
 export const fetchCart = () => async (dispatch) => {
   try {
     dispatch(cartRequest());
-    // If not authenticated, avoid calling protected endpoint and treat as empty cart
-    const token = localStorage.getItem("accessToken");
-    if (!token) {
-      dispatch(cartSuccess({ items: [] }));
-      return;
-    }
-
+    // Anonymous shoppers get their guest cart (kept in a cookie).
     const { data } = await api.get("cart/");
     dispatch(cartSuccess(data));
   } catch (error) {
@@ -29,13 +23,6 @@ export const fetchCart = () => async (dispatch) => {
 
 export const addToCart = (productId, quantity = 1) => async (dispatch) => {
   try {
-    const token = localStorage.getItem("accessToken");
-    if (!token) {
-      // Not logged in — redirect to login page to add to cart
-      window.location.href = "/login";
-      return;
-    }
-
     await api.post("cart/add/", {
       product_id: productId,
       quantity,
@@ -52,12 +39,6 @@ export const addToCart = (productId, quantity = 1) => async (dispatch) => {
 
 export const updateCartItem = (itemId, quantity) => async (dispatch) => {
   try {
-    const token = localStorage.getItem("accessToken");
-    if (!token) {
-      window.location.href = "/login";
-      return;
-    }
-
     await api.post("cart/update/", {
       item_id: itemId,
       quantity,
@@ -74,12 +55,6 @@ export const updateCartItem = (itemId, quantity) => async (dispatch) => {
 
 export const removeFromCart = (itemId) => async (dispatch) => {
   try {
-    const token = localStorage.getItem("accessToken");
-    if (!token) {
-      window.location.href = "/login";
-      return;
-    }
-
     await api.post("cart/remove/", {
       item_id: itemId
     });
@@ -88,3 +63,19 @@ export const removeFromCart = (itemId) => async (dispatch) => {
     dispatch(cartFail(error.response?.data?.detail || error.message));
   }
 };
+
+// operations: [{ op: "add" | "set" | "remove", product_id, quantity }],
+// applied in one request; the response is the updated cart.
+export const batchUpdateCart = (operations) => async (dispatch) => {
+  try {
+    dispatch(cartRequest());
+    const { data } = await api.post("cart/batch/", operations);
+    dispatch(cartSuccess(data));
+  } catch (error) {
+    if (error.response && error.response.status === 401) {
+      window.location.href = "/login";
+      return;
+    }
+    dispatch(cartFail(error.response?.data?.detail || error.message));
+  }
+};
@@ -3,12 +3,15 @@ import {
   orderRequest,
   orderSuccess,
   orderListSuccess,
+  orderListMore,
   orderFail,
 } from "../reducers/orderReducers";
 import { fetchCart } from "./cartActions";
 
 // PLACE ORDER
-export const placeOrder = (addressData) => async (dispatch) => {
+// Pass the same idempotencyKey when retrying a checkout: the server then
+// replays the first order instead of placing another.
+export const placeOrder = (addressData, idempotencyKey) => async (dispatch) => {
   try {
     dispatch(orderRequest());
 
@@ -17,6 +20,8 @@ export const placeOrder = (addressData) => async (dispatch) => {
       city: addressData.city,
       postal_code: addressData.postal_code,
       country: addressData.country
+    }, {
+      headers: idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {},
     });
 
     dispatch(orderSuccess()); // 🔥 success flag only
@@ -43,9 +48,19 @@ export const fetchOrders = () => async (dispatch) => {
   try {
     dispatch(orderRequest());
 
+    // Newest first, a page at a time: { next, results }.
     const { data } = await api.get("orders/myorders/");
     dispatch(orderListSuccess(data));
   } catch (error) {
     dispatch(orderFail(error.response?.data?.detail || error.message));
   }
 };
+
+export const fetchMoreOrders = (next) => async (dispatch) => {
+  try {
+    const { data } = await api.get(next);
+    dispatch(orderListMore(data));
+  } catch (error) {
+    dispatch(orderFail(error.response?.data?.detail || error.message));
+  }
+};
@@ -2,6 +2,8 @@ import axios from "axios";
 
 const api = axios.create({
   baseURL: "http://127.0.0.1:8000/api/",
+  // Carries the signed guest cart cookie for shoppers who are not logged in.
+  withCredentials: true,
 });
 
 api.interceptors.request.use((config) => {
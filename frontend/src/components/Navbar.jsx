@@ -2,7 +2,8 @@ import { Link, useNavigate } from "react-router-dom";
 import { useDispatch, useSelector } from "react-redux";
 import { Navbar as BNavbar, Nav, Container, NavDropdown, Button, Form, InputGroup } from "react-bootstrap";
 import { logout } from "../reducers/authReducers";
-import { useState } from "react";
+import { useEffect, useState } from "react";
+import api from "../api/axios";
 import "./Navbar.css";
 
 function Navbar() {
@@ -10,6 +11,29 @@ function Navbar() {
   const navigate = useNavigate();
   const userInfo = useSelector((state) => state.auth.userInfo);
   const [keyword, setKeyword] = useState("");
+  const [suggestions, setSuggestions] = useState([]);
+
+  // Autocomplete from the in-memory suggest index, debounced per keystroke.
+  useEffect(() => {
+    const q = keyword.trim();
+    if (!q) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const { data } = await api.get("products/suggest/", { params: { q, limit: 8 } });
+        if (!cancelled) setSuggestions(data.products);
+      } catch {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 120);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [keyword]);
 
   const handleLogout = () => {
     dispatch(logout());
@@ -44,8 +68,15 @@ function Navbar() {
                 placeholder="Search for products, brands and more"
                 className="border-0 bg-transparent ps-4 py-2"
                 onChange={(e) => setKeyword(e.target.value)}
+                list="search-suggestions"
+                autoComplete="off"
                 style={{ boxShadow: 'none', fontSize: '0.95rem' }}
               />
+              <datalist id="search-suggestions">
+                {suggestions.map((product) => (
+                  <option key={product.id} value={product.name} />
+                ))}
+              </datalist>
               <Button variant="primary" type="submit" className="rounded-pill m-1 px-4">
                 Search
               </Button>
@@ -4,6 +4,7 @@ const orderSlice = createSlice({
   name: "orders",
   initialState: {
     orders: [],
+    next: null, // cursor link to the next page of orders
     loading: false,
     error: null,
     success: false, // ONLY for placeOrder
@@ -23,7 +24,13 @@ const orderSlice = createSlice({
     // 🔥 USED FOR FETCH ORDERS LIST
     orderListSuccess(state, action) {
       state.loading = false;
-      state.orders = action.payload;
+      state.orders = action.payload.results;
+      state.next = action.payload.next;
+    },
+
+    orderListMore(state, action) {
+      state.orders.push(...action.payload.results);
+      state.next = action.payload.next;
     },
 
     orderFail(state, action) {
@@ -42,6 +49,7 @@ export const {
   orderRequest,
   orderSuccess,
   orderListSuccess,
+  orderListMore,
   orderFail,
   resetOrderSuccess,
 } = orderSlice.actions;
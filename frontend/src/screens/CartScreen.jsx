@@ -16,12 +16,9 @@ function CartScreen() {
   const { userInfo } = useSelector((state) => state.auth);
 
   useEffect(() => {
-    if (userInfo) {
-      dispatch(fetchCart());
-    } else {
-      navigate('/login');
-    }
-  }, [dispatch, userInfo, navigate]);
+    // Guests see their cookie cart; logging in merges it into the account.
+    dispatch(fetchCart());
+  }, [dispatch, userInfo]);
 
   useEffect(() => {
     if (success && userInfo) {
@@ -30,7 +27,7 @@ function CartScreen() {
   }, [dispatch, success, userInfo]);
 
   const orderHandler = () => {
-    navigate('/shipping');
+    navigate(userInfo ? '/shipping' : '/login');
   };
 
   const removeFromCartHandler = (id) => {
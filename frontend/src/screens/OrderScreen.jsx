@@ -1,12 +1,12 @@
 import { useEffect, useState } from "react";
 import { useDispatch, useSelector } from "react-redux";
-import { fetchOrders, updateOrderStatus } from "../actions/orderActions";
+import { fetchOrders, fetchMoreOrders, updateOrderStatus } from "../actions/orderActions";
 import { Table, Container, Alert, Badge, Spinner, Button, Offcanvas, Dropdown } from "react-bootstrap";
 import './OrderScreen.css';
 
 function OrderScreen() {
   const dispatch = useDispatch();
-  const { orders, loading, error } = useSelector((state) => state.orders);
+  const { orders, next, loading, error } = useSelector((state) => state.orders);
 
   const [showSidebar, setShowSidebar] = useState(false);
   const [selectedOrder, setSelectedOrder] = useState(null);
@@ -98,6 +98,14 @@ function OrderScreen() {
         </div>
       )}
 
+      {next && (
+        <div className="text-center mt-3">
+          <Button variant="outline-secondary" onClick={() => dispatch(fetchMoreOrders(next))}>
+            Load more
+          </Button>
+        </div>
+      )}
+
       {/* Sidebar for Order Details */}
       <Offcanvas show={showSidebar} onHide={() => setShowSidebar(false)} placement="end">
         <Offcanvas.Header closeButton>
@@ -29,6 +29,10 @@ function ProductDetailScreen() {
   const [rating, setRating] = useState(0);
   const [comment, setComment] = useState("");
   const [reviewError, setReviewError] = useState(null);
+  // The detail payload embeds only the latest few reviews; older ones are
+  // paged from products/<id>/reviews/ once the user asks for them.
+  const [pagedReviews, setPagedReviews] = useState(null);
+  const [reviewsNext, setReviewsNext] = useState(null);
 
   // -- Fetch Data --
   useEffect(() => {
@@ -37,6 +41,7 @@ function ProductDetailScreen() {
         setLoading(true);
         const { data } = await api.get(`products/${id}/`);
         setProduct(data);
+        setPagedReviews(null);
         // Optional: If item is in cart, sync start qty? 
         // Let's decide: User often expects to see "Add to Cart" (1) or "Your Cart: (5)".
         // To keep logic SIMPLE and ROBUST: We will default to 1. 
@@ -62,7 +67,7 @@ function ProductDetailScreen() {
 
   // PURE MATH INCREMENT
   const incrementQty = () => {
-    if (product && qty < product.stock) {
+    if (product && qty < product.available_stock) {
       setQty(prev => prev + 1);
     }
   };
@@ -89,6 +94,20 @@ function ProductDetailScreen() {
       setComment("");
       const { data } = await api.get(`products/${id}/`);
       setProduct(data);
+      setPagedReviews(null);
+    } catch (err) {
+      setReviewError(err.response?.data?.detail || err.message);
+    }
+  };
+
+  const loadMoreReviews = async () => {
+    try {
+      // The first page repeats the embedded reviews, so it replaces them.
+      const { data } = pagedReviews
+        ? await api.get(reviewsNext)
+        : await api.get(`products/${id}/reviews/`, { params: { page_size: 10 } });
+      setPagedReviews([...(pagedReviews || []), ...data.results]);
+      setReviewsNext(data.next);
     } catch (err) {
       setReviewError(err.response?.data?.detail || err.message);
     }
@@ -112,7 +131,7 @@ function ProductDetailScreen() {
     </Container>
   );
 
-  const isOutOfStock = product.stock === 0;
+  const isOutOfStock = product.available_stock === 0;
   const imageUrl = product.image_url || (product.image ? `http://127.0.0.1:8000${product.image}` : '/placeholder.svg');
 
   return (
@@ -202,7 +221,7 @@ function ProductDetailScreen() {
                           size="sm"
                           className="text-decoration-none text-dark fw-bold"
                           onClick={incrementQty}
-                          disabled={qty >= product.stock}
+                          disabled={qty >= product.available_stock}
                         >
                           +
                         </Button>
@@ -234,7 +253,7 @@ function ProductDetailScreen() {
           {product.reviews.length === 0 && <Alert variant="info">No reviews yet.</Alert>}
 
           <div className="mb-4">
-            {product.reviews.map((review) => (
+            {(pagedReviews || product.reviews).map((review) => (
               <Card key={review.id} className="mb-3 border-0 shadow-sm">
                 <Card.Body>
                   <div className="d-flex justify-content-between">
@@ -249,6 +268,13 @@ function ProductDetailScreen() {
                 </Card.Body>
               </Card>
             ))}
+            {(pagedReviews ? reviewsNext : product.numReviews > product.reviews.length) && (
+              <div className="text-center">
+                <Button variant="outline-secondary" onClick={loadMoreReviews}>
+                  Show more reviews
+                </Button>
+              </div>
+            )}
           </div>
 
           <Card className="shadow-sm border-0">
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useDispatch, useSelector } from "react-redux";
 import { useNavigate } from "react-router-dom";
 import { Form, Button, Container, Row, Col, Card, Alert } from "react-bootstrap";
@@ -15,6 +15,9 @@ function ShippingScreen() {
     const [addresses, setAddresses] = useState([]);
     const [selectedAddressId, setSelectedAddressId] = useState(null);
     const [loading, setLoading] = useState(true);
+    // One checkout attempt per visit: resubmitting (e.g. after a network
+    // error) reuses the key, so the order is only placed once.
+    const checkoutKey = useRef(crypto.randomUUID());
 
     // New Address Form State
     const [showNewForm, setShowNewForm] = useState(false);
@@ -75,7 +78,7 @@ function ShippingScreen() {
         // Dispatch placeOrder with address details
         // Note: We need to update placeOrder action to accept this data, or pass it directly
         // For now let's update orderActions to take address data
-        const order = await dispatch(placeOrder(selectedAddr));
+        const order = await dispatch(placeOrder(selectedAddr, `${checkoutKey.current}-${selectedAddr.id}`));
         if (order) {
             navigate(`/order-success/${order.id}`);
         }